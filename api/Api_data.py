@@ -1,26 +1,31 @@
 import pandas as pd
 import numpy as np
-import os
+import os, sys
 import requests
 import json
 import logging
 import time
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime,timedelta,UTC
 
+# ✅ Make sure api/ is importable when this file is run directly
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from api.cache import cached, coord_key, text_key
+from api.http_client import http_get
+from api.sensor_index import lookup_soil_ph
+from api.weather_store import lookup_weather
+from api.soil_tiles import lookup_soil_tile, store_soil_tile, is_complete_answer
+from api.translation import translate_templates
+from api.metrics import timed_stage
+from api.logs import log_event
+
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 import requests
 import pandas as pd
 
-# --- Load local dataset once ---
-DATASET_PATH = "sensor_Crop_Dataset.csv"
-try:
-    local_data = pd.read_csv(DATASET_PATH)
-except Exception:
-    local_data = pd.DataFrame()
-
 # --- Mapping WRB → Dataset Soil Types ---
 SOIL_MAPPING = {
     "Vertisols": "Clay",
@@ -40,83 +45,142 @@ def map_soil_type(wrb_class_name):
     return SOIL_MAPPING.get(wrb_class_name, "Unknown")
 
 def get_soil_from_dataset(soil_type=None, crop=None):
-    """Fallback: fetch avg soil pH using soil_type + crop"""
-    if local_data.empty:
+    """Fallback: fetch avg soil pH using soil_type + crop (precomputed index, no table scan)"""
+    found = lookup_soil_ph(soil_type=soil_type, crop=crop)
+    if found is None:
         return {"ph": 7.0, "soil_type": soil_type or "Unknown", "wrb_class": None}
-    
-    df = local_data.copy()
-    if soil_type:
-        df = df[df["soil_type"].str.lower() == soil_type.lower()]
-    if crop and not df.empty:
-        df = df[df["crop"].str.lower() == crop.lower()]
-
-    if df.empty:
-        ph_val = local_data["ph"].mean() if "ph" in local_data else 7.0
-        soil_type_val = soil_type or "Unknown"
-    else:
-        ph_val = df["ph"].mean() if "ph" in df else 7.0
-        soil_type_val = df["soil_type"].mode()[0] if "soil_type" in df else (soil_type or "Unknown")
 
+    ph_val, soil_type_val = found
     return {"ph": round(ph_val, 2), "soil_type": soil_type_val, "wrb_class": None}
 
-def get_soil_ph_and_type(lat, lon, crop=None):
-    """Main API function: fetch soil pH + type from ISRIC → fallback to dataset"""
-    try:
-        # --- Fetch soil pH ---
-        ph_url = f"https://rest.isric.org/soilgrids/v2.0/properties/query?lat={lat}&lon={lon}&property=phh2o"
-        ph_resp = requests.get(ph_url, timeout=10).json()
+# Small dedicated pool so the two ISRIC queries for a point run side by side
+_isric_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="isric")
 
-        ph = None
-        try:
-            layers = ph_resp.get("properties", {}).get("layers", [])
-            if layers:
-                ph_layer = layers[0]["depths"][0]
-                ph_val = ph_layer["values"].get("mean", None)
-                ph = ph_val / 10.0 if ph_val else None
-        except Exception:
-            ph = None
 
-        # --- Fetch soil type ---
-        type_url = f"https://rest.isric.org/soilgrids/v2.0/classification/query?lat={lat}&lon={lon}"
-        type_data = requests.get(type_url, timeout=10).json()
+def _fetch_isric_ph(lat, lon):
+    ph_url = f"https://rest.isric.org/soilgrids/v2.0/properties/query?lat={lat}&lon={lon}&property=phh2o"
+    response = http_get("soil", ph_url)
+    response.raise_for_status()  # a 429/5xx after the retries is a failure, not "no pH here"
+    ph_resp = response.json()
 
-        wrb_class = type_data.get("wrb_class_name", None)
-        soil_type = map_soil_type(wrb_class) if wrb_class else None
+    try:
+        layers = ph_resp.get("properties", {}).get("layers", [])
+        if layers:
+            ph_layer = layers[0]["depths"][0]
+            ph_val = ph_layer["values"].get("mean", None)
+            return ph_val / 10.0 if ph_val else None
+    except Exception:
+        pass
+    return None
 
-        # ✅ Fix: always fallback if unknown or missing
-        # ✅ Normalize soil type
-        if not soil_type or soil_type.strip().lower() == "unknown":
-            soil_type = "Loamy"
 
-        if ph is None or soil_type is None:
-            return get_soil_from_dataset(soil_type=soil_type, crop=crop)
+def _fetch_isric_wrb(lat, lon):
+    type_url = f"https://rest.isric.org/soilgrids/v2.0/classification/query?lat={lat}&lon={lon}"
+    response = http_get("soil", type_url)
+    response.raise_for_status()
+    type_data = response.json()
+    return type_data.get("wrb_class_name", None)
 
-        return {"ph": round(ph, 2), "soil_type": soil_type, "wrb_class": wrb_class}
+
+@cached("soil", key_func=lambda lat, lon: coord_key(lat, lon))
+def fetch_isric_soil(lat, lon):
+    """
+    Raw ISRIC SoilGrids lookup: {"ph", "wrb_class"}; None if the API fails,
+    answers only partly, or misses the request budget with nothing cached
+    (get_soil_ph_and_type then falls back to the sensor dataset). Like the tile
+    store, the upstream cache only ever keeps complete answers.
+    """
+    try:
+        # --- Fetch soil pH + soil type concurrently ---
+        ph_future = _isric_pool.submit(_fetch_isric_ph, lat, lon)
+        wrb_future = _isric_pool.submit(_fetch_isric_wrb, lat, lon)
+        isric = {"ph": ph_future.result(), "wrb_class": wrb_future.result()}
+        return isric if is_complete_answer(isric) else None
 
     except Exception:
+        return None
+
+
+@timed_stage("soil")
+def get_soil_ph_and_type(lat, lon, crop=None):
+    """Main API function: soil pH + type from the tile cache → ISRIC → fallback to dataset"""
+    # Known tile: no network at all (see api/soil_tiles.py)
+    isric = lookup_soil_tile(lat, lon)
+    if isric is None:
+        isric = fetch_isric_soil(lat, lon)
+        if is_complete_answer(isric):
+            wrb = isric["wrb_class"]
+            store_soil_tile(lat, lon, isric["ph"], wrb, map_soil_type(wrb))
+    if isric is None:
         # Full fallback if API fails
         return get_soil_from_dataset(soil_type=None, crop=crop)
 
+    ph = isric["ph"]
+    wrb_class = isric["wrb_class"]
+    soil_type = map_soil_type(wrb_class) if wrb_class else None
+
+    # ✅ Fix: always fallback if unknown or missing
+    # ✅ Normalize soil type
+    if not soil_type or soil_type.strip().lower() == "unknown":
+        soil_type = "Loamy"
+
+    if ph is None or soil_type is None:
+        return get_soil_from_dataset(soil_type=soil_type, crop=crop)
+
+    return {"ph": round(ph, 2), "soil_type": soil_type, "wrb_class": wrb_class}
+
 
 
+def nasa_power_window():
+    """(start, end) as YYYYMMDD: the 7-day window ending 2 days ago (NASA POWER lag)."""
+    now = datetime.now(UTC)
+    end = (now - timedelta(days=2)).strftime("%Y%m%d")
+    start = (now - timedelta(days=9)).strftime("%Y%m%d")
+    return start, end
+
+
+# Served when NASA POWER misses the request budget (or fails) and this point has
+# never been fetched before: typical Indian cropping-season 7-day means.
+DEFAULT_WEATHER = {
+    "temperature": 27.0,      # °C
+    "humidity": 65.0,         # %
+    "rainfall": 3.0,          # mm/day
+    "solar_radiation": 18.0,  # MJ/m²/day
+    "windspeed": 2.0,         # m/s
+}
+
+
+@timed_stage("weather")
 def get_last7days_weather(lat, lon):
+    """
+    Last 7 days weather & solar radiation (MJ/m²/day), all values as means.
+    Answered from the nightly prefetched grid (api/weather_store.py) when the
+    point and window are covered; otherwise NASA POWER is called live.
+    """
+    start, end = nasa_power_window()
+    stored = lookup_weather(lat, lon, start, end)
+    if stored is not None:
+        return stored
+    return fetch_nasa_power_weather(lat, lon)
+
+
+@cached("weather", key_func=lambda lat, lon: coord_key(lat, lon, nasa_power_window()[1]),
+        default=lambda: dict(DEFAULT_WEATHER), latest_key=lambda lat, lon: coord_key(lat, lon))
+def fetch_nasa_power_weather(lat, lon):
     """
     Fetch last 7 days weather & solar radiation (MJ/m²/day) from NASA POWER API.
     Returns aggregated weekly features with all values as means.
     """
-    today = datetime.now()
-    end = (datetime.now(UTC) - timedelta(days=2)).strftime("%Y%m%d")
-    start = (datetime.now(UTC) - timedelta(days=9)).strftime("%Y%m%d")
-    print(start,end)
+    start, end = nasa_power_window()
 
     url = (
     f"https://power.larc.nasa.gov/api/temporal/daily/point?parameters=T2M,RH2M,PRECTOTCORR,ALLSKY_SFC_SW_DWN,WS2M&community=AG&latitude={lat}&longitude={lon}&start={start}&end={end}&format=JSON"
     )
 
-    print(url)
+    log_event("weather.request", url=url, start=start, end=end)
 
     try:
-        response = requests.get(url, timeout=10)
+        response = http_get("weather", url)
         response.raise_for_status()
         data = response.json()["properties"]["parameter"]
 
@@ -140,6 +204,8 @@ def get_last7days_weather(lat, lon):
         logging.error(f"Error fetching NASA POWER data: {e}")
         return None
 
+@timed_stage("geocode")
+@cached("geocode", key_func=lambda state, district, country="India": text_key(district, state, country))
 def get_lat_lon(state: str, district: str, country: str = "India"):
     query = f"{district}, {state}, {country}"
     url = "https://nominatim.openstreetmap.org/search"
@@ -151,7 +217,7 @@ def get_lat_lon(state: str, district: str, country: str = "India"):
 
     try:
         headers = {"User-Agent": "geo-tester"}  # Required by Nominatim
-        response = requests.get(url, params=params, headers=headers, timeout=10)
+        response = http_get("geocode", url, params=params, headers=headers)
         response.raise_for_status()
         data = response.json()
 
@@ -164,13 +230,10 @@ def get_lat_lon(state: str, district: str, country: str = "India"):
         else:
             return None
     except Exception as e:
-        print("Error:", e)
+        log_event("geocode.error", level=logging.WARNING, query=query, error=str(e))
         return None
 
 
-# Example usage
-print(get_lat_lon("Maharashtra", "Nagpur"))
-print(get_lat_lon("Telangana", "Hyderabad"))
 
 
 import requests
@@ -188,17 +251,29 @@ LON = 77.2090
 BASE_URL = "https://api.openweathermap.org/data/3.0/onecall"
 
 
+# Forecast fallback when OpenWeather misses the budget with nothing cached: no rain
+# expected (the conservative assumption for irrigation advice)
+DEFAULT_FORECAST_RAINFALL = 0.0
+
+
+@timed_stage("forecast")
+@cached("forecast", key_func=lambda lat, lon: coord_key(lat, lon), default=DEFAULT_FORECAST_RAINFALL)
 def get_future_rainfall(lat, lon):
     """
     Fetch next 5 days rainfall forecast from OpenWeather 2.5 API.
     Returns daily aggregated rainfall (mm).
     """
     url = f"http://api.openweathermap.org/data/2.5/forecast?lat={lat}&lon={lon}&appid={API_KEY}&units=metric"
-    response = requests.get(url)
-    data = response.json()
+    try:
+        response = http_get("forecast", url)
+        data = response.json()
+    except (requests.exceptions.RequestException, ValueError) as e:
+        log_event("forecast.error", level=logging.WARNING, lat=lat, lon=lon, error=str(e))
+        return {}
 
     if response.status_code != 200 or "list" not in data:
-        print("Error fetching forecast:", data)
+        log_event("forecast.error", level=logging.WARNING, lat=lat, lon=lon,
+                  status=response.status_code, response=data)
         return {}
 
     # Aggregate rainfall by date
@@ -211,10 +286,8 @@ def get_future_rainfall(lat, lon):
         daily_rainfall[date_str] += rain
 
     # Return only next 5 days
-    print(daily_rainfall)
-    print(type(daily_rainfall))
     forecast = dict(list(daily_rainfall.items())[:5])
-    print(forecast)
+    log_event("forecast.daily_rainfall", sample=True, lat=lat, lon=lon, forecast=forecast)
     mean = sum(forecast.values())/len(forecast)
     return mean
 
@@ -241,11 +314,11 @@ def get_agromonitoring_data(lat, lon):
     )
 
     try:
-        weather_res = requests.get(weather_url, timeout=10)
+        weather_res = http_get("agromonitoring", weather_url)
         weather_res.raise_for_status()
         weather_data = weather_res.json()
 
-        soil_res = requests.get(soil_url, timeout=10)
+        soil_res = http_get("agromonitoring", soil_url)
         soil_res.raise_for_status()
         soil_data = soil_res.json()
 
@@ -291,23 +364,11 @@ def get_satellite_data(lat, lon):
 
 def get_translation_data(text, target_language="hi"):
     """
-    Placeholder for a function to translate text using LibreTranslate.
+    Translate one text with LibreTranslate through the translation cache
+    (api/translation.py). Returns None if it could not be translated.
     """
-    logging.info("Translation is a separate concern for the UI, but here is a placeholder.")
-    url = "https://libretranslate.com/translate"
-    payload = {
-        "q": text,
-        "source": "en",
-        "target": target_language
-    }
-    try:
-        response = requests.post(url, data=payload, timeout=10)
-        response.raise_for_status()
-        translated_text = response.json()["translatedText"]
-        return translated_text
-    except requests.exceptions.RequestException as e:
-        logging.error(f"Error translating text: {e}")
-        return None
+    translated = translate_templates([text], target_language)[text]
+    return None if translated == text and target_language != "en" else translated
 
 if __name__ == '__main__':
     # This block is for testing the functions directly
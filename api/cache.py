@@ -0,0 +1,326 @@
+import os
+import json
+import sqlite3
+import threading
+import time
+import functools
+import logging
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from datetime import datetime, timedelta, UTC
+
+from api import metrics
+from api.deadline import remaining, mark_degraded
+from api.singleflight import SingleFlight
+
+# --- Cache location / sizing (override with env vars) ---
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_DB_PATH = os.getenv(
+    "UPSTREAM_CACHE_PATH",
+    os.path.abspath(os.path.join(BASE_DIR, "..", "cache", "upstream_cache.sqlite3"))
+)
+LRU_MAX_ENTRIES = int(os.getenv("UPSTREAM_CACHE_LRU_SIZE", "4096"))
+# Threads that run cache-miss fetches under a request budget; they keep going
+# (and refresh the cache) after the request has moved on with a fallback
+UPSTREAM_REFRESH_WORKERS = int(os.getenv("UPSTREAM_REFRESH_WORKERS", "8"))
+
+# Decimal places kept when lat/lon are used in a cache key (2 ≈ 1.1 km)
+COORD_PRECISION = int(os.getenv("UPSTREAM_CACHE_COORD_PRECISION", "2"))
+
+
+def seconds_until_utc_midnight():
+    """NASA POWER's daily window only moves when the UTC day rolls over."""
+    now = datetime.now(UTC)
+    tomorrow = (now + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+    return (tomorrow - now).total_seconds()
+
+
+# --- Per-source TTLs in seconds (None = never expires, callables are evaluated at write time) ---
+SOURCE_TTLS = {
+    "geocode": None,                      # district coordinates never change
+    "soil": 90 * 24 * 3600,               # ~3 months
+    "weather": seconds_until_utc_midnight,
+    "forecast": 3 * 3600,                 # OpenWeather 3h forecast steps
+    "translation": None,                  # "<lang>|<template>" → translated template (api/translation.py)
+}
+
+
+def round_coord(value):
+    return round(float(value), COORD_PRECISION)
+
+
+def coord_key(lat, lon, *extra):
+    """Normalized key for lat/lon based lookups, e.g. '21.15|79.09'."""
+    parts = [f"{round_coord(lat):.{COORD_PRECISION}f}", f"{round_coord(lon):.{COORD_PRECISION}f}"]
+    parts.extend(str(e).strip().lower() for e in extra if e is not None)
+    return "|".join(parts)
+
+
+def text_key(*parts):
+    return "|".join(str(p).strip().lower() for p in parts if p is not None)
+
+
+class MemoryTier:
+    """In-process LRU tier. Stores (value, expires_at) per (source, key)."""
+
+    name = "memory"
+
+    def __init__(self, max_entries=LRU_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, source, key):
+        with self._lock:
+            item = self._data.get((source, key))
+            if item is None:
+                return None
+            self._data.move_to_end((source, key))
+            return item
+
+    def set(self, source, key, value, expires_at):
+        with self._lock:
+            self._data[(source, key)] = (value, expires_at)
+            self._data.move_to_end((source, key))
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class SQLiteTier:
+    """Persistent tier shared by every worker on the host. Values are stored as JSON."""
+
+    name = "sqlite"
+
+    def __init__(self, path=CACHE_DB_PATH):
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS upstream_cache ("
+                " source TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL,"
+                " expires_at REAL, updated_at REAL NOT NULL,"
+                " PRIMARY KEY (source, key))"
+            )
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            self._local.conn = conn
+        return conn
+
+    def get(self, source, key):
+        row = self._connect().execute(
+            "SELECT value, expires_at FROM upstream_cache WHERE source = ? AND key = ?",
+            (source, key)
+        ).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0]), row[1]
+
+    def set(self, source, key, value, expires_at):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO upstream_cache (source, key, value, expires_at, updated_at)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (source, key, json.dumps(value), expires_at, time.time())
+            )
+
+    def clear(self):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM upstream_cache")
+
+
+class TieredCache:
+    """
+    Looks tiers up in order (fastest first) and back-fills faster tiers on a hit.
+    Any object with get(source, key) / set(source, key, value, expires_at) can be a tier.
+    """
+
+    def __init__(self, tiers, ttls=None):
+        self.tiers = list(tiers)
+        self.ttls = dict(SOURCE_TTLS if ttls is None else ttls)
+        self._stats = defaultdict(lambda: defaultdict(int))
+        self._stats_lock = threading.Lock()
+
+    def _count(self, source, event):
+        with self._stats_lock:
+            self._stats[source][event] += 1
+
+    def expires_at(self, source):
+        ttl = self.ttls.get(source)
+        if callable(ttl):
+            ttl = ttl()
+        return None if ttl is None else time.time() + ttl
+
+    def get(self, source, key):
+        """Return (True, value) on a fresh hit, (False, None) otherwise."""
+        now = time.time()
+        for i, tier in enumerate(self.tiers):
+            try:
+                item = tier.get(source, key)
+            except Exception as e:
+                logging.warning(f"Cache tier {tier.name} read failed: {e}")
+                continue
+            if item is None:
+                continue
+            value, expires_at = item
+            if expires_at is not None and expires_at <= now:
+                continue
+            for faster in self.tiers[:i]:
+                faster.set(source, key, value, expires_at)
+            self._count(source, f"hits_{tier.name}")
+            return True, value
+        self._count(source, "misses")
+        return False, None
+
+    def get_stale(self, source, key):
+        """Last stored value whether expired or not: (True, value, expires_at) or (False, None, None)."""
+        for tier in self.tiers:
+            try:
+                item = tier.get(source, key)
+            except Exception as e:
+                logging.warning(f"Cache tier {tier.name} read failed: {e}")
+                continue
+            if item is not None:
+                return True, item[0], item[1]
+        return False, None, None
+
+    def set(self, source, key, value, expires_at=None, ttl=True):
+        if ttl:
+            expires_at = self.expires_at(source)
+        for tier in self.tiers:
+            try:
+                tier.set(source, key, value, expires_at)
+            except Exception as e:
+                logging.warning(f"Cache tier {tier.name} write failed: {e}")
+
+    def clear(self):
+        for tier in self.tiers:
+            tier.clear()
+
+    def stats(self):
+        with self._stats_lock:
+            return {source: dict(counts) for source, counts in self._stats.items()}
+
+
+def _default_tiers():
+    tiers = [MemoryTier()]
+    if os.getenv("UPSTREAM_CACHE_PERSIST", "1") != "0":
+        try:
+            tiers.append(SQLiteTier())
+        except Exception as e:
+            logging.warning(f"Persistent upstream cache disabled: {e}")
+    return tiers
+
+
+upstream_cache = TieredCache(_default_tiers())
+
+
+def set_upstream_cache(cache):
+    """Swap the cache used by every @cached function (e.g. a different backend or tiers)."""
+    global upstream_cache
+    upstream_cache = cache
+
+
+def cache_stats():
+    stats = upstream_cache.stats()
+    stats["in_flight"] = _in_flight.in_flight()
+    return stats
+
+
+_refresh_pool = ThreadPoolExecutor(max_workers=UPSTREAM_REFRESH_WORKERS, thread_name_prefix="upstream-refresh")
+# One in-flight upstream call per (source, key) across all requests in this process
+_in_flight = SingleFlight()
+
+
+def _is_empty(value):
+    return value is None or value == {}
+
+
+def _fallback(stale_keys, source, key, reason, default):
+    """
+    (True, value) from the first stored value under stale_keys [(source, key), ...],
+    else from the default; (False, None) if there is neither.
+    """
+    metrics.inc("agri_upstream_fallbacks_total", source=source, reason=reason)
+    for stale_source, stale_key in stale_keys:
+        found, value, expires_at = upstream_cache.get_stale(stale_source, stale_key)
+        if found:
+            age = time.time() - expires_at if expires_at is not None else None
+            upstream_cache._count(source, "served_stale")
+            mark_degraded(source, key, "stale", reason, age_seconds=age)
+            return True, value
+    upstream_cache._count(source, "served_default")
+    mark_degraded(source, key, "default", reason)
+    if default is None:
+        return False, None
+    return True, default() if callable(default) else default
+
+
+def cached(source, key_func, default=None, latest_key=None):
+    """
+    Cache a fetcher's result under `source` using key_func(*args, **kwargs).
+    Empty results (None / {}) are treated as failures and never cached.
+
+    Under a request budget (api/deadline.py) a miss waits only for the time
+    left. On timeout or failure the last known value is served (even if
+    expired), else `default` (value or callable), and the request is marked
+    degraded; the fetch itself keeps running in the background and refreshes
+    the cache. latest_key(*args) names a "last known value" slot for sources
+    whose key moves over time (e.g. weather keyed by date window).
+
+    Concurrent misses for the same key are coalesced: one caller fetches, the
+    rest wait on its future (counted as "coalesced" in cache_stats()).
+    """
+    def decorator(fn):
+        def fetch_and_store(key, latest, args, kwargs):
+            value = fn(*args, **kwargs)
+            if not _is_empty(value):
+                upstream_cache.set(source, key, value)
+                if latest is not None:
+                    upstream_cache.set(f"{source}:latest", latest, value, ttl=False)
+            return value
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            key = key_func(*args, **kwargs)
+            hit, value = upstream_cache.get(source, key)
+            if hit:
+                return value
+            latest = latest_key(*args, **kwargs) if latest_key is not None else None
+
+            budget = remaining()
+            value = None
+            try:
+                # Without a budget the leader fetches inline; with one it fetches on the refresh
+                # pool (plain submit: the refresh must not inherit this request's budget)
+                future, leader = _in_flight.call(
+                    (source, key), fetch_and_store, key, latest, args, kwargs,
+                    executor=None if budget is None else _refresh_pool,
+                )
+                if not leader:
+                    upstream_cache._count(source, "coalesced")
+                value = future.result(timeout=budget)
+                if not _is_empty(value):
+                    return value
+                reason = "unavailable"
+            except FutureTimeout:
+                upstream_cache._count(source, "deadline_exceeded")
+                reason = "deadline"
+            except Exception as e:
+                logging.error(f"{source} fetch failed for {key}: {e}")
+                reason = "error"
+
+            stale_keys = [(source, key)] + ([(f"{source}:latest", latest)] if latest is not None else [])
+            found, fallback = _fallback(stale_keys, source, key, reason, default)
+            return fallback if found else value
+        wrapper.uncached = fn
+        return wrapper
+    return decorator
@@ -0,0 +1,42 @@
+import os, sys
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from api.Api_data import get_lat_lon, get_last7days_weather, get_soil_ph_and_type, get_future_rainfall
+from api.deadline import context_submit, degraded_inputs
+
+# Bounded pool shared by every request; upstream calls are I/O bound so threads are enough
+UPSTREAM_POOL_SIZE = int(os.getenv("UPSTREAM_POOL_SIZE", "16"))
+_pool = ThreadPoolExecutor(max_workers=UPSTREAM_POOL_SIZE, thread_name_prefix="upstream")
+
+
+def get_location_context(lat, lon, crop=None, include_forecast=False):
+    """
+    Fetch weather, soil (and optionally the rainfall forecast) for one point concurrently.
+    Latency is roughly the slowest upstream instead of the sum of all of them,
+    and never more than the request budget (see api/deadline.py).
+    """
+    futures = {
+        "weather": context_submit(_pool, get_last7days_weather, lat, lon),
+        "soil": context_submit(_pool, get_soil_ph_and_type, lat, lon, crop),
+    }
+    if include_forecast:
+        futures["forecast"] = context_submit(_pool, get_future_rainfall, lat, lon)
+
+    context = {"lat": lat, "lon": lon, "forecast": None}
+    for name, future in futures.items():
+        context[name] = future.result()
+    return context
+
+
+def resolve_location_context(state, district, crop=None, include_forecast=False):
+    """Geocode state/district, then fan out to get_location_context."""
+    lat_lon = get_lat_lon(state, district)
+    if lat_lon is None:
+        if any(d["source"] == "geocode" and d["reason"] == "deadline" for d in degraded_inputs()):
+            raise ValueError(f"Location lookup for district '{district}', state '{state}' timed out; retry shortly")
+        raise ValueError(f"Could not find location for district '{district}', state '{state}'")
+    context = get_location_context(lat_lon["lat"], lat_lon["lon"], crop=crop, include_forecast=include_forecast)
+    context["state"] = state
+    context["district"] = district
+    return context
@@ -0,0 +1,71 @@
+import os
+import time
+import contextvars
+from contextlib import contextmanager
+
+# --- Request-wide latency budget ---
+# app.py opens a budget per request; every @cached upstream fetch below it waits
+# at most the time that is left, then falls back to the last known (stale) value
+# or the fetcher's documented default while the real fetch keeps going in the
+# background and refreshes the cache. Fallbacks are recorded per request and
+# returned to the client as "degraded".
+#
+# Budgets live in contextvars, so they follow the request into worker threads as
+# long as work is submitted with context_submit() instead of pool.submit().
+
+REQUEST_BUDGET_SECONDS = float(os.getenv("REQUEST_BUDGET_MS", "800")) / 1000
+# Batch endpoints resolve many districts per request, so they get a larger budget
+BATCH_REQUEST_BUDGET_SECONDS = float(os.getenv("BATCH_REQUEST_BUDGET_MS", "5000")) / 1000
+
+_deadline = contextvars.ContextVar("upstream_deadline", default=None)
+_degraded = contextvars.ContextVar("degraded_inputs", default=None)
+
+
+def start_budget(seconds=REQUEST_BUDGET_SECONDS):
+    """Open a budget in the current context; returns tokens for end_budget()."""
+    return (_deadline.set(time.monotonic() + seconds), _degraded.set([]))
+
+
+def end_budget(tokens):
+    deadline_token, degraded_token = tokens
+    _deadline.reset(deadline_token)
+    _degraded.reset(degraded_token)
+
+
+@contextmanager
+def request_budget(seconds=REQUEST_BUDGET_SECONDS):
+    """with request_budget(0.8): ... — the same thing for scripts and background jobs."""
+    tokens = start_budget(seconds)
+    try:
+        yield
+    finally:
+        end_budget(tokens)
+
+
+def remaining():
+    """Seconds left in the current budget (never negative); None when no budget is active."""
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return max(0.0, deadline - time.monotonic())
+
+
+def mark_degraded(source, key, fallback, reason, age_seconds=None):
+    """Record that `source` for `key` was served from a fallback ("stale" / "default")."""
+    degraded = _degraded.get()
+    if degraded is None:
+        return
+    entry = {"source": source, "key": key, "fallback": fallback, "reason": reason}
+    if age_seconds is not None:
+        entry["stale_for_seconds"] = round(age_seconds, 1)
+    degraded.append(entry)
+
+
+def degraded_inputs():
+    return list(_degraded.get() or [])
+
+
+def context_submit(pool, fn, *args, **kwargs):
+    """pool.submit that carries the caller's budget (and other contextvars) into the worker thread."""
+    ctx = contextvars.copy_context()
+    return pool.submit(ctx.run, fn, *args, **kwargs)
@@ -0,0 +1,210 @@
+import os
+import time
+import random
+import logging
+import threading
+from collections import defaultdict
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from api import metrics
+
+# --- One shared client for every upstream (Nominatim, NASA POWER, ISRIC, OpenWeather,
+# AgroMonitoring, LibreTranslate) ---
+# A keep-alive Session per host so repeated calls skip TCP+TLS setup, per-source
+# (connect, read) timeouts so no socket can hang a worker, bounded jittered
+# retries for GETs only, and a per-host circuit breaker that fails fast while an
+# upstream is down.
+
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "16"))  # ≥ UPSTREAM_POOL_SIZE fan-out
+HTTP_MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "2"))
+HTTP_BACKOFF_BASE = float(os.getenv("HTTP_BACKOFF_BASE", "0.25"))  # seconds
+HTTP_BACKOFF_MAX = float(os.getenv("HTTP_BACKOFF_MAX", "2.0"))
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Consecutive failures that open a host's breaker, and how long it stays open
+BREAKER_FAILURES = int(os.getenv("HTTP_BREAKER_FAILURES", "5"))
+BREAKER_RESET_SECONDS = float(os.getenv("HTTP_BREAKER_RESET_SECONDS", "30"))
+
+# --- Per-source (connect, read) timeouts in seconds; override with HTTP_TIMEOUT_<SOURCE>="connect,read" ---
+SOURCE_TIMEOUTS = {
+    "geocode": (3.05, 10),
+    "soil": (3.05, 10),        # ISRIC SoilGrids is slow but answers
+    "weather": (3.05, 15),     # NASA POWER daily point query
+    "forecast": (3.05, 10),
+    "agromonitoring": (3.05, 10),
+    "translate": (3.05, 15),
+}
+DEFAULT_TIMEOUT = (3.05, 10)
+
+
+def source_timeout(source):
+    override = os.getenv(f"HTTP_TIMEOUT_{source.upper()}")
+    if override:
+        connect, read = (float(v) for v in override.split(","))
+        return connect, read
+    return SOURCE_TIMEOUTS.get(source, DEFAULT_TIMEOUT)
+
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """Raised without touching the network while a host's breaker is open."""
+
+
+class CircuitBreaker:
+    """closed → (N consecutive failures) → open → (reset timeout) → half-open: one probe decides."""
+
+    def __init__(self, failures=BREAKER_FAILURES, reset_seconds=BREAKER_RESET_SECONDS):
+        self.max_failures = failures
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+        self.lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_seconds:
+            return "half_open"
+        return "open"
+
+    def allow(self):
+        with self.lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half_open" and not self.probing:
+                self.probing = True
+                return True
+            return False
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.probing = False
+
+    def release(self):
+        """A probe ended without saying anything about the host (e.g. a malformed request)."""
+        with self.lock:
+            self.probing = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.probing or self.failures >= self.max_failures:
+                self.opened_at = time.monotonic()
+            self.probing = False
+
+
+class HttpClient:
+    def __init__(self, pool_size=HTTP_POOL_SIZE):
+        self.pool_size = pool_size
+        self._sessions = {}
+        self._breakers = {}
+        self._lock = threading.Lock()
+        self._stats = defaultdict(lambda: defaultdict(int))
+
+    def _host(self, url):
+        parsed = urlparse(url)
+        return f"{parsed.scheme}://{parsed.netloc}"
+
+    def _session(self, host):
+        with self._lock:
+            if host not in self._sessions:
+                session = requests.Session()
+                # Retries are handled below (GET only, with jitter), never by urllib3
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, max_retries=0)
+                session.mount(host, adapter)
+                self._sessions[host] = session
+                self._breakers[host] = CircuitBreaker()
+            return self._sessions[host], self._breakers[host]
+
+    def _count(self, host, event):
+        with self._lock:
+            self._stats[host][event] += 1
+
+    def request(self, method, source, url, retries=0, **kwargs):
+        host = self._host(url)
+        session, breaker = self._session(host)
+        kwargs.setdefault("timeout", source_timeout(source))
+
+        for attempt in range(retries + 1):
+            if not breaker.allow():
+                self._count(host, "short_circuited")
+                metrics.inc("agri_upstream_errors_total", source=source, kind="circuit_open")
+                raise CircuitOpenError(f"Circuit open for {host} ({source})")
+            self._count(host, "requests")
+            start = time.perf_counter()
+            try:
+                response = session.request(method, url, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                metrics.observe("agri_upstream_request_duration_seconds", time.perf_counter() - start, source=source)
+                kind = "timeout" if isinstance(e, requests.exceptions.Timeout) else "connection"
+                metrics.inc("agri_upstream_errors_total", source=source, kind=kind)
+                breaker.record_failure()
+                self._count(host, "failures")
+                if attempt >= retries:
+                    raise
+                logging.warning(f"{source}: {type(e).__name__} from {host}, retrying ({attempt + 1}/{retries})")
+                time.sleep(backoff_seconds(attempt))
+                continue
+            except Exception:
+                breaker.release()
+                raise
+            metrics.observe("agri_upstream_request_duration_seconds", time.perf_counter() - start, source=source)
+            if response.status_code >= 400:
+                metrics.inc("agri_upstream_errors_total", source=source, kind="status")
+
+            if response.status_code in RETRY_STATUSES:
+                breaker.record_failure()
+                self._count(host, "failures")
+                if attempt >= retries:
+                    return response  # caller decides (raise_for_status / status check)
+                logging.warning(f"{source}: HTTP {response.status_code} from {host}, retrying ({attempt + 1}/{retries})")
+                time.sleep(backoff_seconds(attempt, response.headers.get("Retry-After")))
+                continue
+
+            breaker.record_success()
+            return response
+
+    def stats(self):
+        with self._lock:
+            hosts = list(self._sessions)
+            counters = {host: dict(self._stats[host]) for host in hosts}
+        return {
+            host: {**counters[host], "breaker": self._breakers[host].state,
+                   "consecutive_failures": self._breakers[host].failures}
+            for host in hosts
+        }
+
+
+def backoff_seconds(attempt, retry_after=None):
+    """Full jitter: uniform(0, min(max, base * 2^attempt)); honours a numeric Retry-After up to the cap."""
+    if retry_after is not None:
+        try:
+            return min(float(retry_after), HTTP_BACKOFF_MAX)
+        except ValueError:
+            pass
+    return random.uniform(0, min(HTTP_BACKOFF_MAX, HTTP_BACKOFF_BASE * (2 ** attempt)))
+
+
+# Shared by every fetcher in Api_data.py
+http_client = HttpClient()
+
+
+def http_get(source, url, retries=HTTP_MAX_RETRIES, **kwargs):
+    """Idempotent GET: pooled, timed out per source, retried with jittered backoff."""
+    return http_client.request("GET", source, url, retries=retries, **kwargs)
+
+
+def http_post(source, url, **kwargs):
+    """POST: pooled and timed out, but never retried (not idempotent)."""
+    return http_client.request("POST", source, url, retries=0, **kwargs)
+
+
+def http_stats():
+    return http_client.stats()
@@ -0,0 +1,29 @@
+import os
+import json
+import random
+import logging
+
+# --- Structured, leveled, sampled logging for the request hot paths ---
+# log_event("pest.model_input", rows=rows) writes one JSON line such as
+#   {"event": "pest.model_input", "rows": [...]}
+# through the "agri" logger. The level check comes first, so a disabled event
+# costs one isEnabledFor() call: fields are passed by reference and only
+# serialized when the line is actually written. Payload dumps (sample=True) are
+# additionally kept for only AGRI_LOG_SAMPLE_RATE of the calls; errors and
+# warnings are never sampled away.
+#
+#   AGRI_LOG_LEVEL=DEBUG AGRI_LOG_SAMPLE_RATE=1 python backend/app.py   # every payload
+
+AGRI_LOG_LEVEL = os.getenv("AGRI_LOG_LEVEL", "INFO").upper()
+AGRI_LOG_SAMPLE_RATE = float(os.getenv("AGRI_LOG_SAMPLE_RATE", "0.1"))
+
+logger = logging.getLogger("agri")
+logger.setLevel(AGRI_LOG_LEVEL)
+
+
+def log_event(event, level=logging.DEBUG, sample=False, **fields):
+    if not logger.isEnabledFor(level):
+        return
+    if sample and random.random() >= AGRI_LOG_SAMPLE_RATE:
+        return
+    logger.log(level, json.dumps({"event": event, **fields}, default=str, ensure_ascii=False))
@@ -0,0 +1,141 @@
+import os
+import time
+import bisect
+import functools
+import threading
+from contextlib import contextmanager
+
+# --- In-process latency histograms + counters, exposed by app.py at /metrics ---
+# Stage histograms (agri_stage_duration_seconds):
+#   geocode / weather / soil / forecast   resolution as the request sees it (cache hits included)
+#   encoding / inference / formatting      build_*_features / predict_*_rows / format_*_result, per model
+#   serialization                          JSON encoding of the response body
+# Upstream histograms (agri_upstream_request_duration_seconds) time each HTTP
+# attempt, and the counters record upstream errors, timeouts and the budget
+# fallbacks served instead (api/cache.py). Nothing here leaves the process;
+# Prometheus scrapes /metrics in the text exposition format.
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+
+# Seconds; upper bounds of the cumulative buckets (+Inf is implicit)
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+HELP = {
+    "agri_stage_duration_seconds": "Time spent per request stage.",
+    "agri_upstream_request_duration_seconds": "Duration of each upstream HTTP attempt.",
+    "agri_http_request_duration_seconds": "End-to-end duration of API requests.",
+    "agri_upstream_errors_total": "Upstream HTTP failures by kind (timeout, connection, status, circuit_open).",
+    "agri_upstream_fallbacks_total": "Upstream values served from a stale copy or default, by reason.",
+}
+
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+
+class Registry:
+    def __init__(self):
+        self._histograms = {}   # (name, labels) -> Histogram
+        self._counters = {}     # (name, labels) -> int
+        self._lock = threading.Lock()
+
+    def observe(self, name, seconds, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(seconds)
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def clear(self):
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+    def render(self):
+        """Prometheus text exposition format (version 0.0.4)."""
+        with self._lock:
+            histograms = {key: (list(h.counts), h.sum, h.buckets) for key, h in self._histograms.items()}
+            counters = dict(self._counters)
+
+        lines = []
+        for name in sorted({name for name, _ in histograms}):
+            lines += [f"# HELP {name} {HELP.get(name, name)}", f"# TYPE {name} histogram"]
+            for (metric, labels), (counts, total, buckets) in sorted(histograms.items()):
+                if metric != name:
+                    continue
+                cumulative = 0
+                for bound, count in zip(buckets, counts):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_labels(labels, le=repr(bound))} {cumulative}")
+                cumulative += counts[-1]
+                lines.append(f"{name}_bucket{_labels(labels, le='+Inf')} {cumulative}")
+                lines.append(f"{name}_sum{_labels(labels)} {total:.6f}")
+                lines.append(f"{name}_count{_labels(labels)} {cumulative}")
+        for name in sorted({name for name, _ in counters}):
+            lines += [f"# HELP {name} {HELP.get(name, name)}", f"# TYPE {name} counter"]
+            for (metric, labels), value in sorted(counters.items()):
+                if metric == name:
+                    lines.append(f"{name}{_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(labels, **extra):
+    pairs = list(labels) + list(extra.items())
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+registry = Registry()
+
+
+def observe(name, seconds, **labels):
+    if METRICS_ENABLED:
+        registry.observe(name, seconds, **labels)
+
+
+def inc(name, amount=1, **labels):
+    if METRICS_ENABLED:
+        registry.inc(name, amount, **labels)
+
+
+@contextmanager
+def timed(stage, **labels):
+    """with timed("inference", model="irrigation"): ... → agri_stage_duration_seconds{stage=...}"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe("agri_stage_duration_seconds", time.perf_counter() - start, stage=stage, **labels)
+
+
+def timed_stage(stage, **labels):
+    """Decorator form of timed()."""
+    def decorator(fn):
+        @functools.wraps(fn)  # also copies __dict__, so @cached's .uncached stays reachable
+        def wrapper(*args, **kwargs):
+            with timed(stage, **labels):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def render_metrics():
+    return registry.render()
@@ -0,0 +1,102 @@
+import os
+import io
+import hmac
+import time
+import re
+import uuid
+import pstats
+import logging
+import cProfile
+import threading
+
+from api.logs import log_event
+
+# --- Opt-in per-request profiling (admin only) ---
+# Disabled unless PROFILE_TOKEN is set. A request then opts in with
+#   X-Profile-Token: <token>      (or ?profile=<token>)
+# and is run under cProfile. The response gains a "profile" object (top
+# functions by cumulative time, wall vs CPU seconds) and an X-Request-ID
+# header, and the full call tree is stored as <PROFILE_DIR>/<request_id>.prof
+# (pstats / snakeviz) plus a .txt rendering.
+#
+# cProfile follows the request thread only: upstream fetches run on the pool
+# threads in api/context.py, so time spent waiting on a socket shows up as
+# wall ≫ CPU with the request thread parked in future.result().
+# Requests without the token pay one dict lookup. Only one request is profiled
+# at a time (newer Pythons allow a single active profiler per process).
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN")
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.abspath(os.path.join(BASE_DIR, "..", "cache", "profiles")))
+PROFILE_TOP_N = int(os.getenv("PROFILE_TOP_N", "25"))
+
+_active = threading.Lock()
+_REQUEST_ID = re.compile(r"^[A-Za-z0-9._-]{1,64}$")  # it becomes a file name
+
+
+def profile_requested(headers, args):
+    """True only for a request carrying the configured admin token."""
+    if not PROFILE_TOKEN:
+        return False
+    supplied = headers.get("X-Profile-Token") or args.get("profile")
+    # Bytes: compare_digest rejects non-ASCII str, and a bad token must only mean "not profiled"
+    return supplied is not None and hmac.compare_digest(supplied.encode("utf-8"), PROFILE_TOKEN.encode("utf-8"))
+
+
+class RequestProfile:
+    def __init__(self, request_id=None, path=None):
+        self.request_id = request_id if request_id and _REQUEST_ID.match(request_id) else uuid.uuid4().hex
+        self.path = path
+        self.profiler = None
+
+    def start(self):
+        """False if another request is being profiled right now."""
+        if not _active.acquire(blocking=False):
+            return False
+        self.profiler = cProfile.Profile()
+        self._wall = time.perf_counter()
+        self._cpu_thread = time.thread_time()
+        self._cpu_process = time.process_time()
+        self.profiler.enable()
+        return True
+
+    def stop(self):
+        self.profiler.disable()
+        self.wall_seconds = time.perf_counter() - self._wall
+        self.cpu_thread_seconds = time.thread_time() - self._cpu_thread
+        self.cpu_process_seconds = time.process_time() - self._cpu_process
+        _active.release()
+
+    def report(self, top_n=PROFILE_TOP_N):
+        stats = pstats.Stats(self.profiler)
+        rows = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)[:top_n]
+        return {
+            "request_id": self.request_id,
+            "path": self.path,
+            "wall_seconds": round(self.wall_seconds, 6),
+            # request thread only, vs every thread in the process (upstream pool, other requests)
+            "cpu_seconds": round(self.cpu_thread_seconds, 6),
+            "process_cpu_seconds": round(self.cpu_process_seconds, 6),
+            "waiting_seconds": round(max(0.0, self.wall_seconds - self.cpu_thread_seconds), 6),
+            "top_cumulative": [
+                {"function": pstats.func_std_string(key), "calls": calls, "total_seconds": round(total, 6),
+                 "cumulative_seconds": round(cumulative, 6)}
+                for key, (_, calls, total, cumulative, _) in rows
+            ],
+        }
+
+    def save(self, directory=PROFILE_DIR):
+        """Write <request_id>.prof (raw stats) and <request_id>.txt; returns the .prof path."""
+        os.makedirs(directory, exist_ok=True)
+        base = os.path.join(directory, self.request_id)
+        self.profiler.dump_stats(base + ".prof")
+        text = io.StringIO()
+        text.write(f"request {self.request_id} {self.path}\n"
+                   f"wall {self.wall_seconds:.6f}s  cpu (request thread) {self.cpu_thread_seconds:.6f}s  "
+                   f"cpu (process) {self.cpu_process_seconds:.6f}s\n\n")
+        pstats.Stats(self.profiler, stream=text).sort_stats("cumulative").print_stats(PROFILE_TOP_N * 4)
+        with open(base + ".txt", "w") as f:
+            f.write(text.getvalue())
+        log_event("profile.saved", level=logging.INFO, request_id=self.request_id, path=self.path,
+                  file=base + ".prof", wall_seconds=self.wall_seconds, cpu_seconds=self.cpu_thread_seconds)
+        return base + ".prof"
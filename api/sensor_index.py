@@ -0,0 +1,100 @@
+import os
+import threading
+import logging
+import pandas as pd
+
+from models.datastore import read_dataset
+
+# --- Aggregate index over backend/sensor_Crop_Dataset.csv ---
+# Built once per process; every lookup afterwards is a dict hit.
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+SENSOR_DATASET_PATH = os.path.abspath(os.path.join(BASE_DIR, "..", "backend", "sensor_Crop_Dataset.csv"))
+# Only these columns are read (projected from the columnar copy, see models/datastore.py)
+SENSOR_COLUMNS = ["Nitrogen", "Phosphorus", "Potassium", "pH_Value", "Crop", "Soil_Type"]
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def _norm(value):
+    return str(value).strip().lower()
+
+
+def _rollup(df):
+    return {
+        "N": float(df["Nitrogen"].mean()),
+        "P": float(df["Phosphorus"].mean()),
+        "K": float(df["Potassium"].mean()),
+        "ph": float(df["pH_Value"].mean()),
+        "soil_type": df["Soil_Type"].mode()[0],
+        "rows": int(len(df)),
+    }
+
+
+def build_sensor_index(df):
+    """
+    Precompute means keyed by (soil_type, crop), by soil_type, by crop and
+    globally. Keys are lower-cased so lookups are case-insensitive.
+    """
+    if df.empty:
+        return {"by_soil_crop": {}, "by_soil": {}, "by_crop": {}, "global": None}
+
+    soil_key = df["Soil_Type"].map(_norm)
+    crop_key = df["Crop"].map(_norm)
+    return {
+        "by_soil_crop": {key: _rollup(g) for key, g in df.groupby([soil_key, crop_key])},
+        "by_soil": {key: _rollup(g) for key, g in df.groupby(soil_key)},
+        "by_crop": {key: _rollup(g) for key, g in df.groupby(crop_key)},
+        "global": _rollup(df),
+    }
+
+
+def load_sensor_index(path=SENSOR_DATASET_PATH):
+    """Load the dataset and (re)build the index. Safe to call from several threads."""
+    global _index
+    with _index_lock:
+        try:
+            df = read_dataset(path, columns=SENSOR_COLUMNS)
+        except Exception as e:
+            logging.error(f"Could not load sensor dataset from {path}: {e}")
+            df = pd.DataFrame()
+        _index = build_sensor_index(df)
+        return _index
+
+
+def get_sensor_index():
+    if _index is None:
+        return load_sensor_index()
+    return _index
+
+
+def lookup_npk(soil_type, crop):
+    """Mean Nitrogen/Phosphorus/Potassium for an exact (soil_type, crop) pair, or None."""
+    entry = get_sensor_index()["by_soil_crop"].get((_norm(soil_type), _norm(crop)))
+    if entry is None:
+        return None
+    return {"Nitrogen": entry["N"], "Phosphorus": entry["P"], "Potassium": entry["K"]}
+
+
+def lookup_soil_ph(soil_type=None, crop=None):
+    """
+    Mean pH filtered by soil_type and/or crop, falling back to the global mean
+    when the filter matches nothing. Returns (ph, soil_type) or None if the
+    dataset could not be loaded.
+    """
+    index = get_sensor_index()
+    if index["global"] is None:
+        return None
+
+    if soil_type and crop:
+        entry = index["by_soil_crop"].get((_norm(soil_type), _norm(crop)))
+    elif soil_type:
+        entry = index["by_soil"].get(_norm(soil_type))
+    elif crop:
+        entry = index["by_crop"].get(_norm(crop))
+    else:
+        entry = index["global"]
+
+    if entry is None:
+        return index["global"]["ph"], soil_type or "Unknown"
+    return entry["ph"], entry["soil_type"]
@@ -0,0 +1,51 @@
+import threading
+from concurrent.futures import Future
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls for the same key: the first caller (the leader)
+    runs fn, everyone who arrives while it is in flight gets the same Future.
+    Nothing is remembered once the call finishes — caching is the cache's job.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def call(self, key, fn, *args, executor=None):
+        """
+        (future, is_leader). The leader runs fn(*args) on `executor`, or inline
+        in the calling thread when executor is None (the future is then done
+        before this returns).
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                return future, False
+            future = Future()
+            self._calls[key] = future
+
+        def run():
+            try:
+                result = fn(*args)
+            except BaseException as e:
+                self._forget(key)
+                future.set_exception(e)
+            else:
+                self._forget(key)
+                future.set_result(result)
+
+        if executor is None:
+            run()
+        else:
+            executor.submit(run)
+        return future, True
+
+    def _forget(self, key):
+        with self._lock:
+            self._calls.pop(key, None)
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._calls)
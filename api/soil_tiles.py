@@ -0,0 +1,188 @@
+"""
+Persistent tile cache for ISRIC SoilGrids pH + WRB class.
+
+    python api/soil_tiles.py --prefill 20.0 22.5 80.0 83.5   # lat_min lat_max lon_min lon_max
+    python api/soil_tiles.py --info
+
+Soil is static at field scale, so coordinates are quantized to square tiles
+of SOIL_TILE_DEG degrees (default 0.05° ≈ 5.5 km) and the first ISRIC answer
+inside a tile is kept for every later point in it. Only complete answers
+(pH and WRB class) are stored; fetch_isric_soil() treats a partial one as a
+failure, so the tile stays open for a later, complete answer. get_soil_ph_and_type()
+consults this store before the network; a known tile never triggers an HTTP
+call. Tiles are keyed by tile size too, so changing SOIL_TILE_DEG starts a
+fresh set instead of mixing resolutions.
+"""
+import os
+import sys
+import json
+import math
+import time
+import sqlite3
+import logging
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+SOIL_TILE_DB_PATH = os.getenv(
+    "SOIL_TILE_DB_PATH", os.path.abspath(os.path.join(BASE_DIR, "..", "cache", "soil_tiles.sqlite3"))
+)
+SOIL_TILE_DEG = float(os.getenv("SOIL_TILE_DEG", "0.05"))
+PREFILL_WORKERS = int(os.getenv("SOIL_PREFILL_WORKERS", "4"))  # ISRIC is rate limited
+
+
+def tile_index(lat, lon, size=SOIL_TILE_DEG):
+    """(row, col) of the tile containing the point."""
+    return math.floor(float(lat) / size), math.floor(float(lon) / size)
+
+
+def tile_center(row, col, size=SOIL_TILE_DEG):
+    return round((row + 0.5) * size, 6), round((col + 0.5) * size, 6)
+
+
+class SoilTileStore:
+    """SQLite-backed, with an in-process dict in front (tiles never change once stored)."""
+
+    def __init__(self, path=SOIL_TILE_DB_PATH, size=SOIL_TILE_DEG):
+        self.path = path
+        self.size = size
+        self._local = threading.local()
+        self._memory = {}
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS soil_tiles ("
+                " tile_deg REAL NOT NULL, tile_row INTEGER NOT NULL, tile_col INTEGER NOT NULL,"
+                " ph REAL, wrb_class TEXT, soil_type TEXT,"
+                " source_lat REAL NOT NULL, source_lon REAL NOT NULL, fetched_at REAL NOT NULL,"
+                " PRIMARY KEY (tile_deg, tile_row, tile_col))"
+            )
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            self._local.conn = conn
+        return conn
+
+    def get_tile(self, row, col):
+        key = (row, col)
+        with self._lock:
+            if key in self._memory:
+                return self._memory[key]
+        found = self._connect().execute(
+            "SELECT ph, wrb_class, soil_type FROM soil_tiles WHERE tile_deg = ? AND tile_row = ? AND tile_col = ?",
+            (self.size, row, col)
+        ).fetchone()
+        if found is None:
+            return None
+        tile = {"ph": found[0], "wrb_class": found[1], "soil_type": found[2]}
+        with self._lock:
+            self._memory[key] = tile
+        return tile
+
+    def lookup(self, lat, lon):
+        """{"ph", "wrb_class", "soil_type"} for the point's tile, or None if the tile is unknown."""
+        return self.get_tile(*tile_index(lat, lon, self.size))
+
+    def store(self, lat, lon, ph, wrb_class, soil_type):
+        row, col = tile_index(lat, lon, self.size)
+        with self._connect() as conn:
+            # First answer wins: concurrent fetches for one tile keep a single value
+            conn.execute(
+                "INSERT OR IGNORE INTO soil_tiles"
+                " (tile_deg, tile_row, tile_col, ph, wrb_class, soil_type, source_lat, source_lon, fetched_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (self.size, row, col, ph, wrb_class, soil_type, float(lat), float(lon), time.time())
+            )
+        with self._lock:
+            self._memory.pop((row, col), None)
+        return self.get_tile(row, col)
+
+    def clear(self):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM soil_tiles WHERE tile_deg = ?", (self.size,))
+        with self._lock:
+            self._memory.clear()
+
+    def count(self):
+        return self._connect().execute(
+            "SELECT COUNT(*) FROM soil_tiles WHERE tile_deg = ?", (self.size,)
+        ).fetchone()[0]
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_soil_tile_store():
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = SoilTileStore()
+        return _store
+
+
+def lookup_soil_tile(lat, lon):
+    try:
+        return get_soil_tile_store().lookup(lat, lon)
+    except Exception as e:
+        logging.warning(f"Soil tile lookup failed: {e}")
+        return None
+
+
+def is_complete_answer(isric):
+    """Worth keeping for the whole tile: both ISRIC queries answered."""
+    return isric is not None and isric["ph"] is not None and bool(isric["wrb_class"])
+
+
+def store_soil_tile(lat, lon, ph, wrb_class, soil_type):
+    try:
+        return get_soil_tile_store().store(lat, lon, ph, wrb_class, soil_type)
+    except Exception as e:
+        logging.warning(f"Soil tile write failed: {e}")
+        return None
+
+
+def prefill_bbox(lat_min, lat_max, lon_min, lon_max, workers=PREFILL_WORKERS):
+    """Fetch ISRIC at the center of every unknown tile in the bounding box."""
+    from api.Api_data import fetch_isric_soil, map_soil_type
+
+    store = get_soil_tile_store()
+    row_min, col_min = tile_index(lat_min, lon_min, store.size)
+    row_max, col_max = tile_index(lat_max, lon_max, store.size)
+    todo = [(r, c) for r in range(row_min, row_max + 1) for c in range(col_min, col_max + 1)
+            if store.get_tile(r, c) is None]
+    print(f"🧱 {len(todo)} unknown tiles of {(row_max - row_min + 1) * (col_max - col_min + 1)} in the box")
+
+    def fill(tile):
+        lat, lon = tile_center(*tile, store.size)
+        isric = fetch_isric_soil.uncached(lat, lon)
+        if not is_complete_answer(isric):
+            return False  # left unfilled so a later run can retry it
+        wrb_class = isric["wrb_class"]
+        store.store(lat, lon, isric["ph"], wrb_class, map_soil_type(wrb_class))
+        return True
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="soil-prefill") as pool:
+        results = list(pool.map(fill, todo))
+    summary = {"tiles": len(todo), "filled": sum(results), "failed": len(results) - sum(results)}
+    print(f"✅ Soil tiles prefilled: {summary}")
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Prefill the ISRIC soil tile cache")
+    parser.add_argument("--prefill", nargs=4, type=float, metavar=("LAT_MIN", "LAT_MAX", "LON_MIN", "LON_MAX"))
+    parser.add_argument("--info", action="store_true")
+    args = parser.parse_args()
+
+    if args.prefill:
+        prefill_bbox(*args.prefill)
+    store = get_soil_tile_store()
+    print(json.dumps({"path": store.path, "tile_deg": store.size, "tiles": store.count()}, indent=2))
@@ -0,0 +1,65 @@
+"""
+Local stand-in for LibreTranslate's /translate, for development and load tests.
+
+    python api/translate_standin.py --port 5050
+    LIBRETRANSLATE_URL=http://127.0.0.1:5050/translate python backend/app.py
+
+Accepts the same request shape (JSON or form, "q" as a string or a list) and
+"translates" by tagging each text with the target language, leaving
+placeholder tokens intact. GET /stats reports how many calls and texts it
+has served, which makes batching and caching easy to check.
+"""
+import time
+import argparse
+import threading
+from flask import Flask, jsonify, request
+
+app = Flask(__name__)
+_stats = {"requests": 0, "texts": 0}
+_stats_lock = threading.Lock()
+DELAY_SECONDS = 0.0
+
+
+@app.route("/translate", methods=["POST"])
+def translate():
+    if request.is_json:
+        data = request.get_json(silent=True) or {}
+        q, target = data.get("q"), data.get("target")
+    else:
+        # Form posts: a repeated "q" field is a list
+        values = request.form.getlist("q")
+        q = values if len(values) > 1 else request.form.get("q")
+        target = request.form.get("target")
+    if q is None or not target:
+        return jsonify({"error": "Invalid request: missing q or target"}), 400
+
+    texts = q if isinstance(q, list) else [q]
+    with _stats_lock:
+        _stats["requests"] += 1
+        _stats["texts"] += len(texts)
+    if DELAY_SECONDS:
+        time.sleep(DELAY_SECONDS)
+
+    translated = [f"[{target}] {text}" for text in texts]
+    return jsonify({"translatedText": translated if isinstance(q, list) else translated[0]})
+
+
+@app.route("/languages")
+def languages():
+    return jsonify([{"code": code, "name": code, "targets": ["en", "hi", "mr", "ta", "te"]}
+                    for code in ("en", "hi", "mr", "ta", "te")])
+
+
+@app.route("/stats")
+def stats():
+    with _stats_lock:
+        return jsonify(dict(_stats))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="LibreTranslate stand-in")
+    parser.add_argument("--port", type=int, default=5050)
+    parser.add_argument("--delay-ms", type=float, default=0.0, help="Added latency per call")
+    args = parser.parse_args()
+    DELAY_SECONDS = args.delay_ms / 1000
+    app.run(port=args.port, threaded=True)
@@ -0,0 +1,201 @@
+"""
+Cached, batched translation of advisory text (LibreTranslate).
+
+    python api/translation.py --lang hi "Continue regular monitoring."
+    LIBRETRANSLATE_URL=http://127.0.0.1:5050/translate python api/translation.py --lang hi "..."
+
+Advisories are built from a small set of fixed sentence templates with values
+filled in ("Pest risk is LOW for {crop} at {growth_stage} stage."). Only the
+templates are translated, once per target language; they are kept in the
+upstream cache under source "translation" (never expires, persisted in the
+SQLite tier) and the values are filled in locally, so a new number or crop
+name never costs an HTTP call. Every template a response is missing goes to
+LibreTranslate in one request ("q" as a list).
+
+Placeholders are sent as numbered tokens ({0}, {1}, ...) and checked on the
+way back; a translation that lost or duplicated one is not used. Untranslated
+templates fall back to English and the request is marked degraded.
+
+For development point LIBRETRANSLATE_URL at a local LibreTranslate or at the
+stand-in in api/translate_standin.py.
+"""
+import os
+import re
+import sys
+import json
+import logging
+import argparse
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from api import cache
+from api.deadline import remaining, mark_degraded
+from api.http_client import http_post
+from api.singleflight import SingleFlight
+
+LIBRETRANSLATE_URL = os.getenv("LIBRETRANSLATE_URL", "https://libretranslate.com/translate")
+LIBRETRANSLATE_API_KEY = os.getenv("LIBRETRANSLATE_API_KEY")
+SOURCE_LANGUAGE = "en"
+# Templates per HTTP call; a full set of advisory templates fits in one
+TRANSLATE_BATCH_SIZE = int(os.getenv("TRANSLATE_BATCH_SIZE", "64"))
+TRANSLATE_WORKERS = int(os.getenv("TRANSLATE_WORKERS", "2"))
+
+_PLACEHOLDER = re.compile(r"\{(\w+)\}")
+_TOKEN = re.compile(r"\{\s*(\d+)\s*\}")
+
+_translate_pool = ThreadPoolExecutor(max_workers=TRANSLATE_WORKERS, thread_name_prefix="translate")
+_in_flight = SingleFlight()
+
+
+# ---------------- Messages: (template, params) ----------------
+
+def msg(template, **params):
+    """One sentence: a fixed template plus the values to fill in. Values may be messages themselves."""
+    return (template, params)
+
+
+def is_message(value):
+    return isinstance(value, tuple) and len(value) == 2 and isinstance(value[0], str) and isinstance(value[1], dict)
+
+
+def render(message, translations=None):
+    """Fill a message in, using translations[template] where available (English otherwise)."""
+    template, params = message
+    if translations is not None:
+        template = translations.get(template, template)
+    values = {name: render(value, translations) if is_message(value) else value for name, value in params.items()}
+    return template.format(**values)
+
+
+def render_messages(messages, translations=None):
+    return " ".join(render(m, translations) for m in messages)
+
+
+def message_templates(messages):
+    """Every template used by the messages, nested ones included."""
+    templates = []
+    for template, params in messages:
+        templates.append(template)
+        templates.extend(message_templates([v for v in params.values() if is_message(v)]))
+    return templates
+
+
+# ---------------- Placeholder protection ----------------
+
+def protect(template):
+    """("Rain={rain}mm" → "Rain={0}mm", ["rain"]): numbered tokens survive translation better than names."""
+    names = []
+
+    def number(match):
+        names.append(match.group(1))
+        return "{%d}" % (len(names) - 1)
+
+    return _PLACEHOLDER.sub(number, template), names
+
+
+def restore(translated, names):
+    """Translated text back to a template; None if a placeholder was lost or duplicated."""
+    found = sorted(int(i) for i in _TOKEN.findall(translated))
+    if found != list(range(len(names))):
+        return None
+    parts = _TOKEN.split(translated)
+    # split() alternates text / token index; braces in the text itself must not be read as placeholders
+    return "".join(
+        "{" + names[int(part)] + "}" if i % 2 else part.replace("{", "{{").replace("}", "}}")
+        for i, part in enumerate(parts)
+    )
+
+
+# ---------------- LibreTranslate ----------------
+
+def _cache_key(lang, template):
+    return f"{lang}|{template}"
+
+
+def fetch_translations(templates, lang):
+    """
+    Translate templates with as few LibreTranslate calls as possible and store
+    each usable result. Returns {template: translated template}.
+    """
+    translations = {}
+    for start in range(0, len(templates), TRANSLATE_BATCH_SIZE):
+        chunk = templates[start:start + TRANSLATE_BATCH_SIZE]
+        protected = [protect(t) for t in chunk]
+        payload = {"q": [text for text, _ in protected], "source": SOURCE_LANGUAGE, "target": lang, "format": "text"}
+        if LIBRETRANSLATE_API_KEY:
+            payload["api_key"] = LIBRETRANSLATE_API_KEY
+
+        response = http_post("translate", LIBRETRANSLATE_URL, json=payload)
+        response.raise_for_status()
+        translated = response.json()["translatedText"]
+        if isinstance(translated, str):
+            translated = [translated]
+        if len(translated) != len(chunk):
+            raise ValueError(f"LibreTranslate returned {len(translated)} texts for {len(chunk)}")
+
+        for template, (_, names), text in zip(chunk, protected, translated):
+            restored = restore(text, names)
+            if restored is None:
+                logging.warning(f"Translation to {lang} dropped placeholders, keeping English: {template!r}")
+                continue
+            cache.upstream_cache.set("translation", _cache_key(lang, template), restored)
+            translations[template] = restored
+    return translations
+
+
+def translate_templates(templates, lang):
+    """
+    {template: template in `lang`} for every template. Cached templates cost
+    nothing; all misses go out in one batched call. Anything that could not be
+    translated (error, budget exceeded, placeholders lost) maps to itself.
+    """
+    templates = list(dict.fromkeys(templates))
+    if not lang or lang == SOURCE_LANGUAGE:
+        return {t: t for t in templates}
+
+    translations, missing = {}, []
+    for template in templates:
+        hit, value = cache.upstream_cache.get("translation", _cache_key(lang, template))
+        if hit:
+            translations[template] = value
+        else:
+            missing.append(template)
+
+    if missing:
+        budget = remaining()
+        try:
+            # Under a request budget the batch runs on the translate pool and keeps
+            # going (filling the cache) if the request stops waiting for it
+            future, leader = _in_flight.call(
+                (lang, tuple(missing)), fetch_translations, missing, lang,
+                executor=None if budget is None else _translate_pool,
+            )
+            if not leader:
+                cache.upstream_cache._count("translation", "coalesced")
+            translations.update(future.result(timeout=budget))
+            reason = "unavailable"
+        except FutureTimeout:
+            cache.upstream_cache._count("translation", "deadline_exceeded")
+            reason = "deadline"
+        except Exception as e:
+            logging.error(f"Translation to {lang} failed: {e}")
+            reason = "error"
+        if any(t not in translations for t in missing):
+            mark_degraded("translation", lang, "english", reason)
+
+    return {t: translations.get(t, t) for t in templates}
+
+
+def translate_messages(messages, lang):
+    """The messages rendered in `lang` (sentence by sentence English where no translation is available)."""
+    return render_messages(messages, translate_templates(message_templates(messages), lang))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Translate text through the template cache")
+    parser.add_argument("--lang", default="hi")
+    parser.add_argument("text", nargs="+")
+    args = parser.parse_args()
+
+    print(json.dumps(translate_templates(args.text, args.lang), indent=2, ensure_ascii=False))
+    print(json.dumps(cache.cache_stats().get("translation", {}), indent=2))
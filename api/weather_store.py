@@ -0,0 +1,306 @@
+"""
+Local gridded store of NASA POWER daily weather, filled by a nightly job.
+
+    python api/weather_store.py --update              # fetch only the days/cells still missing
+    python api/weather_store.py --update --days 21    # keep a longer history
+    python api/weather_store.py --info
+
+Layout (WEATHER_STORE_PATH, default cache/weather_grid/):
+    grid.json        bounding box, step and parameter order
+    YYYYMMDD.npy     float32 [n_lat, n_lon, len(PARAMETERS) + 1] per day; the
+                     last channel is 1 where the cell has been fetched
+
+get_last7days_weather() answers from here with an O(1) nearest-cell lookup
+(index arithmetic on the regular grid, days memory-mapped) and only calls
+NASA POWER live for points outside the grid or days not fetched yet. The job
+is incremental: each run fetches, per cell, just the contiguous range of days
+it is missing, and drops days older than the retention window.
+
+Run it nightly, e.g. from cron:
+    30 2 * * *  cd /srv/crop_yield_predictor && python api/weather_store.py --update
+"""
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import warnings
+import threading
+from datetime import datetime, timedelta, UTC
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from api.http_client import http_get
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+WEATHER_STORE_PATH = os.getenv(
+    "WEATHER_STORE_PATH", os.path.abspath(os.path.join(BASE_DIR, "..", "cache", "weather_grid"))
+)
+# Same parameters (and order) as get_last7days_weather's NASA POWER query
+PARAMETERS = ["T2M", "RH2M", "PRECTOTCORR", "ALLSKY_SFC_SW_DWN", "WS2M"]
+FEATURE_NAMES = {
+    "T2M": "temperature",
+    "RH2M": "humidity",
+    "PRECTOTCORR": "rainfall",
+    "ALLSKY_SFC_SW_DWN": "solar_radiation",
+    "WS2M": "windspeed",
+}
+FILLED = len(PARAMETERS)  # channel index of the "fetched" flag
+
+# Regular grid over India; 0.5° matches NASA POWER's meteorology resolution
+DEFAULT_GRID = {
+    "lat_min": float(os.getenv("WEATHER_GRID_LAT_MIN", "6.5")),
+    "lat_max": float(os.getenv("WEATHER_GRID_LAT_MAX", "37.5")),
+    "lon_min": float(os.getenv("WEATHER_GRID_LON_MIN", "68.0")),
+    "lon_max": float(os.getenv("WEATHER_GRID_LON_MAX", "97.5")),
+    "step": float(os.getenv("WEATHER_GRID_STEP", "0.5")),
+}
+RETENTION_DAYS = int(os.getenv("WEATHER_STORE_DAYS", "14"))
+PREFETCH_WORKERS = int(os.getenv("WEATHER_PREFETCH_WORKERS", "8"))
+NASA_POWER_POINT_URL = "https://power.larc.nasa.gov/api/temporal/daily/point"
+
+
+def _day(d):
+    return d.strftime("%Y%m%d")
+
+
+def _days_between(start, end):
+    """Inclusive list of YYYYMMDD strings."""
+    first, last = datetime.strptime(start, "%Y%m%d"), datetime.strptime(end, "%Y%m%d")
+    return [_day(first + timedelta(days=i)) for i in range((last - first).days + 1)]
+
+
+class WeatherGrid:
+    def __init__(self, lat_min, lat_max, lon_min, lon_max, step):
+        self.lat_min, self.lat_max = lat_min, lat_max
+        self.lon_min, self.lon_max = lon_min, lon_max
+        self.step = step
+        self.n_lat = int(round((lat_max - lat_min) / step)) + 1
+        self.n_lon = int(round((lon_max - lon_min) / step)) + 1
+
+    @property
+    def shape(self):
+        return self.n_lat, self.n_lon, len(PARAMETERS) + 1
+
+    def cell(self, lat, lon):
+        """(i, j) of the nearest grid point, or None outside the grid (half a step of slack)."""
+        i = int(round((float(lat) - self.lat_min) / self.step))
+        j = int(round((float(lon) - self.lon_min) / self.step))
+        if 0 <= i < self.n_lat and 0 <= j < self.n_lon:
+            return i, j
+        return None
+
+    def center(self, i, j):
+        return round(self.lat_min + i * self.step, 4), round(self.lon_min + j * self.step, 4)
+
+    def to_json(self):
+        return {"lat_min": self.lat_min, "lat_max": self.lat_max, "lon_min": self.lon_min,
+                "lon_max": self.lon_max, "step": self.step, "parameters": PARAMETERS}
+
+
+class WeatherStore:
+    """Read side: day arrays are memory-mapped and re-opened when the job rewrites them."""
+
+    def __init__(self, path=WEATHER_STORE_PATH):
+        self.path = path
+        self.grid = None
+        self._grid_mtime = None
+        self._days = {}
+        self._lock = threading.Lock()
+
+    def _load_grid(self):
+        grid_path = os.path.join(self.path, "grid.json")
+        try:
+            mtime = os.stat(grid_path).st_mtime_ns
+        except FileNotFoundError:
+            self.grid = None
+            return None
+        if mtime != self._grid_mtime:
+            with open(grid_path) as f:
+                spec = json.load(f)
+            if spec.get("parameters") != PARAMETERS:
+                logging.warning(f"Weather store at {self.path} has different parameters, ignoring it")
+                self.grid = None
+            else:
+                self.grid = WeatherGrid(spec["lat_min"], spec["lat_max"], spec["lon_min"], spec["lon_max"], spec["step"])
+            self._grid_mtime = mtime
+            self._days.clear()
+        return self.grid
+
+    def _day_array(self, day):
+        day_path = os.path.join(self.path, f"{day}.npy")
+        try:
+            mtime = os.stat(day_path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+        cached = self._days.get(day)
+        if cached is None or cached[0] != mtime:
+            cached = (mtime, np.load(day_path, mmap_mode="r"))
+            self._days[day] = cached
+        return cached[1]
+
+    def lookup(self, lat, lon, start, end):
+        """
+        get_last7days_weather-shaped dict of means over [start, end] for the nearest
+        cell, or None if the point is outside the grid or any day is not stored yet.
+        """
+        with self._lock:
+            grid = self._load_grid()
+            if grid is None:
+                return None
+            cell = grid.cell(lat, lon)
+            if cell is None:
+                return None
+            rows = []
+            for day in _days_between(start, end):
+                array = self._day_array(day)
+                if array is None or array[cell[0], cell[1], FILLED] != 1:
+                    return None
+                rows.append(np.asarray(array[cell[0], cell[1], :FILLED], dtype=np.float64))
+
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)  # all-NaN parameter → NaN, like the live path
+            means = np.nanmean(np.vstack(rows), axis=0)
+        return {FEATURE_NAMES[p]: float(v) for p, v in zip(PARAMETERS, means)}
+
+    def info(self):
+        with self._lock:
+            grid = self._load_grid()
+        if grid is None:
+            return {"path": self.path, "grid": None, "days": []}
+        days = sorted(f[:-4] for f in os.listdir(self.path) if f.endswith(".npy") and f[:-4].isdigit())
+        return {"path": self.path, "grid": grid.to_json(), "cells": grid.n_lat * grid.n_lon, "days": days}
+
+
+weather_store = WeatherStore()
+
+
+def lookup_weather(lat, lon, start, end):
+    try:
+        return weather_store.lookup(lat, lon, start, end)
+    except Exception as e:
+        logging.warning(f"Weather store lookup failed: {e}")
+        return None
+
+
+# ---------------- Prefetch job ----------------
+def _fetch_cell(lat, lon, start, end):
+    """{YYYYMMDD: [5 floats]} from NASA POWER for one point; -999 → NaN."""
+    params = {
+        "parameters": ",".join(PARAMETERS), "community": "AG", "latitude": lat, "longitude": lon,
+        "start": start, "end": end, "format": "JSON",
+    }
+    response = http_get("weather", NASA_POWER_POINT_URL, params=params)
+    response.raise_for_status()
+    data = response.json()["properties"]["parameter"]
+    values = {}
+    for day in data[PARAMETERS[0]]:
+        row = [float(data[p].get(day, -999.0)) for p in PARAMETERS]
+        values[day] = [np.nan if v == -999.0 else v for v in row]
+    return values
+
+
+def _write_day(path, day, array):
+    tmp = os.path.join(path, f".{day}.npy.tmp")
+    with open(tmp, "wb") as f:
+        np.save(f, array)
+    os.replace(tmp, os.path.join(path, f"{day}.npy"))
+
+
+def update_store(path=WEATHER_STORE_PATH, grid_spec=None, days=RETENTION_DAYS, end=None,
+                 workers=PREFETCH_WORKERS):
+    """
+    Incremental nightly update: for every cell fetch only the days it is missing
+    in the retention window ending at `end` (default: NASA POWER's latest day,
+    2 days ago), then drop older day files.
+    """
+    os.makedirs(path, exist_ok=True)
+    grid_path = os.path.join(path, "grid.json")
+    if os.path.exists(grid_path):
+        with open(grid_path) as f:
+            spec = json.load(f)
+        if grid_spec is not None and {k: spec[k] for k in DEFAULT_GRID} != grid_spec:
+            raise ValueError(f"{path} holds a different grid; use a new WEATHER_STORE_PATH")
+    else:
+        spec = dict(grid_spec or DEFAULT_GRID)
+        spec["parameters"] = PARAMETERS
+        with open(grid_path + ".tmp", "w") as f:
+            json.dump(spec, f, indent=2)
+        os.replace(grid_path + ".tmp", grid_path)
+    grid = WeatherGrid(spec["lat_min"], spec["lat_max"], spec["lon_min"], spec["lon_max"], spec["step"])
+
+    end = end or _day(datetime.now(UTC) - timedelta(days=2))
+    start = _day(datetime.strptime(end, "%Y%m%d") - timedelta(days=days - 1))
+    window = _days_between(start, end)
+
+    arrays = {}
+    for day in window:
+        day_path = os.path.join(path, f"{day}.npy")
+        if os.path.exists(day_path):
+            arrays[day] = np.load(day_path)
+        else:
+            arrays[day] = np.full(grid.shape, np.nan, dtype=np.float32)
+            arrays[day][:, :, FILLED] = 0
+
+    # Per cell: the contiguous span covering every day it is still missing
+    jobs = []
+    filled = np.stack([arrays[day][:, :, FILLED] == 1 for day in window])  # [days, n_lat, n_lon]
+    for i in range(grid.n_lat):
+        for j in range(grid.n_lon):
+            missing = np.flatnonzero(~filled[:, i, j])
+            if len(missing):
+                jobs.append((i, j, window[missing[0]], window[missing[-1]]))
+    print(f"🌦️ {len(jobs)} of {grid.n_lat * grid.n_lon} cells need data for {start}..{end}")
+
+    def run(job):
+        i, j, first, last = job
+        lat, lon = grid.center(i, j)
+        try:
+            return job, _fetch_cell(lat, lon, first, last)
+        except Exception as e:
+            logging.warning(f"NASA POWER fetch failed for cell {lat},{lon}: {e}")
+            return job, None
+
+    done = failed = 0
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="weather-prefetch") as pool:
+        for (i, j, _, _), values in pool.map(run, jobs):
+            if values is None:
+                failed += 1
+                continue
+            for day, row in values.items():
+                if day in arrays:
+                    arrays[day][i, j, :FILLED] = row
+                    # A day NASA has not published yet (all -999) is retried on the next run
+                    arrays[day][i, j, FILLED] = 0 if np.all(np.isnan(row)) else 1
+            done += 1
+            if done % 500 == 0:
+                print(f"   … {done}/{len(jobs)} cells")
+
+    for day in window:
+        _write_day(path, day, arrays[day])
+    for name in os.listdir(path):
+        if name.endswith(".npy") and name[:-4].isdigit() and name[:-4] < start:
+            os.remove(os.path.join(path, name))
+
+    summary = {"window": [start, end], "cells_fetched": done, "cells_failed": failed,
+               "seconds": round(time.perf_counter() - started, 1)}
+    print(f"✅ Weather store updated: {summary}")
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Prefetch NASA POWER daily weather into the local grid store")
+    parser.add_argument("--update", action="store_true", help="fetch missing days for every cell")
+    parser.add_argument("--days", type=int, default=RETENTION_DAYS, help="days of history to keep")
+    parser.add_argument("--end", help="last day to store (YYYYMMDD), default: 2 days ago")
+    parser.add_argument("--info", action="store_true", help="print grid and stored days")
+    args = parser.parse_args()
+
+    if args.update:
+        update_store(days=args.days, end=args.end)
+    if args.info or not args.update:
+        print(json.dumps(weather_store.info(), indent=2))
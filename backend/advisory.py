@@ -0,0 +1,118 @@
+import os, sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from api.context import resolve_location_context
+
+from fertilizers import run_fertilizer
+from yeild_prediction import run_yield
+from irrigation import run_irrigation
+from pest_control import run_pest_risk
+
+# ---------------- Unified input → per-model payloads ----------------
+# The combined endpoint takes one flat body (the union of every model's inputs):
+#   state, district, crop, N, P, K, area_acres, soil_type, variety,
+#   growth_stage, water_availability, source_of_water, field_slope
+# plus an optional "lang" (e.g. "hi") that adds translated suggestions.
+# Each model declares which of those it needs and how to map them onto the
+# field names its blueprint already understands. A nested object keyed by the
+# model name (e.g. "pest_control": {"Growth_Stage": "Flowering"}) overrides
+# the mapped payload for that model only.
+
+def _fertilizer_payload(data):
+    return {"state": data.get("state"), "district": data.get("district"), "crop": data.get("crop"),
+            "N": data.get("N"), "P": data.get("P"), "K": data.get("K")}
+
+
+def _yield_payload(data):
+    return {"state_name": data.get("state"), "dist_name": data.get("district"), "crop": data.get("crop"),
+            "area_in_acres": data.get("area_acres"), "soil_type": data.get("soil_type")}
+
+
+def _pest_payload(data):
+    return {"State": data.get("state"), "District": data.get("district"), "Crop": data.get("crop"),
+            "Variety": data.get("variety"), "Growth_Stage": data.get("growth_stage"),
+            "soil_type": data.get("soil_type")}
+
+
+def _irrigation_payload(data):
+    payload = {"state": data.get("state"), "district": data.get("district"), "crop_name": data.get("crop"),
+               "growth_stage": data.get("growth_stage"), "water_availability": data.get("water_availability"),
+               "source_of_water": data.get("source_of_water"), "field_slope": data.get("field_slope"),
+               "area_acres": data.get("area_acres", 0)}
+    if data.get("soil_type"):
+        payload["soil_type"] = data["soil_type"]
+    return payload
+
+
+ADVISORY_MODELS = {
+    "fertilizer": {
+        "required": ["crop", "N", "P", "K"],
+        "payload": _fertilizer_payload,
+        "run": run_fertilizer,
+    },
+    "yield_prediction": {
+        "required": ["crop", "area_acres", "soil_type"],
+        "payload": _yield_payload,
+        "run": run_yield,
+    },
+    "pest_control": {
+        "required": ["crop", "variety", "growth_stage", "soil_type"],
+        "payload": _pest_payload,
+        "run": run_pest_risk,
+    },
+    "irrigation": {
+        "required": ["crop", "growth_stage", "water_availability", "source_of_water", "field_slope"],
+        "payload": _irrigation_payload,
+        "run": run_irrigation,
+        "needs_forecast": True,
+    },
+}
+
+
+def _missing_fields(data, required):
+    return [field for field in required if data.get(field) in (None, "")]
+
+
+def run_advisory(data):
+    """
+    Resolve location, weather, soil (and forecast if irrigation can run) once,
+    then run every model whose inputs are present. Models with missing inputs
+    are reported under "skipped"; a failing model is reported under "errors"
+    without affecting the others.
+    """
+    if not data.get("state") or not data.get("district"):
+        raise ValueError("'state' and 'district' are required")
+
+    runnable, skipped = [], {}
+    for name, spec in ADVISORY_MODELS.items():
+        missing = _missing_fields(data, spec["required"])
+        if missing:
+            skipped[name] = {"missing": missing}
+        else:
+            runnable.append(name)
+
+    include_forecast = any(ADVISORY_MODELS[name].get("needs_forecast") for name in runnable)
+    context = resolve_location_context(data["state"], data["district"], include_forecast=include_forecast)
+
+    results, errors = {}, {}
+    for name in runnable:
+        spec = ADVISORY_MODELS[name]
+        payload = {**spec["payload"](data), **(data.get(name) or {})}
+        if data.get("lang"):
+            payload.setdefault("lang", data["lang"])
+        try:
+            results[name] = spec["run"](payload, context)
+        except Exception as e:
+            errors[name] = str(e)
+
+    return {
+        "state": data["state"],
+        "district": data["district"],
+        "location": {"lat": context["lat"], "lon": context["lon"]},
+        "weather": context["weather"],
+        "soil": context["soil"],
+        "forecast_rainfall": context["forecast"],
+        "results": results,
+        "skipped": skipped,
+        "errors": errors,
+    }
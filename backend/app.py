@@ -1,15 +1,117 @@
-from flask import Flask, jsonify
+from flask import Flask, Response, jsonify, request, g, has_request_context
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
+import os, sys, time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from api.cache import cache_stats
+from api.http_client import http_stats
+from api.deadline import start_budget, end_budget, degraded_inputs, REQUEST_BUDGET_SECONDS, BATCH_REQUEST_BUDGET_SECONDS
+from api.sensor_index import load_sensor_index, SENSOR_DATASET_PATH
+from api.metrics import observe, timed, render_metrics
+from api.profiling import profile_requested, RequestProfile
 
 # Import Blueprints
 from fertilizers import fertilizer_bp
 from yeild_prediction import yield_bp
 from irrigation import irrigation_bp
 from pest_control import pest_bp
+from advisory import run_advisory
+from model_store import register_model, start_background_loading, load_models, readiness, registry_info, reload_models, reload_authorized
+
+# ✅ Models + the sensor dataset index (NPK / soil pH fallbacks) are deserialized
+# concurrently in the background; nothing here touches the network.
+# Set PRELOAD_MODELS_BLOCKING=1 to finish loading before serving instead.
+register_model("sensor_index", load_sensor_index, SENSOR_DATASET_PATH)
+if os.getenv("PRELOAD_MODELS_BLOCKING") == "1":
+    load_models()
+else:
+    start_background_loading()
+
+
+class TimedJSONProvider(DefaultJSONProvider):
+    """Every jsonify() goes through here, so the "serialization" stage is timed in one place."""
+
+    def dumps(self, obj, **kwargs):
+        endpoint = request.endpoint if has_request_context() else None
+        with timed("serialization", endpoint=endpoint):
+            return super().dumps(obj, **kwargs)
+
 
 app = Flask(__name__)
+app.json = TimedJSONProvider(app)
 CORS(app)
 
+
+# 🔍 Opt-in profiling: only requests carrying PROFILE_TOKEN (X-Profile-Token header or ?profile=)
+# run under cProfile; registered first so it wraps every other hook
+@app.before_request
+def start_profile():
+    if not profile_requested(request.headers, request.args):
+        return
+    profile = RequestProfile(request.headers.get("X-Request-ID"), request.path)
+    if profile.start():
+        g.profile = profile
+    else:
+        g.profile_busy = True
+
+
+@app.after_request
+def attach_profile(response):
+    profile = g.pop("profile", None)
+    if profile is None:
+        if g.pop("profile_busy", False):
+            response.headers["X-Profile"] = "busy"
+        return response
+    profile.stop()
+    report = profile.report()
+    report["saved_to"] = profile.save()
+    response.headers["X-Request-ID"] = profile.request_id
+    if response.is_json:
+        body = response.get_json(silent=True)
+        if isinstance(body, dict):
+            body["profile"] = report
+            response.set_data(app.json.dumps(body))
+    return response
+
+
+@app.teardown_request
+def stop_abandoned_profile(exc=None):
+    profile = g.pop("profile", None)
+    if profile is not None:
+        profile.stop()
+
+
+# ✅ Request-wide upstream budget: slow weather/soil/forecast lookups fall back to the
+# last known value (or a documented default) instead of stalling the response
+@app.before_request
+def open_request_budget():
+    g.request_started = time.perf_counter()
+    batch = request.endpoint is not None and request.endpoint.endswith("_batch")
+    g.budget_tokens = start_budget(BATCH_REQUEST_BUDGET_SECONDS if batch else REQUEST_BUDGET_SECONDS)
+
+
+@app.after_request
+def flag_degraded_inputs(response):
+    degraded = degraded_inputs()
+    if degraded and response.is_json:
+        body = response.get_json(silent=True)
+        if isinstance(body, dict):
+            body["degraded"] = degraded
+            response.set_data(app.json.dumps(body))
+    started = g.get("request_started")
+    if started is not None:
+        observe("agri_http_request_duration_seconds", time.perf_counter() - started,
+                endpoint=request.endpoint, status=response.status_code)
+    return response
+
+
+@app.teardown_request
+def close_request_budget(exc=None):
+    tokens = g.pop("budget_tokens", None)
+    if tokens is not None:
+        end_budget(tokens)
+
 # Register all routes with prefixes
 app.register_blueprint(fertilizer_bp, url_prefix="/fertilizer")
 app.register_blueprint(yield_bp, url_prefix="/yield_prediction")
@@ -25,9 +127,62 @@ def home():
             "fertilizer": "/fertilizer/predict",
             "yield_prediction": "/yield_prediction/predict",
             "irrigation": "/irrigation/predict",
-            "pest_control": "/pest_control/predict"
+            "pest_control": "/pest_control/predict",
+            "advisory": "/advisory"
+        },
+        "batch_endpoints": {
+            "fertilizer": "/fertilizer/predict_batch",
+            "yield_prediction": "/yield_prediction/predict_batch",
+            "irrigation": "/irrigation/predict_batch",
+            "pest_control": "/pest_control/predict_batch"
         }
     })
 
+# ✅ Readiness probe: 200 only once every model is loaded (unlike "/", which is liveness)
+@app.route("/ready")
+def ready():
+    status = readiness()
+    return jsonify(status), (200 if status["ready"] else 503)
+
+# ✅ Active model versions + metadata, and artifacts discovered under models/*
+@app.route("/models")
+def models():
+    return jsonify(registry_info())
+
+# ✅ Load changed artifacts in the background and swap them in (e.g. after retraining)
+# Admin only (MODEL_RELOAD_TOKEN): each call can deserialize every model again
+@app.route("/models/reload", methods=["POST"])
+def models_reload():
+    if not reload_authorized(request.headers):
+        return jsonify({"error": "Forbidden: send X-Reload-Token (MODEL_RELOAD_TOKEN must be set)"}), 403
+    try:
+        name = request.args.get("name")
+        return jsonify({"active_versions": reload_models([name] if name else None)})
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+
+# ✅ All four models off one shared location/weather/soil context
+@app.route("/advisory", methods=["POST"])
+def advisory():
+    try:
+        return jsonify(run_advisory(request.get_json()))
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+
+# ✅ Upstream cache hit/miss counters (per source)
+@app.route("/cache/stats")
+def upstream_cache_stats():
+    return jsonify(cache_stats())
+
+# ✅ Upstream HTTP counters + circuit breaker state (per host)
+@app.route("/upstream/stats")
+def upstream_http_stats():
+    return jsonify(http_stats())
+
+# ✅ Stage latency histograms + upstream error/timeout counters (Prometheus text format)
+@app.route("/metrics")
+def metrics():
+    return Response(render_metrics(), mimetype="text/plain; version=0.0.4")
+
 if __name__ == "__main__":
     app.run(debug=True, port=5000)
@@ -0,0 +1,116 @@
+import os, sys
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from api.context import resolve_location_context
+from api.deadline import context_submit
+from api.metrics import timed
+
+# Separate from the upstream pool in api/context.py: each location job fans out into that pool itself
+BATCH_LOCATION_WORKERS = int(os.getenv("BATCH_LOCATION_WORKERS", "4"))
+MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", "10000"))
+
+
+def get_batch_records(body):
+    """Accept either a bare JSON list or {"records": [...]}."""
+    records = body.get("records") if isinstance(body, dict) else body
+    if not isinstance(records, list):
+        raise ValueError("Expected a JSON list of records or {\"records\": [...]}")
+    if len(records) > MAX_BATCH_SIZE:
+        raise ValueError(f"Batch too large: {len(records)} records (max {MAX_BATCH_SIZE})")
+    return records
+
+
+def _resolve_contexts(locations, include_forecast):
+    """Resolve each distinct (state, district) once; failures are kept per location."""
+    contexts = {}
+
+    def resolve(location):
+        try:
+            return resolve_location_context(location[0], location[1], include_forecast=include_forecast)
+        except Exception as e:
+            return e
+
+    with ThreadPoolExecutor(max_workers=BATCH_LOCATION_WORKERS) as pool:
+        # context_submit so every location shares the request's budget
+        futures = [context_submit(pool, resolve, location) for location in locations]
+        for location, future in zip(locations, futures):
+            contexts[location] = future.result()
+    return contexts
+
+
+def run_batch(records, location_keys, build, predict, format_result, include_forecast=False, model=None):
+    """
+    Score a list of records with one model call:
+      build(data, context)                     -> model input row for one record
+      predict(rows)                            -> list of per-row outputs (one vectorized call)
+      format_result(data, context, row, out)   -> JSON-ready dict for one record
+    Records are grouped by location so each district is resolved once. Any
+    per-record failure is reported inline as {"error": ...}. Stage timings are
+    recorded per whole batch under `model` (see api/metrics.py).
+    """
+    state_key, district_key = location_keys
+    results = [None] * len(records)
+
+    locations = []  # None where the record is rejected before any lookup
+    for i, data in enumerate(records):
+        location = None
+        if not isinstance(data, dict):
+            results[i] = {"error": "Record must be a JSON object"}
+        elif not all(value is None or isinstance(value, str) for value in (data.get(state_key), data.get(district_key))):
+            # Also keeps unhashable values (lists, objects) out of the grouping below
+            results[i] = {"error": f"'{state_key}' and '{district_key}' must be strings"}
+        else:
+            location = (data.get(state_key), data.get(district_key))
+        locations.append(location)
+    contexts = _resolve_contexts(list(dict.fromkeys(l for l in locations if l is not None)), include_forecast)
+
+    # Build model input rows
+    pending = []  # (index, data, context, row)
+    with timed("encoding", model=model, mode="batch"):
+        for i, (data, location) in enumerate(zip(records, locations)):
+            if location is None:
+                continue
+            context = contexts[location]
+            if isinstance(context, Exception):
+                results[i] = {"error": str(context)}
+                continue
+            try:
+                pending.append((i, data, context, build(data, context)))
+            except Exception as e:
+                results[i] = {"error": str(e)}
+
+    if not pending:
+        return _summary(results)
+
+    # One vectorized model call; if it fails, isolate the bad rows one by one
+    with timed("inference", model=model, mode="batch"):
+        try:
+            outputs = predict([row for _, _, _, row in pending])
+        except Exception:
+            outputs = []
+            for _, _, _, row in pending:
+                try:
+                    outputs.append(predict([row])[0])
+                except Exception as e:
+                    outputs.append(e)
+
+    with timed("formatting", model=model, mode="batch"):
+        for (i, data, context, row), out in zip(pending, outputs):
+            if isinstance(out, Exception):
+                results[i] = {"error": str(out)}
+                continue
+            try:
+                results[i] = format_result(data, context, row, out)
+            except Exception as e:
+                results[i] = {"error": str(e)}
+
+    return _summary(results)
+
+
+def _summary(results):
+    return {
+        "count": len(results),
+        "errors": sum(1 for r in results if "error" in r),
+        "results": results,
+    }
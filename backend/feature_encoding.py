@@ -0,0 +1,248 @@
+import math
+import threading
+import weakref
+import numpy as np
+import pandas as pd
+from sklearn.pipeline import Pipeline
+from sklearn.compose import ColumnTransformer
+from sklearn.preprocessing import StandardScaler, OrdinalEncoder, OneHotEncoder
+from inference import OnnxModel
+
+# ---------------- Precompiled feature encoders ----------------
+# Built once per fitted model (cached weakly, so a hot-reloaded version gets
+# its own) from the fitted encoders / ColumnTransformer. Request rows (dicts)
+# are mapped through plain dicts into a preallocated NumPy matrix and handed
+# straight to the final estimator — no DataFrame, no per-column pandas work.
+# Anything the compiler does not understand returns None so callers keep the
+# original pandas path.
+
+_compiled = weakref.WeakKeyDictionary()
+_compiled_lock = threading.Lock()
+
+
+def _to_float(value):
+    if value is None:
+        return math.nan
+    return float(value)
+
+
+def _cached(model, build):
+    try:
+        with _compiled_lock:
+            if model in _compiled:
+                return _compiled[model]
+    except TypeError:
+        return build()
+    compiled = build()
+    with _compiled_lock:
+        _compiled[model] = compiled
+    return compiled
+
+
+def label_index(encoder):
+    """{class: code} for a fitted LabelEncoder, built once per encoder."""
+    return _cached(encoder, lambda: {c: i for i, c in enumerate(encoder.classes_.tolist())})
+
+
+def encode_label(encoder, value):
+    """LabelEncoder.transform for one value; unseen values raise like sklearn does."""
+    code = label_index(encoder).get(value)
+    if code is None:
+        raise ValueError(f"y contains previously unseen labels: {[value]}")
+    return code
+
+
+class _CompiledColumnTransformer:
+    """dict rows → encoded matrix, matching a fitted ColumnTransformer's output."""
+
+    def __init__(self, ct):
+        self.blocks = []  # (kind, columns, params)
+        width = 0
+        for _, transformer, columns in ct.transformers_:
+            if isinstance(transformer, str) and transformer == "drop":
+                continue
+            columns = list(columns)
+            if not columns:
+                continue
+            if isinstance(transformer, str) and transformer == "passthrough":
+                self.blocks.append(("numeric", columns, None))
+                width += len(columns)
+            elif isinstance(transformer, StandardScaler):
+                self.blocks.append(("scaled", columns, _scaler_params(transformer, len(columns))))
+                width += len(columns)
+            elif isinstance(transformer, OrdinalEncoder):
+                self.blocks.append(("ordinal", columns, _ordinal_params(transformer)))
+                width += len(columns)
+            elif isinstance(transformer, OneHotEncoder):
+                params = _onehot_params(transformer)
+                self.blocks.append(("onehot", columns, params))
+                width += params["width"]
+            else:
+                raise NotImplementedError(f"Cannot compile {type(transformer).__name__}")
+        self.width = width
+
+    def transform(self, rows):
+        out = np.zeros((len(rows), self.width), dtype=np.float64)
+        offset = 0
+        for kind, columns, params in self.blocks:
+            if kind == "numeric":
+                for j, col in enumerate(columns):
+                    out[:, offset + j] = [_to_float(r.get(col)) for r in rows]
+                offset += len(columns)
+            elif kind == "scaled":
+                mean, scale = params
+                for j, col in enumerate(columns):
+                    out[:, offset + j] = [_to_float(r.get(col)) for r in rows]
+                out[:, offset:offset + len(columns)] -= mean
+                out[:, offset:offset + len(columns)] /= scale
+                offset += len(columns)
+            elif kind == "ordinal":
+                for j, col in enumerate(columns):
+                    mapping = params["maps"][j]
+                    for i, r in enumerate(rows):
+                        value = r.get(col)
+                        code = mapping.get(value)
+                        if code is None:
+                            if params["unknown_value"] is None:
+                                raise ValueError(f"Found unknown categories [{value!r}] in column {col} during transform")
+                            code = params["unknown_value"]
+                        out[i, offset + j] = code
+                offset += len(columns)
+            else:  # onehot
+                for j, col in enumerate(columns):
+                    mapping, start = params["maps"][j], offset + params["offsets"][j]
+                    for i, r in enumerate(rows):
+                        value = r.get(col)
+                        code = mapping.get(value)
+                        if code is None:
+                            if not params["ignore_unknown"]:
+                                raise ValueError(f"Found unknown categories [{value!r}] in column {col} during transform")
+                            continue  # all zeros, like handle_unknown="ignore"
+                        out[i, start + code] = 1.0
+                offset += params["width"]
+        return out
+
+
+def _scaler_params(scaler, n):
+    mean = scaler.mean_ if scaler.with_mean and scaler.mean_ is not None else np.zeros(n)
+    scale = scaler.scale_ if scaler.with_std and scaler.scale_ is not None else np.ones(n)
+    return np.asarray(mean, dtype=np.float64), np.asarray(scale, dtype=np.float64)
+
+
+def _ordinal_params(encoder):
+    if encoder.handle_unknown == "use_encoded_value":
+        unknown_value = encoder.unknown_value
+    elif encoder.handle_unknown == "error":
+        unknown_value = None
+    else:
+        raise NotImplementedError(f"OrdinalEncoder(handle_unknown={encoder.handle_unknown!r})")
+    if getattr(encoder, "infrequent_categories_", None) is not None and any(
+            c is not None for c in encoder.infrequent_categories_):
+        raise NotImplementedError("OrdinalEncoder with infrequent categories")
+    maps = [{c: i for i, c in enumerate(cats.tolist())} for cats in encoder.categories_]
+    return {"maps": maps, "unknown_value": unknown_value}
+
+
+def _onehot_params(encoder):
+    if getattr(encoder, "drop_idx_", None) is not None:
+        raise NotImplementedError("OneHotEncoder with drop")
+    if getattr(encoder, "infrequent_categories_", None) is not None and any(
+            c is not None for c in encoder.infrequent_categories_):
+        raise NotImplementedError("OneHotEncoder with infrequent categories")
+    maps = [{c: i for i, c in enumerate(cats.tolist())} for cats in encoder.categories_]
+    offsets, width = [], 0
+    for cats in encoder.categories_:
+        offsets.append(width)
+        width += len(cats)
+    return {"maps": maps, "offsets": offsets, "width": width,
+            "ignore_unknown": encoder.handle_unknown != "error"}
+
+
+class CompiledPipeline:
+    """
+    Fast path for a fitted Pipeline of [ColumnTransformer | StandardScaler]* + estimator.
+    predict / predict_proba take a list of dict rows.
+    """
+
+    def __init__(self, pipeline, features=None):
+        *transforms, (_, estimator) = pipeline.steps
+        self.estimator = estimator
+        self.features = features
+        self.first = None
+        self.scalers = []
+        for i, (_, step) in enumerate(transforms):
+            if i == 0 and isinstance(step, ColumnTransformer):
+                self.first = _CompiledColumnTransformer(step)
+            elif isinstance(step, StandardScaler):
+                self.scalers.append(_scaler_params(step, step.n_features_in_))
+            else:
+                raise NotImplementedError(f"Cannot compile step {type(step).__name__}")
+        if self.first is None and features is None:
+            raise NotImplementedError("Feature order is required without a ColumnTransformer")
+
+    def transform(self, rows):
+        if self.first is not None:
+            X = self.first.transform(rows)
+        else:
+            X = np.empty((len(rows), len(self.features)), dtype=np.float64)
+            for i, r in enumerate(rows):
+                X[i] = [_to_float(r[col]) for col in self.features]
+        for mean, scale in self.scalers:
+            X -= mean
+            X /= scale
+        return X
+
+    def predict_proba(self, rows):
+        return self.estimator.predict_proba(self.transform(rows))
+
+    def predict(self, rows):
+        return self.estimator.predict(self.transform(rows))
+
+
+def compiled_pipeline(model, features=None):
+    """CompiledPipeline for a fitted sklearn Pipeline, or None (e.g. ONNX models, unsupported steps)."""
+    if not isinstance(model, Pipeline):
+        return None
+
+    def build():
+        try:
+            return CompiledPipeline(model, features)
+        except NotImplementedError:
+            return None
+
+    return _cached(model, build)
+
+
+class CompiledLabelEncoding:
+    """
+    Irrigation-style inputs: LabelEncoders per categorical column (unknown →
+    first class, as the blueprint always did) then a bare estimator.
+    """
+
+    def __init__(self, model, label_encoders, features):
+        self.model = model
+        self.features = features
+        self.maps = {col: label_index(le) for col, le in label_encoders.items() if col in features}
+        # Estimators fitted on a DataFrame validate column names, so hand them one
+        self.needs_frame = hasattr(model, "feature_names_in_")
+
+    def transform(self, rows):
+        columns = {}
+        for col in self.features:
+            mapping = self.maps.get(col)
+            if mapping is None:
+                columns[col] = np.array([_to_float(r.get(col)) for r in rows], dtype=np.float64)
+            else:
+                columns[col] = np.array([mapping.get(r.get(col), 0) for r in rows], dtype=np.int64)
+        if self.needs_frame:
+            return pd.DataFrame(columns, columns=self.features, copy=False)
+        return np.column_stack([columns[col] for col in self.features])
+
+    def predict_proba(self, rows):
+        return self.model.predict_proba(self.transform(rows))
+
+
+def compiled_label_encoding(model, label_encoders, features):
+    if isinstance(model, OnnxModel):  # compiled backend keeps its own path
+        return None
+    return _cached(model, lambda: CompiledLabelEncoding(model, label_encoders, features))
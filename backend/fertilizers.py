@@ -2,10 +2,19 @@ from flask import Blueprint, request, jsonify
 import joblib
 import pandas as pd
 import os, sys
+import logging
 
 # ✅ Make sure api/ is accessible
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from api.Api_data import get_lat_lon, get_last7days_weather, get_soil_ph_and_type
+from api.context import resolve_location_context
+from api.translation import msg, render_messages, translate_messages
+from api.metrics import timed
+from api.logs import log_event
+from batch import get_batch_records, run_batch
+from model_store import register_model, get_model, get_model_version
+from inference import serving_path, is_compiled, load_compiled, label_encoder_from_classes
+from feature_encoding import compiled_pipeline, encode_label
+from mapped_models import is_mapped, load_mapped
 
 # Create blueprint
 fertilizer_bp = Blueprint("fertilizer", __name__)
@@ -15,13 +24,34 @@ BASE_DIR = os.path.dirname(os.path.abspath(__file__))  # backend/
 MODEL_PATH = os.path.join(BASE_DIR, "../models/fertilizer_recommendation/Fertilizer_pipeline.pkl")
 MODEL_PATH = os.path.abspath(MODEL_PATH)
 
-print("Loading fertilizer model from:", MODEL_PATH)
 
-# Load model + encoders
-bundle = joblib.load(MODEL_PATH)
-pipeline = bundle["pipeline"]
-crop_encoder = bundle["crop_encoder"]
-fertilizer_encoder = bundle["fertilizer_encoder"]
+def load_fertilizer_bundle(path):
+    """Model + encoders ({"pipeline", "crop_encoder", "fertilizer_encoder"})"""
+    if is_compiled(path):
+        compiled = load_compiled(path)
+        vocab = compiled.meta["vocab"]
+        return {
+            "pipeline": compiled,
+            "crop_encoder": label_encoder_from_classes(vocab["crop_encoder"]),
+            "fertilizer_encoder": label_encoder_from_classes(vocab["fertilizer_encoder"]),
+        }
+    if is_mapped(path):
+        return load_mapped(path)
+    log_event("fertilizer.model_load", level=logging.INFO, path=path)
+    return joblib.load(path)
+
+
+def describe_fertilizer_bundle(bundle):
+    return {
+        "features": FEATURES,
+        "crops": bundle["crop_encoder"].classes_.tolist(),
+        "classes": bundle["fertilizer_encoder"].classes_.tolist(),
+    }
+
+
+# Deserialized in the background by app.py, hot-reloaded when the file changes (see model_store)
+register_model("fertilizer", load_fertilizer_bundle, lambda: serving_path(MODEL_PATH),
+               describe=describe_fertilizer_bundle)
 
 # ---------------- Fertilizer Expansions ----------------
 fertilizer_map = {
@@ -34,95 +64,155 @@ fertilizer_map = {
 }
 
 # ---------------- Advisory Function ----------------
-def fertilizer_advisory(n, p, k, predicted_fertilizer, crop):
+def fertilizer_advisory_messages(n, p, k, predicted_fertilizer, crop):
+    """The advisory as (template, params) sentences — see api/translation.py."""
     fert_full = fertilizer_map.get(predicted_fertilizer, predicted_fertilizer)
-    suggestion = f"For your {crop} crop, the recommended fertilizer is {fert_full}. Using this will help balance your soil nutrients and improve your yield. "
+    messages = [
+        msg("For your {crop} crop, the recommended fertilizer is {fertilizer}.", crop=crop, fertilizer=fert_full),
+        msg("Using this will help balance your soil nutrients and improve your yield."),
+    ]
 
     # Nitrogen logic
     if n < 50:
-        suggestion += "Your Nitrogen level is low, so this fertilizer will help improve leaf growth. "
+        messages.append(msg("Your Nitrogen level is low, so this fertilizer will help improve leaf growth."))
     elif n > 100:
-        suggestion += "Nitrogen is already high, so apply cautiously to avoid over-fertilization. "
+        messages.append(msg("Nitrogen is already high, so apply cautiously to avoid over-fertilization."))
 
     # Phosphorus logic
     if p < 50:
-        suggestion += "Phosphorus is low, which can affect root development. This recommendation helps balance it. "
+        messages.append(msg("Phosphorus is low, which can affect root development."))
+        messages.append(msg("This recommendation helps balance it."))
     elif p > 100:
-        suggestion += "Phosphorus is on the higher side, so avoid extra P-based fertilizers. "
+        messages.append(msg("Phosphorus is on the higher side, so avoid extra P-based fertilizers."))
 
     # Potassium logic
     if k < 50:
-        suggestion += "Potassium is low, which may reduce crop quality. This fertilizer supports fruit/seed formation. "
+        messages.append(msg("Potassium is low, which may reduce crop quality."))
+        messages.append(msg("This fertilizer supports fruit/seed formation."))
     elif k > 100:
-        suggestion += "Potassium is already sufficient, so apply in moderation. "
+        messages.append(msg("Potassium is already sufficient, so apply in moderation."))
 
-    return suggestion.strip()
+    return messages
 
-# ---------------- Route ----------------
+
+def fertilizer_advisory(n, p, k, predicted_fertilizer, crop):
+    return render_messages(fertilizer_advisory_messages(n, p, k, predicted_fertilizer, crop))
+
+# ---------------- Pipeline ----------------
+FEATURES = ["N", "P", "K", "temperature", "humidity", "ph", "rainfall", "crop_encoded"]
+
+
+def build_fertilizer_features(data, context):
+    """Model input row (plus the raw crop name) for one request."""
+    last7days_weather = context["weather"]
+    soil_data = context["soil"]
+
+    # ✅ Extract only N, P, K, crop
+    sample = {
+        "N": data.get("N"),
+        "P": data.get("P"),
+        "K": data.get("K"),
+        "crop": data.get("crop"),
+        "temperature": int(last7days_weather["temperature"]),
+        "humidity": int(last7days_weather["humidity"]),
+        "ph": int(soil_data["ph"]),
+        "rainfall": int(last7days_weather["rainfall"]),
+    }
+
+    # Encode crop
+    crop_encoder = get_model("fertilizer")["crop_encoder"]
+    sample["crop_encoded"] = encode_label(crop_encoder, sample["crop"])
+    return sample
+
+
+def predict_fertilizer_rows(samples):
+    """One predict_proba call for any number of rows → [(fertilizer, proba_row), ...]"""
+    bundle = get_model("fertilizer")
+    pipeline, fertilizer_encoder = bundle["pipeline"], bundle["fertilizer_encoder"]
+
+    fast = compiled_pipeline(pipeline, FEATURES)
+    if fast is not None:
+        # ⚡ Scaler folded into a NumPy row, no DataFrame on the hot path
+        prediction_proba_raw = fast.predict_proba(samples)
+    else:
+        X_new = pd.DataFrame([[s[col] for col in FEATURES] for s in samples], columns=FEATURES)
+        prediction_proba_raw = pipeline.predict_proba(X_new)
+    preds = pipeline.classes_[prediction_proba_raw.argmax(axis=1)]
+    fertilizers = fertilizer_encoder.inverse_transform(preds)
+    return list(zip(fertilizers, prediction_proba_raw))
+
+
+def format_fertilizer_result(data, context, sample, output):
+    fertilizer, prediction_proba_raw = output
+    fertilizer_full = fertilizer_map.get(fertilizer, fertilizer)
+
+    # Probabilities
+    fertilizer_encoder = get_model("fertilizer")["fertilizer_encoder"]
+    prediction_proba = {
+        fert: round(prob, 3)
+        for fert, prob in zip(fertilizer_encoder.classes_, prediction_proba_raw)
+    }
+
+    # Advisory suggestion
+    messages = fertilizer_advisory_messages(sample["N"], sample["P"], sample["K"], fertilizer, sample["crop"])
+    suggestion = render_messages(messages)
+
+    result = {
+        "fertilizer": fertilizer,
+        "fertilizer_full": fertilizer_full,
+        "prediction_proba": prediction_proba,
+        "suggestion": suggestion,
+        "temperature": sample["temperature"],
+        "humidity": sample["humidity"],
+        "ph": sample["ph"],
+        "rainfall": sample["rainfall"],
+        "crop": sample["crop"],
+        "state": data.get("state"),
+        "district": data.get("district"),
+        "model_version": get_model_version("fertilizer")
+    }
+    # 🌐 Optional translated suggestion, e.g. "lang": "hi"
+    if data.get("lang"):
+        result["lang"] = data["lang"]
+        result["suggestion_translated"] = translate_messages(messages, data["lang"])
+    return result
+
+
+def run_fertilizer(data, context):
+    """Fertilizer recommendation for one request, given its resolved location context."""
+    with timed("encoding", model="fertilizer", mode="single"):
+        sample = build_fertilizer_features(data, context)
+    with timed("inference", model="fertilizer", mode="single"):
+        output = predict_fertilizer_rows([sample])[0]
+    with timed("formatting", model="fertilizer", mode="single"):
+        return format_fertilizer_result(data, context, sample, output)
+
+
+# ---------------- Routes ----------------
 @fertilizer_bp.route("/predict", methods=["POST"])
 def predict_fertilizer():
     try:
         # Get JSON request data
         data = request.get_json()
 
-        # Get location
-        lat_lon = get_lat_lon(data.get("state"), data.get("district"))
-        lat, lon = lat_lon["lat"], lat_lon["lon"]
-
-        # Fetch weather + soil data
-        last7days_weather = get_last7days_weather(lat, lon)
-        soil_data = get_soil_ph_and_type(lat, lon)
-
-        # ✅ Extract only N, P, K, crop
-        sample = {
-            "N": data.get("N"),
-            "P": data.get("P"),
-            "K": data.get("K"),
-            "crop": data.get("crop"),
-            "temperature": int(last7days_weather["temperature"]),
-            "humidity": int(last7days_weather["humidity"]),
-            "ph": int(soil_data["ph"]),
-            "rainfall": int(last7days_weather["rainfall"]),
-        }
+        # Get location, then weather + soil data (fetched concurrently)
+        context = resolve_location_context(data.get("state"), data.get("district"))
 
-        # Encode crop
-        sample["crop_encoded"] = crop_encoder.transform([sample["crop"]])[0]
-
-        # Convert to DataFrame
-        X_new = pd.DataFrame([[
-            sample["N"], sample["P"], sample["K"],
-            sample["temperature"], sample["humidity"],
-            sample["ph"], sample["rainfall"], sample["crop_encoded"]
-        ]], columns=["N", "P", "K", "temperature", "humidity", "ph", "rainfall", "crop_encoded"])
-
-        # Prediction
-        pred = pipeline.predict(X_new)[0]
-        fertilizer = fertilizer_encoder.inverse_transform([pred])[0]
-        fertilizer_full = fertilizer_map.get(fertilizer, fertilizer)
-
-        # Probabilities
-        prediction_proba_raw = pipeline.predict_proba(X_new)[0]
-        prediction_proba = {
-            fert: round(prob, 3)
-            for fert, prob in zip(fertilizer_encoder.classes_, prediction_proba_raw)
-        }
+        return jsonify(run_fertilizer(data, context))
 
-        # Advisory suggestion
-        suggestion = fertilizer_advisory(sample["N"], sample["P"], sample["K"], fertilizer, sample["crop"])
-
-        return jsonify({
-            "fertilizer": fertilizer,
-            "fertilizer_full": fertilizer_full,
-            "prediction_proba": prediction_proba,
-            "suggestion": suggestion,
-            "temperature": sample["temperature"],
-            "humidity": sample["humidity"],
-            "ph": sample["ph"],
-            "rainfall": sample["rainfall"],
-            "crop": sample["crop"],
-            "state": data.get("state"),
-            "district": data.get("district")
-        })
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+
+
+@fertilizer_bp.route("/predict_batch", methods=["POST"])
+def predict_fertilizer_batch():
+    try:
+        records = get_batch_records(request.get_json())
+        return jsonify(run_batch(
+            records, ("state", "district"),
+            build_fertilizer_features, predict_fertilizer_rows, format_fertilizer_result,
+            model="fertilizer"
+        ))
 
     except Exception as e:
         return jsonify({"error": str(e)}), 400
@@ -0,0 +1,154 @@
+import os
+import json
+import hashlib
+import logging
+import numpy as np
+from sklearn.preprocessing import LabelEncoder
+from mapped_models import mapped_path, MANIFEST
+
+# ---------------- Inference backend switch ----------------
+# INFERENCE_BACKEND=sklearn (default) serves the pickled pipelines as before.
+# INFERENCE_BACKEND=onnx serves the compiled artifacts written by
+# models/onnx_export.py (<artifact>.onnx + <artifact>.onnx.json) through
+# onnxruntime, falling back to the pickle for any model not exported yet.
+# INFERENCE_BACKEND=mmap serves the <artifact>.mmap/ directories written by
+# models/mmap_export.py, whose tree node tables are shared across worker
+# processes through the page cache (see mapped_models.py).
+# An export records the pickle it was built from (size, mtime, sha256); once the
+# pickle is retrained or updated in place the export is stale and the pickle is
+# served until the export is re-run, so the model registry still hot-reloads it.
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "sklearn").lower()
+
+_source_checks = {}  # (pickle, size, mtime_ns, recorded checksum) → matches
+_stale_warned = set()
+
+
+def compiled_path(path):
+    return os.path.splitext(path)[0] + ".onnx"
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def built_from(path, record):
+    """The export described by `record` was built from the current `path` (size + mtime, else the content hash)."""
+    if not os.path.exists(path):
+        return True  # shipped without the pickle: the export is the model
+    if not record.get("source_checksum"):
+        return False  # exported before sources were recorded
+    stat = os.stat(path)
+    if stat.st_size != record.get("source_size"):
+        return False
+    if stat.st_mtime == record.get("source_mtime"):
+        return True
+    # A checkout or copy moves mtimes without changing content: hash once per (size, mtime)
+    key = (path, stat.st_size, stat.st_mtime_ns, record["source_checksum"])
+    if key not in _source_checks:
+        _source_checks[key] = f"sha256:{_sha256(path)}" == record["source_checksum"]
+    return _source_checks[key]
+
+
+def _current_export(path, export_path, record_path):
+    """export_path if it exists and still matches `path`, else None (→ serve the pickle)."""
+    if not os.path.exists(export_path):
+        return None
+    try:
+        with open(record_path) as f:
+            record = json.load(f)
+        if built_from(path, record):
+            return export_path
+        reason = "is older than"
+    except (OSError, ValueError) as e:
+        reason = f"cannot be checked against ({e})"
+    # The registry polls this path: warn once per state of the pickle, not on every poll
+    warn_key = (export_path, os.stat(path).st_mtime_ns if os.path.exists(path) else None)
+    if warn_key not in _stale_warned:
+        _stale_warned.add(warn_key)
+        logging.warning(f"{export_path} {reason} {path}; serving the pickle until it is re-exported")
+    return None
+
+
+def serving_path(path):
+    """Artifact to serve for `path` under the configured backend."""
+    if INFERENCE_BACKEND == "onnx":
+        onnx_path = compiled_path(path)
+        if _current_export(path, onnx_path, f"{onnx_path}.json"):
+            return onnx_path
+        if not os.path.exists(onnx_path):
+            logging.warning(f"No compiled artifact at {onnx_path}, serving {path} with sklearn")
+    elif INFERENCE_BACKEND == "mmap":
+        mmap_path = mapped_path(path)
+        if _current_export(path, mmap_path, os.path.join(mmap_path, MANIFEST)):
+            return mmap_path
+        if not os.path.exists(mmap_path):
+            logging.warning(f"No mapped artifact at {mmap_path}, serving {path} from the pickle")
+    return path
+
+
+def is_compiled(path):
+    return path.endswith(".onnx")
+
+
+def label_encoder_from_classes(classes):
+    """Rebuild a fitted LabelEncoder from its saved vocabulary."""
+    le = LabelEncoder()
+    le.classes_ = np.array(classes, dtype=object)
+    return le
+
+
+class OnnxModel:
+    """
+    Drop-in for the fitted sklearn/XGBoost estimators used by the blueprints:
+    predict / predict_proba on a DataFrame, plus classes_ and feature_names_in_.
+    The .onnx.json sidecar describes how DataFrame columns map onto graph inputs.
+    """
+
+    def __init__(self, path):
+        import onnxruntime as ort
+
+        with open(f"{path}.json") as f:
+            self.meta = json.load(f)
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = int(os.getenv("ONNX_INTRA_OP_THREADS", "1"))
+        self.session = ort.InferenceSession(path, sess_options=options, providers=["CPUExecutionProvider"])
+        self.output_names = [o.name for o in self.session.get_outputs()]
+        self.feature_names_in_ = np.array(self.meta["features"], dtype=object)
+        if "classes" in self.meta:
+            self.classes_ = np.array(self.meta["classes"])
+
+    def _feed(self, X):
+        if self.meta["layout"] == "matrix":
+            values = X[self.meta["features"]] if hasattr(X, "columns") else X
+            return {self.meta["inputs"][0]["name"]: np.asarray(values, dtype=np.float32)}
+
+        feed = {}
+        for inp in self.meta["inputs"]:
+            column = np.asarray(X[inp["column"]])
+            if inp["kind"] == "string":
+                column = column.astype(str).astype(object)
+            else:
+                column = column.astype(np.float32)
+            feed[inp["name"]] = column.reshape(-1, 1)
+        return feed
+
+    def _run(self, X):
+        return dict(zip(self.output_names, self.session.run(None, self._feed(X))))
+
+    def predict_proba(self, X):
+        return np.asarray(self._run(X)[self.meta["probability_output"]])
+
+    def predict(self, X):
+        outputs = self._run(X)
+        if "classes" in self.meta:
+            return np.asarray(outputs[self.meta["label_output"]])
+        return np.asarray(outputs[self.meta["value_output"]]).reshape(-1)
+
+
+def load_compiled(path):
+    logging.info(f"Loading compiled model from: {path}")
+    return OnnxModel(path)
@@ -3,10 +3,19 @@ import pickle
 import pandas as pd
 import os
 import sys
+import logging
 
 # Create blueprint
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from api.Api_data import get_lat_lon, get_last7days_weather, get_soil_ph_and_type, get_future_rainfall
+from api.context import resolve_location_context
+from api.translation import msg, render_messages, translate_messages
+from api.metrics import timed
+from api.logs import log_event
+from batch import get_batch_records, run_batch
+from model_store import register_model, get_model, get_model_version
+from inference import serving_path, is_compiled, load_compiled, label_encoder_from_classes
+from feature_encoding import compiled_label_encoding
+from mapped_models import is_mapped, load_mapped
 
 irrigation_bp = Blueprint("irrigation", __name__)
 
@@ -15,11 +24,36 @@ BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 MODEL_PATH = os.path.join(BASE_DIR, "../models/irrigation_techniques/irrigation_model.pkl")
 MODEL_PATH = os.path.abspath(MODEL_PATH)
 
-print("Loading irrigation model from:", MODEL_PATH)
 
-# Load model + encoders
-with open(MODEL_PATH, "rb") as f:
-    model, label_encoders, target_encoder = pickle.load(f)
+def load_irrigation_bundle(path):
+    """(model, label_encoders, target_encoder) as saved by irrigation_main.py"""
+    if is_compiled(path):
+        compiled = load_compiled(path)
+        vocab = compiled.meta["vocab"]
+        label_encoders = {
+            col: label_encoder_from_classes(classes) for col, classes in vocab["label_encoders"].items()
+        }
+        return compiled, label_encoders, label_encoder_from_classes(vocab["target_encoder"])
+    if is_mapped(path):
+        return load_mapped(path)
+    log_event("irrigation.model_load", level=logging.INFO, path=path)
+    with open(path, "rb") as f:
+        return pickle.load(f)
+
+
+def describe_irrigation_bundle(bundle):
+    model, label_encoders, target_encoder = bundle
+    return {
+        "features": FEATURES,
+        "categorical_features": list(label_encoders),
+        "classes": target_encoder.classes_.tolist(),
+    }
+
+
+# Model + encoders, deserialized in the background by app.py and
+# hot-reloaded when the file changes (see model_store)
+register_model("irrigation", load_irrigation_bundle, lambda: serving_path(MODEL_PATH),
+               describe=describe_irrigation_bundle)
 
 # ✅ Soil → Water holding capacity mapping
 soil_water_capacity = {
@@ -32,43 +66,59 @@ soil_water_capacity = {
 }
 
 # 🔹 Suggestion logic for irrigation method
-def generate_irrigation_suggestion(method, crop, weather, soil, future_rainfall, area):
+def generate_irrigation_suggestion_messages(method, crop, weather, soil, future_rainfall, area):
+    """The suggestion as (template, params) sentences — see api/translation.py."""
     method = method.lower()
 
+    def capacity():
+        return msg(soil_water_capacity.get(soil["soil_type"].lower(), "medium"))
+
     if method == "rain-fed":
-        return (
-            f"🌧 Predicted method: RAIN-FED. Suitable if rainfall remains consistent. "
-            f"Since forecast rainfall is {future_rainfall} mm, monitor closely. "
-            f"For {crop}, ensure soil type ({soil['soil_type']}) retains enough water "
-            f"(capacity: {soil_water_capacity.get(soil['soil_type'].lower(), 'medium')})."
-        )
+        return [
+            msg("{icon} Predicted method: RAIN-FED.", icon="🌧"),
+            msg("Suitable if rainfall remains consistent."),
+            msg("Since forecast rainfall is {future_rainfall} mm, monitor closely.", future_rainfall=future_rainfall),
+            msg("For {crop}, ensure soil type ({soil_type}) retains enough water (capacity: {capacity}).",
+                crop=crop, soil_type=soil["soil_type"], capacity=capacity()),
+        ]
 
     elif method == "drip":
-        return (
-            f"💧 Predicted method: DRIP irrigation. Recommended for efficient water use. "
-            f"Good choice for {crop}, especially under current temperature {weather['temperature']}°C "
-            f"and humidity {weather['humidity']}%. Helps save water in {area} acres field."
-        )
+        return [
+            msg("{icon} Predicted method: DRIP irrigation.", icon="💧"),
+            msg("Recommended for efficient water use."),
+            msg("Good choice for {crop}, especially under current temperature {temperature}°C "
+                "and humidity {humidity}%.", crop=crop, temperature=weather["temperature"],
+                humidity=weather["humidity"]),
+            msg("Helps save water in {area} acres field.", area=area),
+        ]
 
     elif method == "sprinkler":
-        return (
-            f"🌱 Predicted method: SPRINKLER irrigation. Useful for lighter soils like {soil['soil_type']} "
-            f"and crops sensitive to uniform watering. With rainfall forecast {future_rainfall} mm, "
-            f"sprinkler ensures even distribution."
-        )
+        return [
+            msg("{icon} Predicted method: SPRINKLER irrigation.", icon="🌱"),
+            msg("Useful for lighter soils like {soil_type} and crops sensitive to uniform watering.",
+                soil_type=soil["soil_type"]),
+            msg("With rainfall forecast {future_rainfall} mm, sprinkler ensures even distribution.",
+                future_rainfall=future_rainfall),
+        ]
 
     elif method == "furrow":
-        return (
-            f"🚜 Predicted method: FURROW irrigation. Works well for row crops and moderate slopes. "
-            f"Soil water capacity is {soil_water_capacity.get(soil['soil_type'].lower(), 'medium')}. "
-            f"Consider runoff if slope is high."
-        )
+        return [
+            msg("{icon} Predicted method: FURROW irrigation.", icon="🚜"),
+            msg("Works well for row crops and moderate slopes."),
+            msg("Soil water capacity is {capacity}.", capacity=capacity()),
+            msg("Consider runoff if slope is high."),
+        ]
 
     else:
-        return (
-            f"ℹ️ Predicted irrigation method is {method.upper()}. "
-            f"Ensure compatibility with soil ({soil['soil_type']}) and local water availability."
-        )
+        return [
+            msg("{icon} Predicted irrigation method is {method}.", icon="ℹ️", method=method.upper()),
+            msg("Ensure compatibility with soil ({soil_type}) and local water availability.",
+                soil_type=soil["soil_type"]),
+        ]
+
+
+def generate_irrigation_suggestion(method, crop, weather, soil, future_rainfall, area):
+    return render_messages(generate_irrigation_suggestion_messages(method, crop, weather, soil, future_rainfall, area))
 
 
 @irrigation_bp.route("/", methods=["GET"])
@@ -76,103 +126,154 @@ def home():
     return {"message": "💧 Irrigation Recommendation API is running!"}
 
 
+# Column order the model was trained with
+FEATURES = [
+    "crop_name", "growth_stage", "soil_type", "soil_ph", "water_holding_capacity",
+    "temperature", "humidity", "rainfall_last_7_days", "rainfall_forecast_next_7_days",
+    "water_availability", "source_of_water", "field_slope", "area_acres"
+]
+
+
+def clean_soil_type(soil_data):
+    """✅ Clean soil type before encoding"""
+    raw_soil_type = soil_data.get("soil_type", "").lower()
+    if raw_soil_type in ["unknown", "", None]:
+        return "loamy"   # fallback default
+    return raw_soil_type
+
+
+def build_irrigation_features(data, context):
+    """Model input row (before label encoding) for one request."""
+    weather = context["weather"]
+    soil_data = context["soil"]
+    future_rainfall = context["forecast"]
+
+    soil_type = clean_soil_type(soil_data)
+
+    # ✅ Assign water holding capacity
+    water_capacity = soil_water_capacity.get(soil_type, "medium")
+
+    return {
+        "crop_name": data.get("crop_name"),
+        "growth_stage": data.get("growth_stage", "").lower(),
+        "soil_type": data.get("soil_type", soil_type).lower(),
+        "soil_ph": float(soil_data["ph"]),
+        "water_holding_capacity": water_capacity,
+        "temperature": float(weather["temperature"]),
+        "humidity": float(weather["humidity"]),
+        "rainfall_last_7_days": float(weather["rainfall"]),
+        "rainfall_forecast_next_7_days": float(future_rainfall),   # ✅ force float
+        "water_availability": data.get("water_availability"),
+        "source_of_water": data.get("source_of_water"),
+        "field_slope": data.get("field_slope"),
+        "area_acres": float(data.get("area_acres", 0)),           # ✅ force float
+    }
+
+
+def predict_irrigation_rows(rows):
+    """One predict_proba call for any number of rows → [(method, proba_row), ...]"""
+    model, label_encoders, target_encoder = get_model("irrigation")
+    log_event("irrigation.model_input", sample=True, rows=rows)
+
+    fast = compiled_label_encoding(model, label_encoders, FEATURES)
+    if fast is not None:
+        # ⚡ Precompiled lookups (unknown values → first class, same as below)
+        prediction_proba_raw = fast.predict_proba(rows)
+    else:
+        input_data = pd.DataFrame(rows, columns=FEATURES)
+
+        # ✅ Safe label encoding (unknown values fall back to the first class)
+        for col, le in label_encoders.items():
+            if col in input_data.columns:
+                input_data[col] = input_data[col].where(input_data[col].isin(le.classes_), le.classes_[0])
+                input_data[col] = le.transform(input_data[col])
+
+        # 🔮 Predict (class = argmax of the probabilities)
+        prediction_proba_raw = model.predict_proba(input_data)
+    methods = target_encoder.inverse_transform(prediction_proba_raw.argmax(axis=1))
+    return list(zip(methods, prediction_proba_raw))
+
+
+def format_irrigation_result(data, context, row, output):
+    irrigation_method, _ = output
+    weather = context["weather"]
+    soil_data = context["soil"]
+    future_rainfall = context["forecast"]
+
+    soil_type = clean_soil_type(soil_data)
+    water_capacity = row["water_holding_capacity"]
+
+    # Generate suggestion
+    messages = generate_irrigation_suggestion_messages(
+        irrigation_method,
+        data.get("crop_name"),
+        weather,
+        soil_data,
+        future_rainfall,
+        data.get("area_acres")
+    )
+    suggestion = render_messages(messages)
+
+    result = {
+        "irrigation_method": str(irrigation_method),
+        "suggestion": str(suggestion),
+        "temperature": float(weather["temperature"]),
+        "humidity": float(weather["humidity"]),
+        "rainfall_last_7_days": float(weather["rainfall"]),
+        "rainfall_forecast_next_7_days": float(future_rainfall),
+        "soil_type": str(soil_type),
+        "soil_ph": float(soil_data["ph"]),
+        "water_holding_capacity": str(water_capacity),
+        "model_version": get_model_version("irrigation"),
+        "inputs_used": {
+            **data,
+            "soil_type": str(soil_type),
+            "soil_ph": float(soil_data["ph"]),
+            "water_holding_capacity": str(water_capacity)
+        }
+    }
+    # 🌐 Optional translated suggestion, e.g. "lang": "hi"
+    if data.get("lang"):
+        result["lang"] = data["lang"]
+        result["suggestion_translated"] = translate_messages(messages, data["lang"])
+    return result
+
+
+def run_irrigation(data, context):
+    """Irrigation method recommendation for one request, given its resolved location context."""
+    with timed("encoding", model="irrigation", mode="single"):
+        row = build_irrigation_features(data, context)
+    with timed("inference", model="irrigation", mode="single"):
+        output = predict_irrigation_rows([row])[0]
+    with timed("formatting", model="irrigation", mode="single"):
+        return format_irrigation_result(data, context, row, output)
+
+
 @irrigation_bp.route("/predict", methods=["POST"])
 def predict_irrigation():
     try:
         data = request.get_json()
-        print("Received data:", data)
+        log_event("irrigation.request", sample=True, body=data)
 
         # Step 1: Get location (lat, lon)
-        lat_lon = get_lat_lon(data.get("state"), data.get("district"))
-        lat, lon = lat_lon["lat"], lat_lon["lon"]
-
-        # Step 2: Get last 7 days weather
-        weather = get_last7days_weather(lat, lon)
-
-        # Step 3: Get soil data
-        soil_data = get_soil_ph_and_type(lat, lon)
-        print("Soil data:", soil_data)
-
-        # Step 4: Future rainfall
-        future_rainfall = get_future_rainfall(lat, lon)
-
-        # ✅ Clean soil type before encoding
-        raw_soil_type = soil_data.get("soil_type", "").lower()
-        if raw_soil_type in ["unknown", "", None]:
-            soil_type = "loamy"   # fallback default
-        else:
-            soil_type = raw_soil_type
-
-        # ✅ Assign water holding capacity
-        water_capacity = soil_water_capacity.get(soil_type, "medium")
-
-                # Prepare input dataframe
-        input_data = pd.DataFrame([{
-            "crop_name": data.get("crop_name"),
-            "growth_stage": data.get("growth_stage", "").lower(),
-            "soil_type": data.get("soil_type", soil_type).lower(),
-            "soil_ph": float(soil_data["ph"]),
-            "water_holding_capacity": water_capacity,
-            "temperature": float(weather["temperature"]),
-            "humidity": float(weather["humidity"]),
-            "rainfall_last_7_days": float(weather["rainfall"]),
-            "rainfall_forecast_next_7_days": float(future_rainfall),   # ✅ force float
-            "water_availability": data.get("water_availability"),
-            "source_of_water": data.get("source_of_water"),
-            "field_slope": data.get("field_slope"),
-            "area_acres": float(data.get("area_acres", 0)),           # ✅ force float
-        }])
-
+        # Step 2-4: last 7 days weather, soil data and future rainfall, fetched concurrently
+        context = resolve_location_context(data.get("state"), data.get("district"), include_forecast=True)
 
-        print("Cleaned input before encoding:\n", input_data)
-
-        # ✅ Safe label encoding
-        for col, le in label_encoders.items():
-            if col in input_data.columns:
-                input_data[col] = input_data[col].apply(
-                    lambda val: val if val in le.classes_ else le.classes_[0]
-                )
-                input_data[col] = le.transform(input_data[col])
+        return jsonify(run_irrigation(data, context))
 
-        # 🔮 Predict
-        prediction = model.predict(input_data)[0]
-        irrigation_method = target_encoder.inverse_transform([prediction])[0]
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
 
-        # Probabilities
-        prediction_proba_raw = model.predict_proba(input_data)[0]
-        prediction_proba = {
-            method: round(prob, 3)
-            for method, prob in zip(target_encoder.classes_, prediction_proba_raw)
-        }
 
-        # Generate suggestion
-        suggestion = generate_irrigation_suggestion(
-            irrigation_method,
-            data.get("crop_name"),
-            weather,
-            soil_data,
-            future_rainfall,
-            data.get("area_acres")
-        )
-
-        return jsonify({
-            "irrigation_method": str(irrigation_method),
-            "suggestion": str(suggestion),
-            "temperature": float(weather["temperature"]),
-            "humidity": float(weather["humidity"]),
-            "rainfall_last_7_days": float(weather["rainfall"]),
-            "rainfall_forecast_next_7_days": float(future_rainfall),
-            "soil_type": str(soil_type),
-            "soil_ph": float(soil_data["ph"]),
-            "water_holding_capacity": str(water_capacity),
-            "inputs_used": {
-                **data,
-                "soil_type": str(soil_type),
-                "soil_ph": float(soil_data["ph"]),
-                "water_holding_capacity": str(water_capacity)
-            }
-        })
+@irrigation_bp.route("/predict_batch", methods=["POST"])
+def predict_irrigation_batch():
+    try:
+        records = get_batch_records(request.get_json())
+        return jsonify(run_batch(
+            records, ("state", "district"),
+            build_irrigation_features, predict_irrigation_rows, format_irrigation_result,
+            include_forecast=True, model="irrigation"
+        ))
 
     except Exception as e:
         return jsonify({"error": str(e)}), 400
-
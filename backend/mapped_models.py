@@ -0,0 +1,173 @@
+import os
+import json
+import logging
+import numpy as np
+import joblib
+
+# ---------------- Memory-mapped model artifacts ----------------
+# <artifact>.mmap/ is a directory written by models/mmap_export.py:
+#   manifest.json          format version, source pickle (size, mtime, sha256),
+#                          checksums of every file
+#   skeleton.pkl           the original object (bundle dict / tuple / Pipeline) with
+#                          every tree ensemble swapped for a MappedEnsemble stub
+#   <ensemble>.<array>.npy flat node tables, uncompressed
+#
+# The .npy files are opened with np.load(mmap_mode="r"), so every worker process
+# maps the same page-cache pages instead of holding a private copy. (Unpickling a
+# fitted sklearn tree or an XGBoost booster always copies its nodes into the
+# process, which is why joblib's own mmap_mode is not enough.)
+
+MAPPED_SUFFIX = ".mmap"
+MANIFEST = "manifest.json"
+SKELETON = "skeleton.pkl"
+FORMAT_VERSION = 1
+NODE_ARRAYS = ("feature", "threshold", "left", "right", "missing", "value", "roots", "tree_class")
+
+
+class MappedEnsemble:
+    """
+    Tree ensemble evaluated from flat node tables (all trees concatenated, leaves
+    point at themselves). Stands in for RandomForest*/Bagging(DecisionTree)/
+    DecisionTree*/XGB* estimators: predict, predict_proba, classes_.
+
+    link:
+      "mean_proba"  average of per-tree class distributions (sklearn classifiers)
+      "mean"        average of per-tree values (sklearn regressors, bagging)
+      "identity"    base margin + sum of leaves (xgboost regression)
+      "logistic"    sigmoid of the margin (xgboost binary)
+      "softmax"     softmax over per-class margins (xgboost multi-class)
+    """
+
+    def __init__(self, name, link, max_depth, n_features, strict_less=False, classes=None,
+                 base_margin=0.0, feature_names=None, source=None):
+        self.name = name
+        self.link = link
+        self.max_depth = int(max_depth)
+        self.n_features_in_ = int(n_features)
+        self.strict_less = strict_less  # xgboost splits on x < t, sklearn on x <= t
+        if classes is not None:
+            self.classes_ = np.asarray(classes)
+        self.base_margin = np.asarray(base_margin, dtype=np.float64)
+        self.feature_names = list(feature_names) if feature_names is not None else None
+        self.source = source
+        self.arrays = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["arrays"] = None  # node tables live in the .npy files, never in the pickle
+        return state
+
+    def attach(self, directory):
+        self.arrays = {
+            key: np.load(os.path.join(directory, f"{self.name}.{key}.npy"), mmap_mode="r")
+            for key in NODE_ARRAYS
+        }
+        return self
+
+    def _matrix(self, X):
+        if hasattr(X, "columns") and self.feature_names is not None:
+            X = X[self.feature_names]
+        if hasattr(X, "toarray"):
+            X = X.toarray()
+        # Both libraries compare float32 inputs, so round the same way first
+        return np.asarray(X, dtype=np.float32).astype(np.float64)
+
+    def _leaves(self, X):
+        a = self.arrays
+        X = self._matrix(X)
+        rows = np.arange(X.shape[0])[:, None]
+        node = np.tile(np.asarray(a["roots"]), (X.shape[0], 1))
+        for _ in range(self.max_depth):
+            x = X[rows, a["feature"][node]]
+            threshold = a["threshold"][node]
+            go_left = x < threshold if self.strict_less else x <= threshold
+            step = np.where(go_left, a["left"][node], a["right"][node])
+            step = np.where(np.isnan(x), a["missing"][node], step)
+            if np.array_equal(step, node):
+                break
+            node = step
+        return node
+
+    def _margin(self, X):
+        values = self.arrays["value"][self._leaves(X)]
+        if self.link == "softmax":
+            tree_class = np.asarray(self.arrays["tree_class"])
+            margin = np.empty((values.shape[0], len(self.classes_)))
+            for c in range(len(self.classes_)):
+                margin[:, c] = values[:, tree_class == c].sum(axis=1)
+            return margin + self.base_margin
+        if self.link in ("mean", "mean_proba"):
+            return values.mean(axis=1)
+        return values.sum(axis=1) + self.base_margin
+
+    def predict_proba(self, X):
+        margin = self._margin(X)
+        if self.link == "mean_proba":
+            return margin
+        if self.link == "logistic":
+            p = 1.0 / (1.0 + np.exp(-margin))
+            return np.column_stack([1.0 - p, p])
+        if self.link == "softmax":
+            e = np.exp(margin - margin.max(axis=1, keepdims=True))
+            return e / e.sum(axis=1, keepdims=True)
+        raise AttributeError("predict_proba is only available for classifiers")
+
+    def predict(self, X):
+        if hasattr(self, "classes_"):
+            return self.classes_[self.predict_proba(X).argmax(axis=1)]
+        return self._margin(X)
+
+
+def is_mapped(path):
+    return path.rstrip(os.sep).endswith(MAPPED_SUFFIX)
+
+
+def mapped_path(path):
+    return os.path.splitext(path)[0] + MAPPED_SUFFIX
+
+
+def mapped_ensembles(obj):
+    """Every MappedEnsemble reachable from a bundle dict / tuple / list / Pipeline."""
+    if isinstance(obj, MappedEnsemble):
+        return [obj]
+    if isinstance(obj, dict):
+        children = obj.values()
+    elif isinstance(obj, (list, tuple)):
+        children = obj
+    elif hasattr(obj, "steps"):
+        children = [step for _, step in obj.steps]
+    else:
+        return []
+    return [e for child in children for e in mapped_ensembles(child)]
+
+
+def load_mapped(path):
+    """Same object the pickle would give, with tree ensembles served from mapped node tables."""
+    logging.info(f"Loading memory-mapped model from: {path}")
+    with open(os.path.join(path, MANIFEST)) as f:
+        manifest = json.load(f)
+    if manifest.get("format") != FORMAT_VERSION:
+        raise ValueError(f"Unsupported mapped artifact format {manifest.get('format')} in {path}")
+    obj = joblib.load(os.path.join(path, SKELETON), mmap_mode="r")
+    for ensemble in mapped_ensembles(obj):
+        ensemble.attach(path)
+    return obj
+
+
+def process_memory():
+    """Resident memory of this worker: total, private (anon) and shared file-backed pages."""
+    memory = {"pid": os.getpid()}
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                if key in ("VmRSS", "RssAnon", "RssFile", "RssShmem"):
+                    memory[f"{key}_kb"] = int(value.split()[0])
+        # Proportional set size: shared pages divided across the processes mapping them
+        with open("/proc/self/smaps_rollup") as f:
+            for line in f:
+                if line.startswith("Pss:"):
+                    memory["Pss_kb"] = int(line.split()[1])
+    except OSError:
+        pass  # not Linux
+    return memory
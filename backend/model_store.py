@@ -0,0 +1,284 @@
+import os
+import glob
+import json
+import time
+import hashlib
+import hmac
+import threading
+import logging
+from datetime import datetime, UTC
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import g, has_request_context
+
+from mapped_models import MANIFEST, MAPPED_SUFFIX, process_memory
+
+# ---------------- Model registry ----------------
+# Blueprints register each model with a path resolver and a loader at import
+# time (cheap, no I/O). app.py then deserializes every model concurrently in
+# the background so the server can start listening immediately.
+#
+# Every loaded artifact becomes an immutable "version" entry:
+#   {"model", "version", "path", "metadata"}
+# and the active entry per model is swapped in with a single assignment, so a
+# new version is loaded fully in the background before any request sees it.
+# Requests pin the version they first touch (flask.g), so one request never
+# mixes two versions even if a swap happens mid-flight.
+
+MODELS_DIR = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "models"))
+MODEL_LOAD_WORKERS = int(os.getenv("MODEL_LOAD_WORKERS", "4"))
+# How long a request waits for a model that is still loading before failing
+MODEL_WAIT_SECONDS = float(os.getenv("MODEL_WAIT_SECONDS", "60"))
+# Poll interval for changed artifacts (0 disables the watcher)
+MODEL_RELOAD_INTERVAL = float(os.getenv("MODEL_RELOAD_INTERVAL", "30"))
+# POST /models/reload is refused unless this is set and sent as X-Reload-Token (the watcher needs none)
+MODEL_RELOAD_TOKEN = os.getenv("MODEL_RELOAD_TOKEN")
+
+_specs = {}
+_active = {}
+_status = {}
+_events = {}
+_lock = threading.Lock()
+_reload_locks = {}
+_loading_started = False
+
+
+def register_model(name, loader, path, describe=None):
+    """
+    Register a model. `path` is the artifact path or a callable returning it
+    (e.g. the yield model picks the best pipeline from results.csv);
+    loader(path) deserializes it; describe(model) may return extra metadata
+    such as {"features": [...]}. Nothing is read until load_models() runs.
+    """
+    with _lock:
+        _specs[name] = {"loader": loader, "path": path, "describe": describe}
+        _events[name] = threading.Event()
+        _reload_locks[name] = threading.Lock()
+        _status[name] = {"state": "pending", "path": None, "load_seconds": None, "error": None}
+
+
+def _resolve_path(name):
+    path = _specs[name]["path"]
+    return os.path.abspath(path() if callable(path) else path)
+
+
+def _artifact_file(path):
+    """File that identifies an artifact: itself, or the manifest of a mapped (.mmap/) directory."""
+    return os.path.join(path, MANIFEST) if os.path.isdir(path) else path
+
+
+def _artifact_size(path):
+    if os.path.isdir(path):
+        return sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path))
+    return os.path.getsize(path)
+
+
+def file_checksum(path):
+    path = _artifact_file(path)
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def _fingerprint(path):
+    stat = os.stat(_artifact_file(path))
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _training_metrics(path):
+    """results.csv written next to the artifact by the training script, if any."""
+    results_path = os.path.join(os.path.dirname(path), "results.csv")
+    if not os.path.exists(results_path):
+        return None
+    try:
+        import pandas as pd
+        return json.loads(pd.read_csv(results_path).to_json(orient="records"))
+    except Exception as e:
+        return {"error": str(e)}
+
+
+def _build_metadata(name, path, model):
+    checksum = file_checksum(path)
+    stat = os.stat(_artifact_file(path))
+    metadata = {
+        "checksum": f"sha256:{checksum}",
+        "size_bytes": _artifact_size(path),
+        "modified_at": datetime.fromtimestamp(stat.st_mtime, UTC).isoformat(),
+        "loaded_at": datetime.now(UTC).isoformat(),
+        "metrics": _training_metrics(path),
+    }
+    # Optional sidecar written alongside the artifact (e.g. Fertilizer_pipeline.pkl.meta.json)
+    sidecar = f"{path}.meta.json"
+    if os.path.exists(sidecar):
+        with open(sidecar) as f:
+            metadata.update(json.load(f))
+    describe = _specs[name]["describe"]
+    if describe is not None:
+        metadata.update(describe(model))
+    version = f"{datetime.fromtimestamp(stat.st_mtime, UTC):%Y%m%d%H%M%S}-{checksum[:12]}"
+    return version, metadata
+
+
+def _load(name):
+    """Load the current artifact for `name` and swap it in. Old version keeps serving on failure."""
+    with _reload_locks[name]:
+        with _lock:
+            if _status[name]["state"] == "pending":
+                _status[name]["state"] = "loading"
+        start = time.perf_counter()
+        try:
+            path = _resolve_path(name)
+            fingerprint = _fingerprint(path)
+            model = _specs[name]["loader"](path)
+            version, metadata = _build_metadata(name, path, model)
+        except Exception as e:
+            logging.error(f"Failed to load model '{name}': {e}")
+            with _lock:
+                _status[name].update(error=str(e), load_seconds=round(time.perf_counter() - start, 3))
+                if name not in _active:
+                    _status[name]["state"] = "failed"
+            _events[name].set()
+            return False
+
+        entry = {"model": model, "version": version, "path": path,
+                 "fingerprint": fingerprint, "metadata": metadata}
+        with _lock:
+            previous = _active.get(name)
+            _active[name] = entry  # atomic swap; in-flight requests keep their pinned entry
+            _status[name].update(state="ready", error=None, path=path, version=version,
+                                 load_seconds=round(time.perf_counter() - start, 3))
+        _events[name].set()
+        if previous is None or previous["version"] != version:
+            logging.info(f"Model '{name}' now serving version {version} "
+                         f"(loaded in {_status[name]['load_seconds']}s)")
+        return True
+
+
+def load_models(max_workers=MODEL_LOAD_WORKERS):
+    """Deserialize every registered model concurrently; blocks until all are done."""
+    global _loading_started
+    with _lock:
+        _loading_started = True
+        names = list(_specs)
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="model-load") as pool:
+        list(pool.map(_load, names))
+
+
+def reload_authorized(headers):
+    """True only for a request carrying the configured reload token."""
+    if not MODEL_RELOAD_TOKEN:
+        return False
+    supplied = headers.get("X-Reload-Token")
+    return supplied is not None and hmac.compare_digest(supplied.encode("utf-8"), MODEL_RELOAD_TOKEN.encode("utf-8"))
+
+
+def reload_models(names=None):
+    """Reload the given (or all) models whose artifact changed; returns {name: version}."""
+    names = list(_specs) if names is None else names
+    for name in names:
+        if name not in _specs:
+            raise KeyError(f"Unknown model '{name}'")
+    for name in names:
+        if _artifact_changed(name):
+            _load(name)
+    return {name: _active[name]["version"] for name in names if name in _active}
+
+
+def _artifact_changed(name):
+    entry = _active.get(name)
+    if entry is None:
+        return True
+    try:
+        path = _resolve_path(name)
+        return path != entry["path"] or _fingerprint(path) != entry["fingerprint"]
+    except Exception:
+        return False
+
+
+def _watch():
+    while True:
+        time.sleep(MODEL_RELOAD_INTERVAL)
+        try:
+            reload_models()
+        except Exception as e:
+            logging.error(f"Model reload check failed: {e}")
+
+
+def start_background_loading():
+    """Initial concurrent load, then (optionally) poll for new artifacts and hot swap them."""
+    def run():
+        load_models()
+        if MODEL_RELOAD_INTERVAL > 0:
+            _watch()
+
+    thread = threading.Thread(target=run, name="model-loader", daemon=True)
+    thread.start()
+    return thread
+
+
+def _active_entry(name):
+    if name not in _specs:
+        raise KeyError(f"Unknown model '{name}'")
+    if not _loading_started and not _events[name].is_set():
+        # Used outside app.py (scripts, shell): load synchronously on first use
+        _load(name)
+    elif not _events[name].wait(MODEL_WAIT_SECONDS):
+        raise RuntimeError(f"Model '{name}' is still loading")
+    entry = _active.get(name)
+    if entry is None:
+        raise RuntimeError(f"Model '{name}' failed to load: {_status[name]['error']}")
+    return entry
+
+
+def get_model_entry(name):
+    """Version entry for `name`, pinned for the rest of the current request."""
+    if not has_request_context():
+        return _active_entry(name)
+    pinned = g.setdefault("pinned_models", {})
+    if name not in pinned:
+        pinned[name] = _active_entry(name)
+    return pinned[name]
+
+
+def get_model(name):
+    return get_model_entry(name)["model"]
+
+
+def get_model_version(name):
+    return get_model_entry(name)["version"]
+
+
+def discover_artifacts(models_dir=MODELS_DIR):
+    """Every artifact (pickled, compiled or mapped) under models/*/ with size and modification time."""
+    artifacts = []
+    paths = (glob.glob(os.path.join(models_dir, "*", "*.pkl")) + glob.glob(os.path.join(models_dir, "*", "*.onnx")) +
+             glob.glob(os.path.join(models_dir, "*", f"*{MAPPED_SUFFIX}")))
+    for path in sorted(paths):
+        stat = os.stat(_artifact_file(path))
+        artifacts.append({
+            "path": os.path.relpath(path, models_dir),
+            "size_bytes": _artifact_size(path),
+            "modified_at": datetime.fromtimestamp(stat.st_mtime, UTC).isoformat(),
+        })
+    return artifacts
+
+
+def registry_info():
+    with _lock:
+        active = {
+            name: {"version": entry["version"], "path": entry["path"], "metadata": entry["metadata"]}
+            for name, entry in _active.items()
+        }
+    # Per-worker memory: mapped artifacts show up as shared file-backed pages, not private ones
+    return {"active": active, "available": discover_artifacts(), "process": process_memory()}
+
+
+def readiness():
+    with _lock:
+        models = {name: dict(status) for name, status in _status.items()}
+    return {
+        "ready": bool(models) and all(name in _active for name in models),
+        "models": models,
+    }
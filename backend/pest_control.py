@@ -2,11 +2,20 @@ from flask import Blueprint, request, jsonify
 import joblib
 import pandas as pd
 import os, sys
+import logging
 from datetime import datetime
 
 # Make sure api/ is accessible
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from api.Api_data import get_lat_lon, get_last7days_weather, get_soil_ph_and_type
+from api.context import resolve_location_context
+from api.translation import msg, render_messages, translate_messages
+from api.metrics import timed
+from api.logs import log_event
+from batch import get_batch_records, run_batch
+from model_store import register_model, get_model, get_model_version
+from inference import serving_path, is_compiled, load_compiled
+from feature_encoding import compiled_pipeline
+from mapped_models import is_mapped, load_mapped
 
 # Create Blueprint
 pest_bp = Blueprint("pest_control", __name__)
@@ -16,69 +25,187 @@ BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 MODEL_PATH = os.path.join(BASE_DIR, "../models/pest_risk/PestRisk_RFClassifier_pipeline.pkl")
 MODEL_PATH = os.path.abspath(MODEL_PATH)
 
-print("🔍 Loading Pest Risk model from:", MODEL_PATH)
 
-# Load trained pipeline
-pipeline = joblib.load(MODEL_PATH)
+def load_pest_pipeline(path):
+    if is_compiled(path):
+        return load_compiled(path)
+    if is_mapped(path):
+        return load_mapped(path)
+    log_event("pest_control.model_load", level=logging.INFO, path=path)
+    return joblib.load(path)
+
+
+def describe_pest_pipeline(pipeline):
+    return {
+        "features": list(getattr(pipeline, "feature_names_in_", [])),
+        "classes": [str(c) for c in pipeline.classes_],
+    }
+
+
+# Trained pipeline, deserialized in the background by app.py and
+# hot-reloaded when the file changes (see model_store)
+register_model("pest_control", load_pest_pipeline, lambda: serving_path(MODEL_PATH),
+               describe=describe_pest_pipeline)
 
 
 # 🔹 Suggestion logic based on pest risk prediction
-def generate_pest_suggestion(prediction, crop, growth_stage, weather, soil):
+def generate_pest_suggestion_messages(prediction, crop, growth_stage, weather, soil):
+    """The suggestion as (template, params) sentences — see api/translation.py."""
     risk = prediction.lower()
     temp = weather.get("temperature")
     hum = weather.get("humidity")
     rain = weather.get("rainfall")
     ph = soil.get("ph")
+    where = {"crop": crop, "growth_stage": growth_stage}
 
     if risk == "low":
-        return (
-            f"✅ Pest risk is LOW for {crop} at {growth_stage} stage. "
-            f"Continue regular monitoring. Current conditions (T={temp}°C, H={hum}%, Rain={rain}mm) "
-            f"are generally unfavorable for major pest outbreaks."
-        )
+        return [
+            msg("{icon} Pest risk is LOW for {crop} at {growth_stage} stage.", icon="✅", **where),
+            msg("Continue regular monitoring."),
+            msg("Current conditions (T={temp}°C, H={hum}%, Rain={rain}mm) "
+                "are generally unfavorable for major pest outbreaks.", temp=temp, hum=hum, rain=rain),
+        ]
 
     elif risk == "moderate" or risk == "medium":  # handle both words
-        return (
-            f"⚠️ Pest risk is MODERATE for {crop} at {growth_stage} stage. "
-            f"Watch leaves and stems closely. You may consider organic repellents (e.g., neem spray). "
-            f"Soil pH={ph}, Rainfall={rain}mm, and Humidity={hum}% could support some pest activity."
-        )
+        return [
+            msg("{icon} Pest risk is MODERATE for {crop} at {growth_stage} stage.", icon="⚠️", **where),
+            msg("Watch leaves and stems closely."),
+            msg("You may consider organic repellents (e.g., neem spray)."),
+            msg("Soil pH={ph}, Rainfall={rain}mm, and Humidity={hum}% could support some pest activity.",
+                ph=ph, rain=rain, hum=hum),
+        ]
 
     elif risk == "high":
         # Build reasons
         reasons = []
         if hum is not None:
             if hum > 70:
-                reasons.append(f"high humidity ({hum}%)")
+                reasons.append(msg("high humidity ({hum}%)", hum=hum))
             elif hum < 40:
-                reasons.append(f"low humidity ({hum}%)")
+                reasons.append(msg("low humidity ({hum}%)", hum=hum))
         if rain is not None:
             if rain > 50:
-                reasons.append(f"heavy rainfall ({rain}mm)")
+                reasons.append(msg("heavy rainfall ({rain}mm)", rain=rain))
             elif rain < 10:
-                reasons.append(f"low rainfall ({rain}mm)")
-        reason_text = " and ".join(reasons) if reasons else "current weather conditions"
-
-        return (
-            f"❌ Pest risk is HIGH for {crop} at {growth_stage} stage. "
-            f"Immediate monitoring is required. The risk is mainly due to {reason_text}. "
-            f"Consult an agri expert and apply recommended pesticides."
-        )
+                reasons.append(msg("low rainfall ({rain}mm)", rain=rain))
+        if len(reasons) == 2:
+            reason = msg("{first} and {second}", first=reasons[0], second=reasons[1])
+        elif reasons:
+            reason = reasons[0]
+        else:
+            reason = msg("current weather conditions")
+
+        return [
+            msg("{icon} Pest risk is HIGH for {crop} at {growth_stage} stage.", icon="❌", **where),
+            msg("Immediate monitoring is required."),
+            msg("The risk is mainly due to {reason}.", reason=reason),
+            msg("Consult an agri expert and apply recommended pesticides."),
+        ]
 
     elif risk == "very high":
-        return (
-            f"🚨 Pest risk is VERY HIGH for {crop} at {growth_stage} stage! "
-            f"Urgent action is needed. Weather (T={temp}°C, H={hum}%, Rain={rain}mm) "
-            f"and soil pH={ph} create extremely favorable conditions for pest outbreak. "
-            f"Consult experts immediately and apply strong preventive/control measures."
-        )
+        return [
+            msg("{icon} Pest risk is VERY HIGH for {crop} at {growth_stage} stage!", icon="🚨", **where),
+            msg("Urgent action is needed."),
+            msg("Weather (T={temp}°C, H={hum}%, Rain={rain}mm) and soil pH={ph} "
+                "create extremely favorable conditions for pest outbreak.", temp=temp, hum=hum, rain=rain, ph=ph),
+            msg("Consult experts immediately and apply strong preventive/control measures."),
+        ]
 
     else:
-        return (
-            f"ℹ️ Pest risk level '{prediction}' could not be interpreted clearly. "
-            f"Please verify your inputs or consult your local agricultural officer."
-        )
+        return [
+            msg("{icon} Pest risk level '{prediction}' could not be interpreted clearly.", icon="ℹ️",
+                prediction=prediction),
+            msg("Please verify your inputs or consult your local agricultural officer."),
+        ]
+
 
+def generate_pest_suggestion(prediction, crop, growth_stage, weather, soil):
+    return render_messages(generate_pest_suggestion_messages(prediction, crop, growth_stage, weather, soil))
+
+
+def build_pest_features(user_data, context):
+    """Model input row for one request."""
+    weather = context["weather"]
+    soil_data = context["soil"]
+
+    # Step 4: Build final model input
+    return {
+        "Crop": user_data.get("Crop").title(),
+        "Variety": user_data.get("Variety").title(),
+        "Growth_Stage": user_data.get("Growth_Stage"),
+        "Soil_Type": user_data.get("soil_type").title(),
+        "pH_Value": soil_data["ph"],
+        "Temperature": weather["temperature"],
+        "Humidity": weather["humidity"],
+        "Rainfall": weather["rainfall"]
+    }
+
+
+def predict_pest_rows(rows):
+    """One predict_proba call for any number of rows → [(prediction, proba_row), ...]"""
+    pipeline = get_model("pest_control")
+    log_event("pest_control.model_input", sample=True, rows=rows)
+
+    # Step 5: Predict (class = argmax of the probabilities)
+    fast = compiled_pipeline(pipeline)
+    if fast is not None:
+        # ⚡ Ordinal codes via dict lookups straight into a NumPy matrix
+        prediction_proba_raw = fast.predict_proba(rows)
+    else:
+        prediction_proba_raw = pipeline.predict_proba(pd.DataFrame(rows))
+    predictions = pipeline.classes_[prediction_proba_raw.argmax(axis=1)]
+    return list(zip(predictions, prediction_proba_raw))
+
+
+def format_pest_result(user_data, context, row, output):
+    prediction, prediction_proba_raw = output
+    weather = context["weather"]
+    soil_data = context["soil"]
+
+    # Probabilities mapped to class labels
+    pipeline = get_model("pest_control")
+    prediction_proba = {
+        label: round(prob, 3)
+        for label, prob in zip(pipeline.classes_, prediction_proba_raw)
+    }
+
+    # Step 6: Generate suggestion
+    messages = generate_pest_suggestion_messages(
+        prediction, user_data.get("Crop"), user_data.get("Growth_Stage"), weather, soil_data
+    )
+    suggestion = render_messages(messages)
+
+    # Step 7: Return JSON-ready result
+    result = {
+        "prediction": str(prediction),
+        "prediction_proba": prediction_proba,
+        "suggestion": suggestion,
+        "temperature": weather["temperature"],
+        "humidity": weather["humidity"],
+        "rainfall": weather["rainfall"],
+        "ph": soil_data["ph"],
+        "soil_type": row["Soil_Type"],
+        "inputs_used": row,
+        "state": user_data.get("State"),
+        "district": user_data.get("District"),
+        "model_version": get_model_version("pest_control")
+    }
+    # 🌐 Optional translated suggestion, e.g. "lang": "hi"
+    lang = user_data.get("lang")
+    if lang:
+        result["lang"] = lang
+        result["suggestion_translated"] = translate_messages(messages, lang)
+    return result
+
+
+def run_pest_risk(user_data, context):
+    """Pest risk prediction for one request, given its resolved location context."""
+    with timed("encoding", model="pest_control", mode="single"):
+        row = build_pest_features(user_data, context)
+    with timed("inference", model="pest_control", mode="single"):
+        output = predict_pest_rows([row])[0]
+    with timed("formatting", model="pest_control", mode="single"):
+        return format_pest_result(user_data, context, row, output)
 
 
 @pest_bp.route("/predict", methods=["POST"])
@@ -86,73 +213,27 @@ def predict_pest_risk():
     try:
         # Get JSON request data
         user_data = request.get_json()
-        print("🔍 User Input received:", user_data)
-
-        # Required inputs
-        crop = user_data.get("Crop")
-        variety = user_data.get("Variety")
-        growth_stage = user_data.get("Growth_Stage")
-        print(growth_stage)
-        state = user_data.get("State")
-        district = user_data.get("District")
-        soil_type = user_data.get("soil_type").title()
-
-        # Step 1: Get location (lat, lon)
-        lat_lon = get_lat_lon(state, district)
-        lat, lon = lat_lon["lat"], lat_lon["lon"]
-
-        # Step 2: Get last 7 days weather
-        weather = get_last7days_weather(lat, lon)
-
-        # Step 3: Get soil data
-        soil_data = get_soil_ph_and_type(lat, lon)
-        print(soil_data)
-        # Step 4: Build final model input
-        
-
-        X_new = pd.DataFrame([{
-                "Crop": crop.title(),
-                "Variety": variety.title(),
-                "Growth_Stage": growth_stage,
-                "Soil_Type": soil_type,
-                "pH_Value": soil_data["ph"],
-                "Temperature": weather["temperature"],
-                "Humidity": weather["humidity"],
-                "Rainfall": weather["rainfall"]
-            }])
-
-
-
-        print("✅ Final Model Input:", X_new)
-
-        # Step 5: Predict
-        prediction = pipeline.predict(X_new)[0]
-
-        # Probabilities mapped to class labels
-        prediction_proba_raw = pipeline.predict_proba(X_new)[0]
-        prediction_proba = {
-            label: round(prob, 3)
-            for label, prob in zip(pipeline.classes_, prediction_proba_raw)
-        }
-
-        # Step 6: Generate suggestion
-        suggestion = generate_pest_suggestion(prediction, crop, growth_stage, weather, soil_data)
-
-        # Step 7: Return JSON
-        return jsonify({
-            "prediction": str(prediction),
-            "prediction_proba": prediction_proba,
-            "suggestion": suggestion,
-            "temperature": weather["temperature"],
-            "humidity": weather["humidity"],
-            "rainfall": weather["rainfall"],
-            "ph": soil_data["ph"],
-            "soil_type": soil_type,
-            "inputs_used": X_new.to_dict(orient="records")[0],
-            "state": state,
-            "district": district
-        })
+        log_event("pest_control.request", sample=True, body=user_data)
+
+        # Step 1-3: Get location, then last 7 days weather + soil data concurrently
+        context = resolve_location_context(user_data.get("State"), user_data.get("District"))
+
+        return jsonify(run_pest_risk(user_data, context))
+
+    except Exception as e:
+        log_event("pest_control.error", level=logging.ERROR, error=str(e))
+        return jsonify({"error": str(e)}), 400
+
+
+@pest_bp.route("/predict_batch", methods=["POST"])
+def predict_pest_risk_batch():
+    try:
+        records = get_batch_records(request.get_json())
+        return jsonify(run_batch(
+            records, ("State", "District"),
+            build_pest_features, predict_pest_rows, format_pest_result,
+            model="pest_control"
+        ))
 
     except Exception as e:
-        print("❌ Error in pest prediction:", str(e))
         return jsonify({"error": str(e)}), 400
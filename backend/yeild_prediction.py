@@ -2,11 +2,20 @@ from flask import Blueprint, request, jsonify
 import joblib
 import pandas as pd
 import sys, os
+import logging
 from datetime import datetime
 
 # ✅ Make sure api/ is accessible
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from api.Api_data import get_lat_lon, get_last7days_weather, get_soil_ph_and_type
+from api.context import resolve_location_context
+from api.sensor_index import lookup_npk
+from api.metrics import timed
+from api.logs import log_event
+from batch import get_batch_records, run_batch
+from model_store import register_model, get_model, get_model_version
+from inference import serving_path, is_compiled, load_compiled
+from feature_encoding import compiled_pipeline
+from mapped_models import is_mapped, load_mapped
 
 # Create blueprint
 yield_bp = Blueprint("yield", __name__)
@@ -15,26 +24,52 @@ yield_bp = Blueprint("yield", __name__)
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 RESULTS_PATH = os.path.join(BASE_DIR, "../models/yeild_prediction/results.csv")
 
-# Load results
-results_df = pd.read_csv(os.path.abspath(RESULTS_PATH), index_col=0)
 
-# Find best model (lowest MSE)
-best_model_name = results_df["MSE"].idxmin()
-print(f"✅ Best yield model: {best_model_name}")
+def best_yield_model_name():
+    # Load results
+    results_df = pd.read_csv(os.path.abspath(RESULTS_PATH), index_col=0)
 
-# Construct model path
-MODEL_PATH = os.path.join(BASE_DIR, f"../models/yeild_prediction/{best_model_name.replace(' ', '_')}_pipeline.pkl")
-MODEL_PATH = os.path.abspath(MODEL_PATH)
+    # Find best model (lowest MSE)
+    return results_df["MSE"].idxmin()
 
-# Load trained pipeline
-model = joblib.load(MODEL_PATH)
 
-# Extract features from preprocessor
-preprocessor = model.named_steps["preprocessor"]
-FEATURES = []
-for _, _, cols in preprocessor.transformers:
-    if cols is not None:
-        FEATURES.extend(cols)
+def best_yield_model_path():
+    """Pipeline file of the best model (lowest MSE) listed in results.csv"""
+    best_model_name = best_yield_model_name()
+    model_path = os.path.join(BASE_DIR, f"../models/yeild_prediction/{best_model_name.replace(' ', '_')}_pipeline.pkl")
+    return os.path.abspath(model_path)
+
+
+def load_yield_model(model_path):
+    """Best pipeline by MSE in results.csv, plus the feature columns its preprocessor expects."""
+    best_model_name = best_yield_model_name()
+    log_event("yield_prediction.model_load", level=logging.INFO, model=best_model_name, path=model_path)
+
+    if is_compiled(model_path):
+        model = load_compiled(model_path)
+        return {"model": model, "features": model.meta["features"], "name": best_model_name, "path": model_path}
+
+    # Load trained pipeline (tree node tables memory-mapped when serving a .mmap artifact)
+    model = load_mapped(model_path) if is_mapped(model_path) else joblib.load(model_path)
+
+    # Extract features from preprocessor
+    preprocessor = model.named_steps["preprocessor"]
+    features = []
+    for _, _, cols in preprocessor.transformers:
+        if cols is not None:
+            features.extend(cols)
+
+    return {"model": model, "features": features, "name": best_model_name, "path": model_path}
+
+
+def describe_yield_model(bundle):
+    return {"features": bundle["features"], "model_name": bundle["name"]}
+
+
+# Deserialized in the background by app.py and hot-reloaded when the best
+# pipeline (or results.csv's choice of it) changes (see model_store)
+register_model("yield_prediction", load_yield_model, lambda: serving_path(best_yield_model_path()),
+               describe=describe_yield_model)
 
 
 @yield_bp.route("/", methods=["GET"])
@@ -47,71 +82,108 @@ def features():
     return jsonify({"features": ["crop", "state_name", "dist_name", "area_in_acres"]})
 
 
+SHOW_FEATURES = [
+    "temperature_c", "humidity_%", "rainfall_mm", "wind_speed_m_s",
+    "solar_radiation_mj_m2_day", "n_req_kg_per_ha", "p_req_kg_per_ha",
+    "k_req_kg_per_ha", "ph"
+]
+
+
+def build_yield_features(userinput, context):
+    """Model input row (dict keyed by FEATURES) for one request."""
+    last7days_weather = context["weather"]
+    soil_data = context["soil"]
+
+    # NPK reference values from the preloaded sensor dataset index
+    npk_data = lookup_npk(userinput["soil_type"], userinput["crop"])
+    if npk_data is None:
+        raise ValueError(f"No N/P/K reference data for soil type '{userinput['soil_type']}' and crop '{userinput['crop']}'")
+    log_event("yield_prediction.context", sample=True, weather=last7days_weather, soil=soil_data, npk=npk_data)
+
+    # Build model input
+    row = dict.fromkeys(get_model("yield_prediction")["features"])
+    row["year"] = int(datetime.now().year)
+    row["temperature_c"] = int(last7days_weather["temperature"])
+    row["humidity_%"] = last7days_weather["humidity"]
+    row["rainfall_mm"] = last7days_weather["rainfall"]
+    row["wind_speed_m_s"] = last7days_weather["windspeed"]
+    row["solar_radiation_mj_m2_day"] = last7days_weather["solar_radiation"]
+    row["crop"] = userinput.get("crop")
+    row["state_name"] = userinput.get("state_name")
+    row["dist_name"] = userinput.get("dist_name")
+    row["n_req_kg_per_ha"] = int(npk_data["Nitrogen"])
+    row["p_req_kg_per_ha"] = int(npk_data["Phosphorus"])
+    row["k_req_kg_per_ha"] = int(npk_data["Potassium"])
+    row["area_ha"] = int(0.404686 * userinput["area_in_acres"])
+    row["ph"] = soil_data["ph"]
+    return row
+
+
+def predict_yield_rows(rows):
+    """One model.predict call for any number of rows → [prediction, ...]"""
+    bundle = get_model("yield_prediction")
+    model = bundle["model"]
+
+    fast = compiled_pipeline(model, bundle["features"])
+    if fast is not None:
+        # ⚡ Scaling / one-hot / ordinal codes computed straight into a NumPy matrix
+        return list(fast.predict(rows))
+
+    df_input = pd.DataFrame(rows, columns=bundle["features"])
+
+    # Convert numerics
+    for col in df_input.columns:
+        df_input[col] = pd.to_numeric(df_input[col], errors="ignore")
+
+    return list(model.predict(df_input))
+
+
+def format_yield_result(userinput, context, row, prediction):
+    # Show selected features back
+    inputs_to_show = {col: row[col] for col in SHOW_FEATURES}
+
+    return {
+        "prediction": round(float(prediction), 2),
+        "prediction_unit": "kg/acre",
+        "total_prediction": round(float(prediction) * (userinput["area_in_acres"]), 2),
+        "total_prediction_unit": "kg",
+        "inputs_used": inputs_to_show,
+        "model_version": get_model_version("yield_prediction")
+    }
+
+
+def run_yield(userinput, context):
+    """Yield prediction for one request, given its resolved location context."""
+    log_event("yield_prediction.request", sample=True, body=userinput)
+    with timed("encoding", model="yield_prediction", mode="single"):
+        row = build_yield_features(userinput, context)
+    with timed("inference", model="yield_prediction", mode="single"):
+        prediction = predict_yield_rows([row])[0]
+    with timed("formatting", model="yield_prediction", mode="single"):
+        return format_yield_result(userinput, context, row, prediction)
+
+
 @yield_bp.route("/predict", methods=["POST"])
 def predict_yield():
     try:
         userinput = request.get_json()
-        userinput_df = pd.DataFrame([userinput], columns=["crop", "state_name", "dist_name", "area_in_acres","soil_type"])
-        print(userinput_df)
-        # Fetch location
-        lat_lon = get_lat_lon(userinput_df.loc[0, "state_name"], userinput_df.loc[0, "dist_name"])
-        lat, lon = lat_lon["lat"], lat_lon["lon"]
-
-        # Fetch weather + soil
-        last7days_weather = get_last7days_weather(lat, lon)
-        print("🔍 Weather data fetched:", last7days_weather)
-        soil_data = get_soil_ph_and_type(lat, lon)
-        print("🔍 Soil data fetched:", soil_data)
-
-        # Load NPK dataset
-        data_path = os.path.join(BASE_DIR, "sensor_Crop_Dataset.csv")
-        dataset = pd.read_csv(data_path)
-
-        
-        npk_data = dataset[
-            (dataset["Soil_Type"] == userinput_df.loc[0,"soil_type"].title()) &
-            (dataset["Crop"] == userinput_df.loc[0, "crop"].title())
-        ][["Nitrogen", "Phosphorus", "Potassium"]].mean()
-        print("🔍 NPK data fetched:", npk_data)
-        # Build model input
-        df_input = pd.DataFrame(columns=FEATURES)
-        df_input.loc[0, "year"] = int(datetime.now().year)
-        df_input.loc[0, "temperature_c"] = int(last7days_weather["temperature"])
-        df_input.loc[0, "humidity_%"] = last7days_weather["humidity"]
-        df_input.loc[0, "rainfall_mm"] = last7days_weather["rainfall"]
-        df_input.loc[0, "wind_speed_m_s"] = last7days_weather["windspeed"]
-        df_input.loc[0, "solar_radiation_mj_m2_day"] = last7days_weather["solar_radiation"]
-        df_input.loc[0, "crop"] = userinput_df.loc[0, "crop"]
-        df_input.loc[0, "state_name"] = userinput_df.loc[0, "state_name"]
-        df_input.loc[0, "dist_name"] = userinput_df.loc[0, "dist_name"]
-        df_input.loc[0, "n_req_kg_per_ha"] = int(npk_data["Nitrogen"])
-        df_input.loc[0, "p_req_kg_per_ha"] = int(npk_data["Phosphorus"])
-        df_input.loc[0, "k_req_kg_per_ha"] = int(npk_data["Potassium"])
-        df_input.loc[0, "area_ha"] = int(0.404686 * userinput_df.loc[0, "area_in_acres"])
-        df_input.loc[0, "ph"] = soil_data["ph"]
-
-        # Convert numerics
-        for col in df_input.columns:
-            df_input[col] = pd.to_numeric(df_input[col], errors="ignore")
-
-        # Prediction
-        prediction = model.predict(df_input)[0]
-
-        # Show selected features back
-        show_features = [
-            "temperature_c", "humidity_%", "rainfall_mm", "wind_speed_m_s",
-            "solar_radiation_mj_m2_day", "n_req_kg_per_ha", "p_req_kg_per_ha",
-            "k_req_kg_per_ha", "ph"
-        ]
-        inputs_to_show = df_input[show_features].to_dict(orient="records")[0]
-
-        return jsonify({
-            "prediction": round(float(prediction), 2),
-            "prediction_unit": "kg/acre",
-            "total_prediction": round(float(prediction) * (userinput_df.loc[0, "area_in_acres"]), 2),
-            "total_prediction_unit": "kg",
-            "inputs_used": inputs_to_show
-        })
+        # Fetch location, then weather + soil concurrently
+        context = resolve_location_context(userinput.get("state_name"), userinput.get("dist_name"))
+        return jsonify(run_yield(userinput, context))
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+
+
+@yield_bp.route("/predict_batch", methods=["POST"])
+def predict_yield_batch():
+    try:
+        records = get_batch_records(request.get_json())
+        return jsonify(run_batch(
+            records, ("state_name", "dist_name"),
+            build_yield_features, predict_yield_rows, format_yield_result,
+            model="yield_prediction"
+        ))
 
     except Exception as e:
         return jsonify({"error": str(e)}), 400
@@ -0,0 +1,426 @@
+"""
+Stage-by-stage benchmarks for the API and the training scripts.
+
+    python benchmarks/run.py                                  # → benchmarks/latest.json
+    python benchmarks/run.py --stages upstream predict        # only stages starting with these
+    python benchmarks/run.py --training                       # + every training script under models/
+    python benchmarks/run.py --save-baseline                  # also write benchmarks/baseline.json
+    python benchmarks/run.py --compare benchmarks/baseline.json --threshold 0.25
+    python benchmarks/run.py --compare benchmarks/baseline.json --results benchmarks/latest.json
+
+Every upstream (geocode, NASA POWER, ISRIC, OpenWeather, LibreTranslate) is
+answered by benchmarks/stubs.py, so timings measure this code base, not the
+network (--upstream-latency-ms adds a fixed delay per call). Caches point at a
+scratch directory; ".cold" stages clear them before every sample, ".warm"
+stages run against a filled cache.
+
+Stages:
+  upstream.<source>.cold|warm   geocode / weather / soil / forecast resolution
+  context.resolve.cold|warm     all of them together (resolve_location_context)
+  features.<model>              build_*_features for one request
+  predict.<model>.single|batch64  predict_*_rows
+  text.<model>[.translated]     advisory text generation (+ cached translation)
+  endpoint.<model>|advisory     full POST through the Flask app
+  training.<script>             one run of each script under models/ (--training)
+
+Results are JSON: {"meta": {...}, "stages": {stage: {"n", "median_ms", ...}}}.
+A stage that cannot run here (e.g. a model artifact is missing) is recorded as
+{"skipped": reason}. --compare exits 1 when any stage's median is more than
+--threshold slower than the baseline (and by more than --min-delta-ms).
+
+Timings depend on the machine, so baseline.json is machine-local and not
+committed: record it with --save-baseline on the host that runs --compare
+(e.g. from the target branch before testing a change).
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import argparse
+import tempfile
+import subprocess
+import statistics
+from datetime import datetime, UTC
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+MODELS_DIR = os.path.join(ROOT_DIR, "models")
+sys.path.append(ROOT_DIR)
+sys.path.append(os.path.join(ROOT_DIR, "backend"))
+
+LATEST_PATH = os.path.join(BENCH_DIR, "latest.json")
+BASELINE_PATH = os.path.join(BENCH_DIR, "baseline.json")
+
+STATE, DISTRICT = "Chhattisgarh", "Durg"
+LAT, LON = 21.19, 81.28
+
+MODEL_CASES = {
+    "fertilizer": {
+        "module": "fertilizers",
+        "payload": {"state": STATE, "district": DISTRICT, "crop": "rice", "N": 90, "P": 42, "K": 43},
+        "location": ("state", "district"),
+        "build": "build_fertilizer_features",
+        "predict": "predict_fertilizer_rows",
+        "endpoint": "/fertilizer/predict",
+    },
+    "yield_prediction": {
+        "module": "yeild_prediction",
+        "payload": {"state_name": STATE, "dist_name": DISTRICT, "crop": "rice",
+                    "area_in_acres": 2.0, "soil_type": "Clay"},
+        "location": ("state_name", "dist_name"),
+        "build": "build_yield_features",
+        "predict": "predict_yield_rows",
+        "endpoint": "/yield_prediction/predict",
+    },
+    "pest_control": {
+        "module": "pest_control",
+        "payload": {"State": STATE, "District": DISTRICT, "Crop": "Wheat", "Variety": "Soft Red",
+                    "Growth_Stage": "Flowering", "soil_type": "Clay"},
+        "location": ("State", "District"),
+        "build": "build_pest_features",
+        "predict": "predict_pest_rows",
+        "endpoint": "/pest_control/predict",
+    },
+    "irrigation": {
+        "module": "irrigation",
+        "payload": {"state": STATE, "district": DISTRICT, "crop_name": "rice", "growth_stage": "flowering",
+                    "water_availability": "abundant", "source_of_water": "rain-fed",
+                    "field_slope": "gentle", "area_acres": 1.5},
+        "location": ("state", "district"),
+        "build": "build_irrigation_features",
+        "predict": "predict_irrigation_rows",
+        "endpoint": "/irrigation/predict",
+        "forecast": True,
+    },
+}
+
+ADVISORY_PAYLOAD = {
+    "state": STATE, "district": DISTRICT, "crop": "rice", "N": 90, "P": 42, "K": 43,
+    "area_acres": 2.0, "soil_type": "Clay", "variety": "Soft Red", "growth_stage": "flowering",
+    "water_availability": "abundant", "source_of_water": "rain-fed", "field_slope": "gentle",
+}
+
+# Script (relative to models/) per training stage; they run on a scratch copy of models/
+TRAINING_SCRIPTS = {
+    "fertilizer": "fertilizer_recommendation/train.py",
+    "pest_control": "pest_risk/train_pest.py",
+    "irrigation": "irrigation_techniques/irrigation_main.py",
+    "yield_prediction": "yeild_prediction/train.py",
+    "yield_prediction.orchestrated": "yeild_prediction/orchestrate.py",
+    "yield_prediction.streamed": "yeild_prediction/stream_train.py",
+}
+
+
+# ---------------- Timing ----------------
+
+def summarize(samples):
+    ms = sorted(s * 1000 for s in samples)
+    return {
+        "n": len(ms),
+        "median_ms": round(statistics.median(ms), 4),
+        "p90_ms": round(ms[min(len(ms) - 1, int(0.9 * len(ms)))], 4),
+        "mean_ms": round(statistics.fmean(ms), 4),
+        "min_ms": round(ms[0], 4),
+        "max_ms": round(ms[-1], 4),
+    }
+
+
+def measure(fn, repeat, warmup=1, setup=None):
+    """Median & co. of fn() over `repeat` samples; setup() runs untimed before each one."""
+    for _ in range(warmup):
+        if setup:
+            setup()
+        fn()
+    samples = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return summarize(samples)
+
+
+class Suite:
+    def __init__(self, repeat, prefixes=None):
+        self.repeat = repeat
+        self.prefixes = prefixes
+        self.stages = {}
+
+    def wanted(self, stage):
+        return not self.prefixes or any(stage.startswith(p) for p in self.prefixes)
+
+    def run(self, stage, fn, setup=None, repeat=None, warmup=1):
+        if not self.wanted(stage):
+            return
+        try:
+            self.stages[stage] = measure(fn, repeat or self.repeat, warmup=warmup, setup=setup)
+        except Exception as e:
+            self.stages[stage] = {"skipped": f"{type(e).__name__}: {e}"}
+        print(f"⚡ {stage:<40} {_describe(self.stages[stage])}")
+
+    def record(self, stage, result):
+        if self.wanted(stage):
+            self.stages[stage] = result
+            print(f"⚡ {stage:<40} {_describe(result)}")
+
+
+def _describe(result):
+    if "skipped" in result:
+        return f"skipped ({result['skipped']})"
+    return f"median {result['median_ms']:.3f} ms  p90 {result['p90_ms']:.3f} ms  (n={result['n']})"
+
+
+# ---------------- Environment ----------------
+
+def prepare_environment(scratch, upstream_latency_ms):
+    """Point every cache at the scratch dir and replace the network with stubs (before the api imports)."""
+    os.environ["UPSTREAM_CACHE_PERSIST"] = "0"
+    os.environ["SOIL_TILE_DB_PATH"] = os.path.join(scratch, "soil_tiles.sqlite3")
+    os.environ["WEATHER_STORE_PATH"] = os.path.join(scratch, "weather_grid")
+    os.environ["LIBRETRANSLATE_URL"] = "http://libretranslate.stub/translate"
+    os.environ.setdefault("PRELOAD_MODELS_BLOCKING", "1")
+    os.environ.setdefault("MODEL_RELOAD_INTERVAL", "0")
+    os.environ.setdefault("MODEL_WAIT_SECONDS", "5")
+
+    from benchmarks import stubs
+    return stubs.install(upstream_latency_ms)
+
+
+def clear_upstream_caches():
+    from api import cache
+    from api.soil_tiles import get_soil_tile_store
+    cache.upstream_cache.clear()
+    get_soil_tile_store().clear()
+
+
+# ---------------- Stages ----------------
+
+def upstream_stages(suite):
+    from api.Api_data import get_lat_lon, get_last7days_weather, get_soil_ph_and_type, get_future_rainfall
+    from api.context import resolve_location_context
+
+    stages = {
+        "upstream.geocode": lambda: get_lat_lon(STATE, DISTRICT),
+        "upstream.weather": lambda: get_last7days_weather(LAT, LON),
+        "upstream.soil": lambda: get_soil_ph_and_type(LAT, LON),
+        "upstream.forecast": lambda: get_future_rainfall(LAT, LON),
+        "context.resolve": lambda: resolve_location_context(STATE, DISTRICT, include_forecast=True),
+    }
+    for stage, fn in stages.items():
+        suite.run(f"{stage}.cold", fn, setup=clear_upstream_caches)
+        suite.run(f"{stage}.warm", fn)
+
+
+def text_stages(suite):
+    from api.translation import render_messages, translate_messages
+    from fertilizers import fertilizer_advisory_messages
+    from pest_control import generate_pest_suggestion_messages
+    from irrigation import generate_irrigation_suggestion_messages
+
+    weather = {"temperature": 27.5, "humidity": 78.0, "rainfall": 62.0, "solar_radiation": 18.5, "windspeed": 2.1}
+    soil = {"ph": 6.6, "soil_type": "Clay", "wrb_class": "Vertisols"}
+    messages = {
+        "fertilizer": lambda: fertilizer_advisory_messages(30, 120, 40, "Balanced_NPK", "rice"),
+        "pest_control": lambda: generate_pest_suggestion_messages("High", "Wheat", "Flowering", weather, soil),
+        "irrigation": lambda: generate_irrigation_suggestion_messages("Rain-fed", "rice", weather, soil, 1.2, 1.5),
+    }
+    for model, build in messages.items():
+        suite.run(f"text.{model}", lambda build=build: render_messages(build()))
+        suite.run(f"text.{model}.translated", lambda build=build: translate_messages(build(), "hi"))
+
+
+def model_stages(suite):
+    import importlib
+    from api.context import resolve_location_context
+
+    for model, case in MODEL_CASES.items():
+        module = importlib.import_module(case["module"])
+        build, predict = getattr(module, case["build"]), getattr(module, case["predict"])
+        state_key, district_key = case["location"]
+        payload = case["payload"]
+        try:
+            context = resolve_location_context(payload[state_key], payload[district_key],
+                                               include_forecast=case.get("forecast", False))
+            row = build(payload, context)
+        except Exception as e:
+            for stage in ("features", "predict"):
+                suite.record(f"{stage}.{model}", {"skipped": f"{type(e).__name__}: {e}"})
+            continue
+
+        suite.run(f"features.{model}", lambda: build(payload, context))
+        suite.run(f"predict.{model}.single", lambda: predict([row]))
+        suite.run(f"predict.{model}.batch64", lambda: predict([row] * 64))
+
+
+def endpoint_stages(suite, flask_app):
+    client = flask_app.test_client()
+
+    def post(path, payload):
+        response = client.post(path, json=payload)
+        if response.status_code != 200:
+            raise RuntimeError(f"HTTP {response.status_code}: {response.get_json(silent=True)}")
+
+    for model, case in MODEL_CASES.items():
+        suite.run(f"endpoint.{model}", lambda case=case: post(case["endpoint"], case["payload"]))
+    suite.run("endpoint.advisory", lambda: post("/advisory", ADVISORY_PAYLOAD))
+
+
+def training_stages(suite, scratch, timeout):
+    """One timed run per script, on a copy of models/ so the real artifacts are never overwritten."""
+    work = os.path.join(scratch, "models")
+    shutil.copytree(MODELS_DIR, work, ignore=shutil.ignore_patterns(
+        "__pycache__", "*.pkl", "*.onnx", "*.onnx.json", "*.mmap", ".train_cache"))
+
+    for name, script in TRAINING_SCRIPTS.items():
+        stage = f"training.{name}"
+        if not suite.wanted(stage):
+            continue
+        path = os.path.join(work, script)
+        start = time.perf_counter()
+        try:
+            done = subprocess.run([sys.executable, os.path.basename(path)], cwd=os.path.dirname(path),
+                                  capture_output=True, text=True, timeout=timeout)
+        except subprocess.TimeoutExpired:
+            suite.record(stage, {"skipped": f"timed out after {timeout}s"})
+            continue
+        seconds = time.perf_counter() - start
+        if done.returncode != 0:
+            last = (done.stderr.strip().splitlines() or ["no output"])[-1]
+            suite.record(stage, {"skipped": f"exit {done.returncode}: {last}"})
+        else:
+            suite.record(stage, summarize([seconds]))
+
+
+# ---------------- Results ----------------
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR,
+                              capture_output=True, text=True, timeout=10).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def run_suite(args):
+    scratch = tempfile.mkdtemp(prefix="agri-bench-")
+    try:
+        stub = prepare_environment(scratch, args.upstream_latency_ms)
+        suite = Suite(args.repeat, args.stages)
+
+        start = time.perf_counter()
+        import app as backend_app  # registers the blueprints and loads every model (logged, not printed)
+        suite.record("startup.app_import", summarize([time.perf_counter() - start]))
+
+        upstream_stages(suite)
+        text_stages(suite)
+        model_stages(suite)
+        endpoint_stages(suite, backend_app.app)
+        if args.training:
+            training_stages(suite, scratch, args.training_timeout)
+
+        return {
+            "meta": {
+                "timestamp": datetime.now(UTC).isoformat(),
+                "git_commit": _git_commit(),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "cpu_count": os.cpu_count(),
+                "repeat": args.repeat,
+                "upstream_latency_ms": args.upstream_latency_ms,
+                "upstream_calls": stub.stats()["stub"],
+            },
+            "stages": suite.stages,
+        }
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+
+def compare(current, baseline, threshold, min_delta_ms):
+    """[(stage, baseline_ms, current_ms, ratio, status)] and whether any stage regressed."""
+    rows, regressed = [], False
+    for stage in sorted(set(baseline["stages"]) | set(current["stages"])):
+        base, cur = baseline["stages"].get(stage), current["stages"].get(stage)
+        if base is None or cur is None:
+            rows.append((stage, None, None, None, "new" if base is None else "missing"))
+            continue
+        if "median_ms" not in base or "median_ms" not in cur:
+            rows.append((stage, base.get("median_ms"), cur.get("median_ms"), None, "skipped"))
+            continue
+        ratio = cur["median_ms"] / base["median_ms"] if base["median_ms"] else float("inf")
+        slower = cur["median_ms"] - base["median_ms"]
+        if ratio > 1 + threshold and slower > min_delta_ms:
+            status, regressed = "REGRESSED", True
+        elif ratio < 1 - threshold and -slower > min_delta_ms:
+            status = "improved"
+        else:
+            status = "ok"
+        rows.append((stage, base["median_ms"], cur["median_ms"], ratio, status))
+    return rows, regressed
+
+
+def print_comparison(rows):
+    print(f"\n{'stage':<42} {'baseline ms':>12} {'current ms':>12} {'ratio':>7}  status")
+    for stage, base, cur, ratio, status in rows:
+        fmt = lambda v: f"{v:12.3f}" if v is not None else f"{'-':>12}"
+        print(f"{stage:<42} {fmt(base)} {fmt(cur)} {(f'{ratio:7.2f}' if ratio is not None else '      -')}  {status}")
+
+
+def write_json(data, path):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path + ".tmp", "w") as f:
+        json.dump(data, f, indent=2)
+    os.replace(path + ".tmp", path)
+
+
+def read_json(path, what):
+    """Load a results/baseline file; a missing or unreadable one ends the run with exit code 2."""
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        hint = " (record one with --save-baseline)" if what == "baseline" else ""
+        print(f"❌ No {what} file at {path}{hint}")
+    except (OSError, ValueError) as e:
+        print(f"❌ Cannot read {what} file {path}: {e}")
+    sys.exit(2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stage-by-stage API and training benchmarks")
+    parser.add_argument("--repeat", type=int, default=int(os.getenv("BENCH_REPEAT", "30")))
+    parser.add_argument("--stages", nargs="+", help="Only run stages starting with these prefixes")
+    parser.add_argument("--upstream-latency-ms", type=float, default=0.0, help="Delay per stubbed upstream call")
+    parser.add_argument("--training", action="store_true", help="Also time every training script under models/")
+    parser.add_argument("--training-timeout", type=float, default=3600)
+    parser.add_argument("--out", default=LATEST_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help=f"Also write {BASELINE_PATH}")
+    parser.add_argument("--results", help="Compare this results file instead of running the suite")
+    parser.add_argument("--compare", metavar="BASELINE", help="Fail (exit 1) on regressions against this file")
+    parser.add_argument("--threshold", type=float, default=float(os.getenv("BENCH_THRESHOLD", "0.25")),
+                        help="Allowed slowdown of a stage's median (0.25 = 25%%)")
+    parser.add_argument("--min-delta-ms", type=float, default=float(os.getenv("BENCH_MIN_DELTA_MS", "0.05")),
+                        help="Ignore slowdowns smaller than this (timer noise on micro stages)")
+    args = parser.parse_args()
+
+    # Load the baseline first so a missing one fails before a long suite run
+    baseline = read_json(args.compare, "baseline") if args.compare else None
+    if args.results:
+        current = read_json(args.results, "results")
+    else:
+        current = run_suite(args)
+        write_json(current, args.out)
+        print(f"📂 Results written to {args.out}")
+        if args.save_baseline:
+            write_json(current, BASELINE_PATH)
+            print(f"📂 Baseline written to {BASELINE_PATH}")
+
+    if baseline is not None:
+        rows, regressed = compare(current, baseline, args.threshold, args.min_delta_ms)
+        print_comparison(rows)
+        if regressed:
+            print(f"\n❌ At least one stage is more than {args.threshold:.0%} slower than the baseline")
+            sys.exit(1)
+        print(f"\n✅ No stage regressed beyond {args.threshold:.0%}")
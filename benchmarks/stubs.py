@@ -0,0 +1,104 @@
+"""
+In-process stand-ins for every upstream the API calls (Nominatim, NASA POWER,
+ISRIC SoilGrids, OpenWeather, LibreTranslate).
+
+install() swaps api.http_client.http_client for a StubHttpClient, so the real
+fetchers, caches and fallbacks run unchanged; only the socket is replaced.
+Responses are canned and deterministic. `latency_ms` adds a fixed delay per
+call to model a slow upstream.
+"""
+import time
+import threading
+from collections import defaultdict
+from datetime import datetime, timedelta, UTC
+
+from api import http_client
+
+
+class StubResponse:
+    def __init__(self, payload, status_code=200):
+        self._payload = payload
+        self.status_code = status_code
+
+    def json(self):
+        return self._payload
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise http_client.requests.exceptions.HTTPError(f"{self.status_code} from stub")
+
+
+def _daily(value):
+    today = datetime.now(UTC)
+    return {(today - timedelta(days=d)).strftime("%Y%m%d"): value + d * 0.1 for d in range(9, 1, -1)}
+
+
+def geocode_payload():
+    return [{"lat": "21.1904", "lon": "81.2849"}]
+
+
+def nasa_power_payload():
+    return {"properties": {"parameter": {
+        "T2M": _daily(27.5), "RH2M": _daily(68.0), "PRECTOTCORR": _daily(3.2),
+        "ALLSKY_SFC_SW_DWN": _daily(18.5), "WS2M": _daily(2.1),
+    }}}
+
+
+def isric_ph_payload():
+    return {"properties": {"layers": [{"depths": [{"values": {"mean": 66}}]}]}}
+
+
+def isric_wrb_payload():
+    return {"wrb_class_name": "Vertisols"}
+
+
+def openweather_forecast_payload():
+    start = datetime.now(UTC).replace(hour=0, minute=0, second=0, microsecond=0)
+    return {"list": [
+        {"dt_txt": (start + timedelta(hours=3 * i)).strftime("%Y-%m-%d %H:%M:%S"),
+         "rain": {"3h": 0.4 if i % 4 == 0 else 0.0}}
+        for i in range(40)
+    ]}
+
+
+def translate_payload(body):
+    q = body.get("q")
+    texts = q if isinstance(q, list) else [q]
+    translated = [f"[{body.get('target')}] {text}" for text in texts]
+    return {"translatedText": translated if isinstance(q, list) else translated[0]}
+
+
+class StubHttpClient:
+    """Same request()/stats() surface as api.http_client.HttpClient, answered from memory."""
+
+    def __init__(self, latency_ms=0.0):
+        self.latency = latency_ms / 1000
+        self._calls = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def request(self, method, source, url, retries=0, **kwargs):
+        with self._lock:
+            self._calls[source] += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if source == "geocode":
+            return StubResponse(geocode_payload())
+        if source == "weather":
+            return StubResponse(nasa_power_payload())
+        if source == "soil":
+            return StubResponse(isric_wrb_payload() if "classification" in url else isric_ph_payload())
+        if source == "forecast":
+            return StubResponse(openweather_forecast_payload())
+        if source == "translate":
+            return StubResponse(translate_payload(kwargs.get("json") or {}))
+        return StubResponse({"error": f"no stub for {source}"}, status_code=404)
+
+    def stats(self):
+        with self._lock:
+            return {"stub": dict(self._calls)}
+
+
+def install(latency_ms=0.0):
+    client = StubHttpClient(latency_ms)
+    http_client.http_client = client
+    return client
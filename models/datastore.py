@@ -0,0 +1,314 @@
+"""
+Typed columnar copies of the CSV datasets, loaded with np.load(mmap_mode="r").
+
+    python models/datastore.py --convert               # every dataset in DATASETS
+    python models/datastore.py --convert some.csv      # one CSV
+    python models/datastore.py --info
+    python models/datastore.py --bench                 # pd.read_csv vs read_dataset
+
+<name>.csv gets a sibling <name>.columnar/ directory:
+    manifest.json    column names, kinds, category dictionaries, source size/mtime/sha256
+    c000.npy ...     one array per column
+
+Text columns are dictionary-encoded (int8/int16/int32 codes, categories in the
+manifest, code -1 = missing). Integer columns are stored as int32 when they
+fit; float columns as float32 when that round-trips exactly, else float64
+(DATASTORE_FLOAT32=1 forces float32 and accepts the rounding).
+
+read_dataset() is a drop-in for pd.read_csv(): it loads the columnar copy when
+it still matches the CSV it was converted from and parses the CSV otherwise
+(no copy yet, or the CSV was edited / appended to since). Columns come back as
+int64 / float64 / object, exactly like read_csv, unless native=True asks for
+the stored float32 / int32 / category dtypes. `columns=` projects: only those
+arrays are opened, and with mmap only their pages are read. iter_dataset()
+yields the same frames in bounded row chunks for out-of-core training.
+"""
+import os
+import json
+import logging
+import time
+import shutil
+import hashlib
+import argparse
+import numpy as np
+import pandas as pd
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BASE_DIR)
+
+FORMAT_VERSION = 1
+MANIFEST = "manifest.json"
+DATASTORE_FLOAT32 = os.getenv("DATASTORE_FLOAT32") == "1"
+DATASTORE_DISABLED = os.getenv("DATASTORE_DISABLED") == "1"  # always parse the CSV
+
+DATASETS = {
+    "sensor": os.path.join(ROOT_DIR, "backend", "sensor_Crop_Dataset.csv"),
+    "pest_risk": os.path.join(BASE_DIR, "pest_risk", "pest_risk_dataset.csv"),
+    "fertilizer": os.path.join(BASE_DIR, "fertilizer_recommendation", "fertilizer_dataset.csv"),
+    "yield_prediction": os.path.join(BASE_DIR, "yeild_prediction", "Custom_Crops_yield_Historical_Dataset.csv"),
+    "irrigation": os.path.join(BASE_DIR, "irrigation_techniques", "Irrigation_Recommendation_Dataset.csv"),
+}
+
+
+def columnar_path(csv_path):
+    return os.path.splitext(csv_path)[0] + ".columnar"
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _source_info(csv_path):
+    stat = os.stat(csv_path)
+    return {"file": os.path.basename(csv_path), "size": stat.st_size, "mtime": stat.st_mtime,
+            "sha256": _sha256(csv_path)}
+
+
+# ---------------- Conversion ----------------
+
+def _code_dtype(n_categories):
+    for dtype in (np.int8, np.int16):
+        if n_categories < np.iinfo(dtype).max:
+            return dtype
+    return np.int32
+
+
+def _encode_column(series, float32=DATASTORE_FLOAT32):
+    """(array, column manifest entry) for one pandas column."""
+    if pd.api.types.is_bool_dtype(series):
+        return series.to_numpy(np.bool_), {"kind": "bool"}
+
+    if pd.api.types.is_integer_dtype(series):
+        values = series.to_numpy()
+        info = np.iinfo(np.int32)
+        if values.size == 0 or (values.min() >= info.min and values.max() <= info.max):
+            return values.astype(np.int32), {"kind": "int", "dtype": "int32"}
+        return values.astype(np.int64), {"kind": "int", "dtype": "int64"}
+
+    if pd.api.types.is_float_dtype(series):
+        values = series.to_numpy(np.float64)
+        narrow = values.astype(np.float32)
+        if float32 or np.array_equal(narrow.astype(np.float64), values, equal_nan=True):
+            return narrow, {"kind": "float", "dtype": "float32"}
+        return values, {"kind": "float", "dtype": "float64"}
+
+    if pd.api.types.is_object_dtype(series) or isinstance(series.dtype, pd.CategoricalDtype):
+        categorical = pd.Categorical(series)
+        categories = [str(c) for c in categorical.categories]
+        codes = categorical.codes.astype(_code_dtype(len(categories)))
+        return codes, {"kind": "category", "dtype": str(codes.dtype), "categories": categories}
+
+    raise ValueError(f"Column '{series.name}' has unsupported dtype {series.dtype}")
+
+
+def convert_csv(csv_path, float32=DATASTORE_FLOAT32):
+    """Write <csv>.columnar/ for one CSV (staged, then swapped in) and check it reads back equal."""
+    df = pd.read_csv(csv_path)
+    target = columnar_path(csv_path)
+    staging = target + ".tmp"
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+
+    columns = []
+    for i, name in enumerate(df.columns):
+        values, entry = _encode_column(df[name], float32=float32)
+        entry = {"name": name, "file": f"c{i:03d}.npy", **entry}
+        np.save(os.path.join(staging, entry["file"]), np.ascontiguousarray(values), allow_pickle=False)
+        columns.append(entry)
+
+    manifest = {"format_version": FORMAT_VERSION, "rows": int(len(df)), "columns": columns,
+                "source": _source_info(csv_path)}
+    with open(os.path.join(staging, MANIFEST), "w") as f:
+        json.dump(manifest, f, indent=2)
+
+    shutil.rmtree(target, ignore_errors=True)
+    os.replace(staging, target)
+
+    lossy = any(c.get("dtype") == "float32" for c in columns) and float32
+    pd.testing.assert_frame_equal(_read_columnar(target, manifest), df, check_exact=not lossy, rtol=1e-6)
+    size = sum(os.path.getsize(os.path.join(target, c["file"])) for c in columns)
+    print(f"✅ {os.path.relpath(csv_path, ROOT_DIR)}: {len(df)} rows × {len(columns)} columns → "
+          f"{size / 1e6:.2f} MB columnar (CSV {manifest['source']['size'] / 1e6:.2f} MB)")
+    return target
+
+
+# ---------------- Loading ----------------
+
+def _load_manifest(directory):
+    with open(os.path.join(directory, MANIFEST)) as f:
+        manifest = json.load(f)
+    if manifest.get("format_version") != FORMAT_VERSION:
+        raise ValueError(f"{directory}: format version {manifest.get('format_version')}, expected {FORMAT_VERSION}")
+    return manifest
+
+
+def is_current(csv_path, manifest, directory=None):
+    """The columnar copy still describes the CSV (size + mtime, else the content hash)."""
+    if not os.path.exists(csv_path):
+        return True  # shipped without the CSV: the columnar copy is the dataset
+    source = manifest["source"]
+    stat = os.stat(csv_path)
+    if stat.st_size != source["size"]:
+        return False
+    if stat.st_mtime == source["mtime"]:
+        return True
+    # A checkout or copy moves mtimes without changing content: hash once, then remember the new mtime
+    if _sha256(csv_path) != source["sha256"]:
+        return False
+    if directory is not None:
+        source["mtime"] = stat.st_mtime
+        try:
+            with open(os.path.join(directory, MANIFEST + ".tmp"), "w") as f:
+                json.dump(manifest, f, indent=2)
+            os.replace(os.path.join(directory, MANIFEST + ".tmp"), os.path.join(directory, MANIFEST))
+        except OSError:
+            pass
+    return True
+
+
+def read_columns(directory, columns=None, manifest=None, mmap=True):
+    """{name: stored array} (memory-mapped, zero-copy) plus the manifest entries, for the projected columns."""
+    manifest = manifest or _load_manifest(directory)
+    entries = {c["name"]: c for c in manifest["columns"]}
+    names = list(entries) if columns is None else list(columns)
+    missing = [name for name in names if name not in entries]
+    if missing:
+        raise KeyError(f"{directory}: no columns {missing}")
+    arrays = {name: np.load(os.path.join(directory, entries[name]["file"]),
+                            mmap_mode="r" if mmap else None, allow_pickle=False) for name in names}
+    return arrays, {name: entries[name] for name in names}
+
+
+def _frame(arrays, entries, native=False):
+    """DataFrame from stored column arrays (whole columns or row slices of them)."""
+    data = {}
+    for name, values in arrays.items():
+        entry = entries[name]
+        if entry["kind"] == "category":
+            if native:
+                data[name] = pd.Categorical.from_codes(np.asarray(values), entry["categories"])
+            else:
+                # code -1 (missing) indexes the trailing NaN
+                lookup = np.array(entry["categories"] + [np.nan], dtype=object)
+                data[name] = lookup[values]
+        elif native or entry["kind"] == "bool":
+            data[name] = np.asarray(values)
+        else:
+            data[name] = values.astype(np.int64 if entry["kind"] == "int" else np.float64)
+    return pd.DataFrame(data, columns=list(arrays))
+
+
+def _read_columnar(directory, manifest=None, columns=None, native=False, mmap=True):
+    arrays, entries = read_columns(directory, columns, manifest, mmap=mmap)
+    return _frame(arrays, entries, native=native)
+
+
+def _current_columnar(csv_path):
+    """(directory, manifest) of a usable columnar copy of csv_path, else None (→ parse the CSV)."""
+    directory = columnar_path(csv_path)
+    if DATASTORE_DISABLED or not os.path.isdir(directory):
+        return None
+    try:
+        manifest = _load_manifest(directory)
+        if is_current(csv_path, manifest, directory):
+            return directory, manifest
+        logging.warning(f"{os.path.basename(directory)} is older than the CSV; parsing the CSV "
+                        f"(re-run models/datastore.py --convert)")
+    except (OSError, ValueError, KeyError) as e:
+        logging.warning(f"Could not read {directory} ({e}); parsing the CSV")
+    return None
+
+
+def read_dataset(csv_path, columns=None, native=False, mmap=True):
+    """
+    pd.read_csv(csv_path, usecols=columns) from the columnar copy when it is
+    current, else from the CSV itself. Projected columns keep the order given.
+    """
+    found = _current_columnar(csv_path)
+    if found is not None:
+        try:
+            return _read_columnar(*found, columns, native=native, mmap=mmap)
+        except (OSError, ValueError, KeyError) as e:
+            logging.warning(f"Could not read {found[0]} ({e}); parsing the CSV")
+    df = pd.read_csv(csv_path, usecols=columns)
+    return df[list(columns)] if columns is not None else df
+
+
+def iter_dataset(csv_path, chunksize, columns=None, native=False):
+    """
+    read_dataset() in consecutive chunks of at most `chunksize` rows, so memory
+    is bounded by the chunk, not the file: row slices of the memory-mapped
+    columns, or pd.read_csv(chunksize=...) without a current columnar copy.
+    """
+    found = _current_columnar(csv_path)
+    if found is not None:
+        directory, manifest = found
+        arrays, entries = read_columns(directory, columns, manifest)
+        for start in range(0, manifest["rows"], chunksize):
+            rows = {name: values[start:start + chunksize] for name, values in arrays.items()}
+            chunk = _frame(rows, entries, native=native)
+            chunk.index = pd.RangeIndex(start, start + len(chunk))
+            yield chunk
+        return
+    for chunk in pd.read_csv(csv_path, usecols=columns, chunksize=chunksize):
+        yield chunk[list(columns)] if columns is not None else chunk
+
+
+# ---------------- CLI ----------------
+
+def _known_csvs(paths):
+    if paths:
+        return [os.path.abspath(p) for p in paths]
+    found = [p for p in DATASETS.values() if os.path.exists(p)]
+    for name, path in DATASETS.items():
+        if not os.path.exists(path):
+            print(f"⏭️ {name}: {os.path.relpath(path, ROOT_DIR)} not found, skipped")
+    return found
+
+
+def _best_of(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Columnar copies of the CSV datasets")
+    parser.add_argument("--convert", nargs="*", metavar="CSV", help="Convert these CSVs (default: all DATASETS)")
+    parser.add_argument("--float32", action="store_true", help="Store every float column as float32 (lossy)")
+    parser.add_argument("--info", action="store_true")
+    parser.add_argument("--bench", action="store_true")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.convert is not None:
+        for csv in _known_csvs(args.convert):
+            convert_csv(csv, float32=args.float32 or DATASTORE_FLOAT32)
+
+    if args.info:
+        for name, csv in DATASETS.items():
+            directory = columnar_path(csv)
+            if not os.path.isdir(directory):
+                print(f"{name:<18} no columnar copy")
+                continue
+            manifest = _load_manifest(directory)
+            kinds = ", ".join(f"{c['name']}:{c['dtype'] if c['kind'] != 'bool' else 'bool'}"
+                              for c in manifest["columns"])
+            state = "current" if is_current(csv, manifest) else "STALE"
+            print(f"{name:<18} {manifest['rows']} rows, {state}  [{kinds}]")
+
+    if args.bench:
+        print(f"\n{'dataset':<18} {'read_csv ms':>12} {'columnar ms':>12} {'speedup':>8}")
+        for name, csv in DATASETS.items():
+            if not (os.path.exists(csv) and os.path.isdir(columnar_path(csv))):
+                continue
+            csv_ms = _best_of(lambda: pd.read_csv(csv), args.repeat)
+            columnar_ms = _best_of(lambda: read_dataset(csv), args.repeat)
+            print(f"{name:<18} {csv_ms:12.2f} {columnar_ms:12.2f} {csv_ms / columnar_ms:7.1f}×")
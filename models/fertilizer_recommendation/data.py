@@ -1,16 +1,18 @@
-import pandas as pd
-import os
+import os, sys
 from sklearn.preprocessing import LabelEncoder
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DATA_PATH = os.path.join(BASE_DIR, "fertilizer_dataset.csv")
 
+sys.path.append(os.path.dirname(BASE_DIR))
+from datastore import read_dataset  # columnar copy when converted, else the CSV
+
 def load_and_preprocess():
     """
     Loads fertilizer dataset, encodes categorical columns,
     and returns dataframe + fitted encoders.
     """
-    df = pd.read_csv(DATA_PATH)
+    df = read_dataset(DATA_PATH)
 
     # Encode crop (label column in dataset)
     crop_encoder = LabelEncoder()
@@ -1,4 +1,4 @@
-import os, joblib
+import os, sys, joblib
 import pandas as pd
 from sklearn.model_selection import train_test_split
 from sklearn.ensemble import RandomForestClassifier
@@ -10,6 +10,10 @@ from data import load_and_preprocess   # ✅ using data.py
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
+# ✅ Shared helpers in models/
+sys.path.append(os.path.dirname(BASE_DIR))
+from forest_search import find_smallest_forest, FOREST_SEARCH_TOLERANCE
+
 # Load dataset + encoders
 df, crop_encoder, fertilizer_encoder = load_and_preprocess()
 
@@ -23,13 +27,18 @@ X_train, X_test, y_train, y_test = train_test_split(
 )
 
 # Pipeline: scaling + model
-pipeline = Pipeline([
-    ("scaler", StandardScaler()),
-    ("model", RandomForestClassifier(n_estimators=200, random_state=42))
-])
+def make_pipeline(n_estimators=200, max_depth=None):
+    return Pipeline([
+        ("scaler", StandardScaler()),
+        ("model", RandomForestClassifier(n_estimators=n_estimators, max_depth=max_depth, random_state=42))
+    ])
 
-# Train
-pipeline.fit(X_train, y_train)
+# Train: smallest forest within tolerance of the full 200-tree model
+pipeline, best, full, search_df = find_smallest_forest(make_pipeline, X_train, y_train, X_test, y_test)
+print(f"🌲 Selected {best['n_estimators']} trees, max_depth={best['max_depth']} "
+      f"(tolerance {FOREST_SEARCH_TOLERANCE}); memory {best['model_memory_bytes']} vs "
+      f"{full['model_memory_bytes']} bytes for the full model")
+search_df.to_csv(os.path.join(BASE_DIR, "forest_search.csv"), index=False)
 
 # Evaluate
 y_pred = pipeline.predict(X_test)
@@ -39,9 +48,12 @@ report = classification_report(y_test, y_pred, target_names=fertilizer_encoder.c
 print("✅ Accuracy:", acc)
 print(report)
 
-# Save results to CSV
+# Save results to CSV (first row = the saved model, second = full-size reference)
 results_path = os.path.join(BASE_DIR, "results.csv")
-pd.DataFrame({"accuracy": [acc]}).to_csv(results_path, index=False)
+pd.DataFrame([
+    {**best, "accuracy": acc, "model": "selected"},
+    {**full, "model": "full"},
+]).to_csv(results_path, index=False)
 
 # Save ONE .pkl with everything
 SAVE_PATH = os.path.join(BASE_DIR, "Fertilizer_pipeline.pkl")
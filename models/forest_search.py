@@ -0,0 +1,121 @@
+"""
+Find the smallest RandomForest whose held-out accuracy and macro-F1 stay
+within a tolerance of the full (200 trees, unbounded depth) model.
+
+Used by pest_risk/train_pest.py and fertilizer_recommendation/train.py.
+For each depth cap one forest is fitted with the full tree count; smaller
+forests are evaluated as prefixes of it (a RandomForest with random_state
+fixed builds the same first k trees whatever n_estimators is), so the search
+costs one fit per depth rather than one per (trees, depth) pair.
+"""
+import os
+import copy
+import time
+import tempfile
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.metrics import accuracy_score, f1_score
+
+# Allowed drop vs. the full model (absolute, for both accuracy and macro-F1)
+FOREST_SEARCH_TOLERANCE = float(os.getenv("FOREST_SEARCH_TOLERANCE", "0.005"))
+TREE_COUNTS = [5, 10, 20, 30, 50, 75, 100, 150, 200]
+DEPTH_CAPS = [4, 6, 8, 12, 16, None]
+FULL_TREES = 200
+
+
+def forest_memory_bytes(forest):
+    """Bytes held by the fitted trees' node and value arrays (what stays resident)."""
+    total = 0
+    for tree in forest.estimators_:
+        state = tree.tree_.__getstate__()
+        total += state["nodes"].nbytes + state["values"].nbytes
+    return total
+
+
+def disk_size_bytes(obj):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "model.pkl")
+        joblib.dump(obj, path)
+        return os.path.getsize(path)
+
+
+def single_row_latency_ms(pipeline, X, repeats=200):
+    """Median latency of pipeline.predict on one row."""
+    row = X.iloc[[0]]
+    pipeline.predict(row)
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        pipeline.predict(row)
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings) * 1000)
+
+
+def _with_first_trees(pipeline, n_trees):
+    """Shallow copy of a fitted pipeline whose forest keeps only its first n_trees."""
+    pruned = copy.copy(pipeline)
+    forest = copy.copy(pipeline.named_steps["model"])
+    forest.estimators_ = forest.estimators_[:n_trees]
+    forest.n_estimators = n_trees
+    pruned.steps = pipeline.steps[:-1] + [("model", forest)]
+    return pruned
+
+
+def _score(pipeline, X_test, y_test):
+    y_pred = pipeline.predict(X_test)
+    return accuracy_score(y_test, y_pred), f1_score(y_test, y_pred, average="macro")
+
+
+def measure(pipeline, X_test):
+    forest = pipeline.named_steps["model"]
+    return {
+        "n_estimators": len(forest.estimators_),
+        "max_depth": forest.max_depth,
+        "model_size_bytes": disk_size_bytes(pipeline),
+        "model_memory_bytes": forest_memory_bytes(forest),
+        "single_row_latency_ms": single_row_latency_ms(pipeline, X_test),
+    }
+
+
+def find_smallest_forest(make_pipeline, X_train, y_train, X_test, y_test,
+                         tolerance=FOREST_SEARCH_TOLERANCE):
+    """
+    make_pipeline(n_estimators, max_depth) must return an unfitted Pipeline
+    whose last step is named "model".
+    Returns (best_pipeline, best_row, full_row, search_df).
+    """
+    rows = []
+    fitted = {}
+    for max_depth in DEPTH_CAPS:
+        pipeline = make_pipeline(FULL_TREES, max_depth)
+        pipeline.fit(X_train, y_train)
+        fitted[max_depth] = pipeline
+        for n_trees in TREE_COUNTS:
+            candidate = _with_first_trees(pipeline, n_trees)
+            acc, f1 = _score(candidate, X_test, y_test)
+            rows.append({
+                "n_estimators": n_trees,
+                "max_depth": max_depth,
+                "accuracy": acc,
+                "macro_f1": f1,
+                "model_memory_bytes": forest_memory_bytes(candidate.named_steps["model"]),
+            })
+
+    search_df = pd.DataFrame(rows)
+    full = search_df[(search_df["n_estimators"] == FULL_TREES) & search_df["max_depth"].isna()].iloc[0]
+
+    ok = search_df[
+        (search_df["accuracy"] >= full["accuracy"] - tolerance) &
+        (search_df["macro_f1"] >= full["macro_f1"] - tolerance)
+    ]
+    best = ok.sort_values(["model_memory_bytes", "n_estimators"]).iloc[0]
+    best_depth = None if pd.isna(best["max_depth"]) else int(best["max_depth"])
+
+    # Refit at the chosen size so the saved forest carries exactly n_estimators trees
+    best_pipeline = make_pipeline(int(best["n_estimators"]), best_depth)
+    best_pipeline.fit(X_train, y_train)
+
+    best_row = {"accuracy": best["accuracy"], "macro_f1": best["macro_f1"], **measure(best_pipeline, X_test)}
+    full_row = {"accuracy": full["accuracy"], "macro_f1": full["macro_f1"], **measure(fitted[None], X_test)}
+    return best_pipeline, best_row, full_row, search_df
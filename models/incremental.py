@@ -0,0 +1,492 @@
+"""
+Incremental retraining from newly collected labeled rows.
+
+    python incremental.py pest_control new_pest_rows.csv
+    python incremental.py yield_prediction new_yields.csv --extra-trees 40
+    python incremental.py irrigation new_irrigation.csv --extra-rounds 80 --dry-run
+    python incremental.py fertilizer new_fertilizer_rows.csv --no-baseline
+
+The new CSV has the same columns as the model's dataset. Instead of training
+from scratch, the serving artifact is loaded and continued on the dataset with
+the new rows appended:
+  - RandomForest / Bagging: warm_start adds --extra-trees estimators
+  - XGBoost: --extra-rounds more boosting rounds on top of the current booster
+  - closed-form linear models are simply refitted (they are cheap)
+
+Fitted preprocessing stays frozen so the existing trees keep their meaning.
+Scalers are not refitted. Categorical encoders only grow: values never seen
+before get codes after the existing ones. A new target class cannot be
+added to a fitted forest or booster; that needs a full retrain and is
+refused.
+
+A slice of the new rows (--holdout) is kept out of training. It is used to
+compare three models of the same final size: the previous model, the
+incremental update, and a full retrain from scratch (--no-baseline skips
+the full retrain).
+
+Unless --dry-run:
+  - the artifact is replaced atomically; the API hot-reloads it as a new
+    version and the old file is kept as <artifact>.prev;
+  - the new rows are appended to the dataset CSV;
+  - the comparison is appended to incremental_results.csv next to the
+    artifact.
+"""
+import os
+import copy
+import json
+import time
+import shutil
+import pickle
+import argparse
+import functools
+import importlib.util
+from datetime import datetime, UTC
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.base import clone
+from sklearn.compose import ColumnTransformer
+from sklearn.model_selection import train_test_split
+from sklearn.preprocessing import LabelEncoder, OrdinalEncoder, OneHotEncoder
+from sklearn.metrics import accuracy_score, f1_score, mean_squared_error, r2_score
+
+MODELS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+EXTRA_TREES = int(os.getenv("INCREMENTAL_EXTRA_TREES", "50"))
+EXTRA_ROUNDS = int(os.getenv("INCREMENTAL_EXTRA_ROUNDS", "100"))
+HOLDOUT = float(os.getenv("INCREMENTAL_HOLDOUT", "0.2"))
+MIN_HOLDOUT_ROWS = 5
+RANDOM_STATE = 47
+
+
+# ---------------- Vocabulary extension ----------------
+
+def _new_values(known, values):
+    known = set(known)
+    return sorted({v for v in values if not pd.isna(v) and v not in known}, key=str)
+
+
+def extend_label_encoder(encoder, values):
+    """Append unseen values to a fitted LabelEncoder; existing codes never change. Returns the added values."""
+    added = _new_values(encoder.classes_, values)
+    if added:
+        # String classes are encoded by dict lookup, so they need not stay sorted
+        encoder.classes_ = np.concatenate([encoder.classes_.astype(object), np.array(added, dtype=object)])
+    return added
+
+
+def extend_column_transformer(preprocessor, X):
+    """
+    Grow the OrdinalEncoders of a fitted ColumnTransformer with unseen
+    categories (appended, so existing codes are unchanged). Returns
+    ({column: added}, {column: unseen one-hot categories}); one-hot encoders
+    are left alone because new columns would change the model's input width.
+    """
+    extended, one_hot = {}, {}
+    for _, transformer, columns in preprocessor.transformers_:
+        if not isinstance(transformer, (OrdinalEncoder, OneHotEncoder)):
+            continue
+        for i, col in enumerate(columns):
+            added = _new_values(transformer.categories_[i], X[col])
+            if not added:
+                continue
+            if isinstance(transformer, OneHotEncoder):
+                one_hot[col] = added
+                continue
+            categories = transformer.categories_[i]
+            transformer.categories_[i] = np.concatenate([categories, np.array(added, dtype=categories.dtype)])
+            extended[col] = added
+    return extended, one_hot
+
+
+def refuse_new_classes(known, values, column):
+    unseen = _new_values(known, values)
+    if unseen:
+        raise ValueError(f"New {column} classes {unseen} cannot be added incrementally; run a full retrain")
+
+
+# ---------------- Continued training ----------------
+
+def grow(estimator, Xt, y, sample_weight=None, extra_trees=EXTRA_TREES, extra_rounds=EXTRA_ROUNDS):
+    """Continue training a fitted estimator in place → (mode, estimators_before, estimators_after)."""
+    fit_kwargs = {} if sample_weight is None else {"sample_weight": sample_weight}
+
+    if hasattr(estimator, "get_booster"):
+        booster = estimator.get_booster()
+        best_iteration = getattr(estimator, "best_iteration", None)
+        if best_iteration is not None:
+            booster = booster[:best_iteration + 1]  # drop the rounds early stopping rejected
+        booster.set_attr(best_iteration=None, best_score=None)
+        before = booster.num_boosted_rounds()
+        estimator.set_params(n_estimators=extra_rounds, early_stopping_rounds=None)
+        estimator.fit(Xt, y, xgb_model=booster, verbose=False, **fit_kwargs)
+        after = estimator.get_booster().num_boosted_rounds()
+        estimator.set_params(n_estimators=after)  # so clone() gives a full retrain of the same size
+        return "boosting", before, after
+
+    if "warm_start" in estimator.get_params():
+        before = len(estimator.estimators_)
+        estimator.set_params(warm_start=True, n_estimators=before + extra_trees)
+        estimator.fit(Xt, y, **fit_kwargs)
+        estimator.set_params(warm_start=False)
+        return "warm_start", before, len(estimator.estimators_)
+
+    estimator.fit(Xt, y, **fit_kwargs)
+    return "refit", None, None
+
+
+def extend_pipeline(pipeline, X):
+    added, one_hot = {}, {}
+    for _, step in pipeline.steps[:-1]:
+        if isinstance(step, ColumnTransformer):
+            step_added, step_one_hot = extend_column_transformer(step, X)
+            added.update(step_added)
+            one_hot.update(step_one_hot)
+    return added, one_hot
+
+
+def grow_pipeline(pipeline, X, y, args, one_hot_changed=False):
+    if one_hot_changed:
+        # Unseen one-hot categories (linear models): refit the whole, cheap pipeline
+        pipeline.fit(X, y)
+        return "refit", None, None
+    return grow(pipeline.steps[-1][1], pipeline[:-1].transform(X), y,
+                extra_trees=args.extra_trees, extra_rounds=args.extra_rounds)
+
+
+def full_retrain_pipeline(template, X_vocab, X_train, y_train):
+    """Same hyperparameters and final size, fitted from scratch (preprocessing sees every row's features)."""
+    pipeline = clone(template)
+    pipeline[:-1].fit(X_vocab)
+    pipeline.steps[-1][1].fit(pipeline[:-1].transform(X_train), y_train)
+    return pipeline
+
+
+# ---------------- Models ----------------
+
+def _pest_xy(df):
+    return df.drop(columns=["Pest_Risk"]), df["Pest_Risk"]
+
+
+def _pest_extend(pipeline, df):
+    X, _ = _pest_xy(df)
+    return extend_pipeline(pipeline, X)
+
+
+def _pest_grow(pipeline, df, args, one_hot_changed):
+    X, y = _pest_xy(df)
+    refuse_new_classes(pipeline.classes_, y, "Pest_Risk")
+    return grow_pipeline(pipeline, X, y, args, one_hot_changed)
+
+
+def _pest_full(template, vocab_df, train_df):
+    X_train, y_train = _pest_xy(train_df)
+    return full_retrain_pipeline(template, _pest_xy(vocab_df)[0], X_train, y_train)
+
+
+def _pest_predict(pipeline, df):
+    return pipeline.predict(_pest_xy(df)[0])
+
+
+FERTILIZER_NUMERIC = ["N", "P", "K", "temperature", "humidity", "ph", "rainfall"]
+
+
+def _fertilizer_X(bundle, df):
+    X = df[FERTILIZER_NUMERIC].copy()
+    X["crop_encoded"] = bundle["crop_encoder"].transform(df["label"])
+    return X
+
+
+def _fertilizer_extend(bundle, df):
+    added = extend_label_encoder(bundle["crop_encoder"], df["label"])
+    return ({"label": added} if added else {}), {}
+
+
+def _fertilizer_grow(bundle, df, args, one_hot_changed):
+    refuse_new_classes(bundle["fertilizer_encoder"].classes_, df["Fertilizer_Advice"], "Fertilizer_Advice")
+    y = bundle["fertilizer_encoder"].transform(df["Fertilizer_Advice"])
+    return grow_pipeline(bundle["pipeline"], _fertilizer_X(bundle, df), y, args)
+
+
+def _fertilizer_full(template, vocab_df, train_df):
+    crop_encoder = LabelEncoder().fit(vocab_df["label"])
+    fertilizer_encoder = LabelEncoder().fit(train_df["Fertilizer_Advice"])
+    bundle = {"crop_encoder": crop_encoder, "fertilizer_encoder": fertilizer_encoder}
+    pipeline = clone(template["pipeline"]).fit(
+        _fertilizer_X(bundle, train_df), fertilizer_encoder.transform(train_df["Fertilizer_Advice"])
+    )
+    return {**bundle, "pipeline": pipeline}
+
+
+def _fertilizer_predict(bundle, df):
+    return bundle["fertilizer_encoder"].inverse_transform(bundle["pipeline"].predict(_fertilizer_X(bundle, df)))
+
+
+IRRIGATION_DIR = os.path.join(MODELS_DIR, "irrigation_techniques")
+
+
+@functools.lru_cache(maxsize=None)
+def _irrigation_main():
+    # The training script itself, so its class weighting is reused rather than copied
+    spec = importlib.util.spec_from_file_location("irrigation_main", os.path.join(IRRIGATION_DIR, "irrigation_main.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def _irrigation_weights(y):
+    return _irrigation_main().balanced_weights(pd.Series(y)).to_numpy()
+
+
+def _irrigation_X(bundle, df):
+    _, label_encoders, _ = bundle
+    X = df.drop(columns=["irrigation_method"]).copy()
+    for col, le in label_encoders.items():
+        X[col] = le.transform(X[col])
+    return X
+
+
+def _irrigation_extend(bundle, df):
+    _, label_encoders, _ = bundle
+    added = {col: extend_label_encoder(le, df[col]) for col, le in label_encoders.items()}
+    return {col: values for col, values in added.items() if values}, {}
+
+
+def _irrigation_grow(bundle, df, args, one_hot_changed):
+    model, _, target_encoder = bundle
+    refuse_new_classes(target_encoder.classes_, df["irrigation_method"], "irrigation_method")
+    y = target_encoder.transform(df["irrigation_method"])
+    return grow(model, _irrigation_X(bundle, df), y, sample_weight=_irrigation_weights(y),
+                extra_trees=args.extra_trees, extra_rounds=args.extra_rounds)
+
+
+def _irrigation_full(template, vocab_df, train_df):
+    model, label_encoders, _ = template
+    label_encoders = {col: LabelEncoder().fit(vocab_df[col]) for col in label_encoders}
+    target_encoder = LabelEncoder().fit(train_df["irrigation_method"])
+    bundle = (clone(model), label_encoders, target_encoder)
+    y = target_encoder.transform(train_df["irrigation_method"])
+    bundle[0].fit(_irrigation_X(bundle, train_df), y, sample_weight=_irrigation_weights(y))
+    return bundle
+
+
+def _irrigation_predict(bundle, df):
+    model, _, target_encoder = bundle
+    return target_encoder.inverse_transform(model.predict(_irrigation_X(bundle, df)))
+
+
+YIELD_DIR = os.path.join(MODELS_DIR, "yeild_prediction")
+
+
+@functools.lru_cache(maxsize=None)
+def _yield_data():
+    # Loaded by path: fertilizer_recommendation has a data.py too
+    spec = importlib.util.spec_from_file_location("yield_data", os.path.join(YIELD_DIR, "data.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def _yield_xy(df):
+    return _yield_data().split_features(df)
+
+
+def _yield_artifact():
+    """The served pipeline: lowest MSE in results.csv, as in backend/yeild_prediction.py."""
+    results_df = pd.read_csv(os.path.join(YIELD_DIR, "results.csv"), index_col=0)
+    return os.path.join(YIELD_DIR, f"{results_df['MSE'].idxmin().replace(' ', '_')}_pipeline.pkl")
+
+
+def _yield_extend(pipeline, df):
+    return extend_pipeline(pipeline, _yield_xy(df)[0])
+
+
+def _yield_grow(pipeline, df, args, one_hot_changed):
+    X, y = _yield_xy(df)
+    return grow_pipeline(pipeline, X, y, args, one_hot_changed)
+
+
+def _yield_full(template, vocab_df, train_df):
+    X_train, y_train = _yield_xy(train_df)
+    return full_retrain_pipeline(template, _yield_xy(vocab_df)[0], X_train, y_train)
+
+
+def _yield_predict(pipeline, df):
+    return pipeline.predict(_yield_xy(df)[0])
+
+
+def _dump_pickle(obj, path):
+    with open(path, "wb") as f:
+        pickle.dump(obj, f)
+
+
+def _load_pickle(path):
+    with open(path, "rb") as f:
+        return pickle.load(f)
+
+
+INCREMENTAL_MODELS = {
+    "pest_control": {
+        "dataset": os.path.join(MODELS_DIR, "pest_risk", "pest_risk_dataset.csv"),
+        "target": "Pest_Risk",
+        "artifact": os.path.join(MODELS_DIR, "pest_risk", "PestRisk_RFClassifier_pipeline.pkl"),
+        "task": "classification",
+        "extend": _pest_extend, "grow": _pest_grow, "full": _pest_full, "predict": _pest_predict,
+    },
+    "fertilizer": {
+        "dataset": os.path.join(MODELS_DIR, "fertilizer_recommendation", "fertilizer_dataset.csv"),
+        "target": "Fertilizer_Advice",
+        "artifact": os.path.join(MODELS_DIR, "fertilizer_recommendation", "Fertilizer_pipeline.pkl"),
+        "task": "classification",
+        "extend": _fertilizer_extend, "grow": _fertilizer_grow, "full": _fertilizer_full,
+        "predict": _fertilizer_predict,
+    },
+    "irrigation": {
+        "dataset": os.path.join(IRRIGATION_DIR, "Irrigation_Recommendation_Dataset.csv"),
+        "target": "irrigation_method",
+        "artifact": os.path.join(IRRIGATION_DIR, "irrigation_model.pkl"),
+        "task": "classification",
+        "load": _load_pickle, "dump": _dump_pickle,
+        "extend": _irrigation_extend, "grow": _irrigation_grow, "full": _irrigation_full,
+        "predict": _irrigation_predict,
+    },
+    "yield_prediction": {
+        "dataset": os.path.join(YIELD_DIR, "Custom_Crops_yield_Historical_Dataset.csv"),
+        "target": "yield_kg_per_ha",
+        "artifact": _yield_artifact,
+        "task": "regression",
+        "extend": _yield_extend, "grow": _yield_grow, "full": _yield_full, "predict": _yield_predict,
+    },
+}
+
+
+# ---------------- Driver ----------------
+
+def score(task, y_true, y_pred):
+    if task == "classification":
+        return {"accuracy": accuracy_score(y_true, y_pred), "macro_f1": f1_score(y_true, y_pred, average="macro")}
+    return {"mse": mean_squared_error(y_true, y_pred),
+            "r2": r2_score(y_true, y_pred) if len(y_true) > 1 else float("nan")}
+
+
+def _target_values(spec, df):
+    if spec["task"] == "regression":
+        return _yield_xy(df)[1]
+    return df[spec["target"]]
+
+
+def read_new_rows(spec, path, columns):
+    new_df = pd.read_csv(path)
+    missing = [col for col in columns if col not in new_df.columns]
+    if missing:
+        raise ValueError(f"New rows are missing columns {missing}")
+    new_df = new_df[columns]
+    # The yield dataset's raw headers are normalized (strip, lower, spaces → _) when loaded
+    target = next(col for col in columns if col.strip().lower().replace(" ", "_") == spec["target"].lower())
+    unlabeled = new_df[target].isna()
+    if unlabeled.any():
+        print(f"⚠️ Dropping {int(unlabeled.sum())} new rows without {target}")
+        new_df = new_df[~unlabeled]
+    if new_df.empty:
+        raise ValueError("No labeled new rows")
+    return new_df.reset_index(drop=True)
+
+
+def _atomic_csv(df, path):
+    df.to_csv(path + ".tmp", index=False)
+    os.replace(path + ".tmp", path)
+
+
+def save_artifact(spec, bundle, path):
+    """Swap the new artifact in; the previous one is kept as <path>.prev for rollback."""
+    dump = spec.get("dump", joblib.dump)
+    dump(bundle, path + ".tmp")
+    if os.path.exists(path):
+        shutil.copy2(path, path + ".prev")
+    os.replace(path + ".tmp", path)
+
+
+def run_incremental(name, new_rows_path, args):
+    spec = INCREMENTAL_MODELS[name]
+    artifact = spec["artifact"]() if callable(spec["artifact"]) else spec["artifact"]
+    old_df = pd.read_csv(spec["dataset"])
+    new_df = read_new_rows(spec, new_rows_path, list(old_df.columns))
+    print(f"🔍 {name}: {len(old_df)} existing rows + {len(new_df)} new rows")
+
+    # ✅ Part of the new rows stays out of training to compare the candidates on
+    holdout_df = None
+    n_holdout = int(round(len(new_df) * args.holdout))
+    if n_holdout >= MIN_HOLDOUT_ROWS:
+        new_train_df, holdout_df = train_test_split(new_df, test_size=n_holdout, random_state=RANDOM_STATE)
+    else:
+        new_train_df = new_df
+        print(f"⚠️ Fewer than {MIN_HOLDOUT_ROWS} holdout rows; skipping the comparison")
+    train_df = pd.concat([old_df, new_train_df], ignore_index=True)
+    vocab_df = pd.concat([old_df, new_df], ignore_index=True)
+
+    load = spec.get("load", joblib.load)
+    bundle = load(artifact)
+    added, one_hot = spec["extend"](bundle, vocab_df)
+    if added or one_hot:
+        print(f"📦 New categories: {json.dumps({**added, **one_hot}, default=str)}")
+    previous = copy.deepcopy(bundle) if holdout_df is not None else None
+
+    start = time.perf_counter()
+    mode, before, after = spec["grow"](bundle, train_df, args, bool(one_hot))
+    incremental_seconds = time.perf_counter() - start
+    print(f"⚡ Incremental ({mode}{f', {before} → {after} estimators' if before is not None else ''}) "
+          f"in {incremental_seconds:.1f}s")
+
+    row = {
+        "timestamp": datetime.now(UTC).isoformat(),
+        "model": name,
+        "artifact": os.path.basename(artifact),
+        "rows_added": len(new_df),
+        "holdout_rows": 0 if holdout_df is None else len(holdout_df),
+        "mode": mode,
+        "estimators_before": before,
+        "estimators_after": after,
+        "new_categories": json.dumps({**added, **one_hot}, default=str),
+        "incremental_seconds": round(incremental_seconds, 2),
+    }
+
+    if holdout_df is not None:
+        y_true = _target_values(spec, holdout_df)
+        candidates = {"previous": previous, "incremental": bundle}
+        if args.baseline:
+            start = time.perf_counter()
+            candidates["full"] = spec["full"](bundle, vocab_df, train_df)
+            row["full_retrain_seconds"] = round(time.perf_counter() - start, 2)
+            print(f"⚡ Full retrain in {row['full_retrain_seconds']}s")
+        for label, candidate in candidates.items():
+            for metric, value in score(spec["task"], y_true, spec["predict"](candidate, holdout_df)).items():
+                row[f"{metric}_{label}"] = round(float(value), 4)
+        print(pd.Series(row).to_string())
+
+    if args.dry_run:
+        print("🔍 Dry run: nothing written")
+        return row
+
+    save_artifact(spec, bundle, artifact)
+    _atomic_csv(pd.concat([old_df, new_df], ignore_index=True), spec["dataset"])
+    results_path = os.path.join(os.path.dirname(artifact), "incremental_results.csv")
+    log = pd.DataFrame([row])
+    if os.path.exists(results_path):
+        log = pd.concat([pd.read_csv(results_path), log], ignore_index=True)
+    _atomic_csv(log, results_path)
+    print(f"📂 {artifact} updated (previous kept as .prev); {len(new_df)} rows appended to {spec['dataset']}")
+    return row
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Continue training a model on newly collected rows")
+    parser.add_argument("model", choices=sorted(INCREMENTAL_MODELS))
+    parser.add_argument("new_rows", help="CSV with the dataset's columns")
+    parser.add_argument("--extra-trees", type=int, default=EXTRA_TREES, help="Trees added to forests / bagging")
+    parser.add_argument("--extra-rounds", type=int, default=EXTRA_ROUNDS, help="Boosting rounds added to XGBoost")
+    parser.add_argument("--holdout", type=float, default=HOLDOUT, help="Fraction of new rows kept for the comparison")
+    parser.add_argument("--no-baseline", dest="baseline", action="store_false", help="Skip the full-retrain comparison")
+    parser.add_argument("--dry-run", action="store_true", help="Train and compare, but write nothing")
+    args = parser.parse_args()
+
+    run_incremental(args.model, args.new_rows, args)
@@ -0,0 +1,437 @@
+"""
+Write memory-mapped copies of the trained artifacts and compare worker memory.
+
+    python models/mmap_export.py                # export + parity check
+    python models/mmap_export.py --export       # export only
+    python models/mmap_export.py --parity       # parity check only
+    python models/mmap_export.py --rss 4        # per-worker memory, pickle vs mmap, 4 workers each
+
+Every .pkl the backend can serve gets an <artifact>.mmap/ directory next to
+it (format described in backend/mapped_models.py): tree ensembles become flat
+uncompressed node tables that each worker np.load()s with mmap_mode="r", so N
+workers share one physical copy through the page cache. Everything else
+(scalers, encoders, linear models) stays in a small skeleton pickle. Serve
+them with INFERENCE_BACKEND=mmap (see backend/inference.py).
+"""
+import os
+import sys
+import copy
+import glob
+import json
+import shutil
+import hashlib
+import argparse
+import subprocess
+from datetime import datetime, UTC
+
+import joblib
+import numpy as np
+from sklearn.pipeline import Pipeline
+from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor, BaggingRegressor
+from sklearn.ensemble import ExtraTreesClassifier, ExtraTreesRegressor
+from sklearn.tree import DecisionTreeClassifier, DecisionTreeRegressor
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.abspath(os.path.join(BASE_DIR, "..", "backend"))
+# The skeleton pickle must reference the stub class by the name the backend imports it under
+sys.path.insert(0, BACKEND_DIR)
+from mapped_models import (MappedEnsemble, MANIFEST, SKELETON, FORMAT_VERSION, NODE_ARRAYS,
+                           mapped_path, load_mapped, process_memory)
+from onnx_export import (FERTILIZER_PATH, PEST_PATH, IRRIGATION_PATH, YIELD_DIR,
+                         fertilizer_test_split, pest_test_split, irrigation_test_split,
+                         yield_test_split, _best_yield_path, _single_row_latency_us)
+
+PROBA_ATOL = float(os.getenv("MMAP_PARITY_PROBA_ATOL", "1e-6"))
+REGRESSION_RTOL = float(os.getenv("MMAP_PARITY_RTOL", "1e-5"))
+
+
+# ---------------- Node tables ----------------
+class _Tables:
+    """Accumulates trees into one set of flat arrays (global node ids)."""
+
+    def __init__(self):
+        self.feature, self.threshold = [], []
+        self.left, self.right, self.missing = [], [], []
+        self.value, self.roots, self.tree_class = [], [], []
+        self.max_depth = 0
+
+    def add_sklearn_tree(self, tree, feature_map=None, normalize=False):
+        t = tree.tree_
+        offset = len(self.feature)
+        leaf = t.children_left == -1
+        ids = np.arange(t.node_count)
+        features = np.where(leaf, 0, t.feature)
+        if feature_map is not None:  # bagging: tree-local column → global column
+            features = np.asarray(feature_map)[features]
+        left = np.where(leaf, ids, t.children_left) + offset
+        right = np.where(leaf, ids, t.children_right) + offset
+        # NaN follows the learned direction when sklearn saw missing values, else goes right
+        go_left = getattr(t, "missing_go_to_left", np.zeros(t.node_count, dtype=bool)).astype(bool)
+        missing = np.where(go_left, left, right)
+
+        if normalize:
+            value = t.value[:, 0, :].astype(np.float64)
+            totals = value.sum(axis=1, keepdims=True)
+            value = np.divide(value, totals, out=np.zeros_like(value), where=totals > 0)
+        else:
+            value = t.value[:, 0, 0].astype(np.float64)
+
+        self.feature.extend(features.tolist())
+        self.threshold.extend(np.where(leaf, 0.0, t.threshold).tolist())
+        self.left.extend(left.tolist())
+        self.right.extend(right.tolist())
+        self.missing.extend(missing.tolist())
+        self.value.extend(value)
+        self.roots.append(offset)
+        self.tree_class.append(0)
+        self.max_depth = max(self.max_depth, t.max_depth)
+
+    def add_xgb_tree(self, tree, feature_index, tree_class):
+        """tree: one get_dump(dump_format="json") tree."""
+        offset = len(self.feature)
+        nodes, ids = [], {}
+
+        def walk(node, depth):
+            ids[node["nodeid"]] = offset + len(nodes)
+            nodes.append(node)
+            self.max_depth = max(self.max_depth, depth)
+            for child in node.get("children", []):
+                walk(child, depth + 1)
+
+        walk(tree, 0)
+        for i, node in enumerate(nodes):
+            me = offset + i
+            if "leaf" in node:
+                self.feature.append(0)
+                self.threshold.append(0.0)
+                self.left.append(me)
+                self.right.append(me)
+                self.missing.append(me)
+                self.value.append(float(np.float32(node["leaf"])))
+            else:
+                self.feature.append(feature_index(node["split"]))
+                self.threshold.append(float(np.float32(node["split_condition"])))
+                self.left.append(ids[node["yes"]])
+                self.right.append(ids[node["no"]])
+                self.missing.append(ids[node["missing"]])
+                self.value.append(0.0)
+        self.roots.append(offset)
+        self.tree_class.append(tree_class)
+
+    def arrays(self):
+        return {
+            "feature": np.asarray(self.feature, dtype=np.int32),
+            "threshold": np.asarray(self.threshold, dtype=np.float64),
+            "left": np.asarray(self.left, dtype=np.int32),
+            "right": np.asarray(self.right, dtype=np.int32),
+            "missing": np.asarray(self.missing, dtype=np.int32),
+            "value": np.asarray(self.value, dtype=np.float64),
+            "roots": np.asarray(self.roots, dtype=np.int32),
+            "tree_class": np.asarray(self.tree_class, dtype=np.int32),
+        }
+
+
+def _sklearn_tables(estimator):
+    tables = _Tables()
+    if isinstance(estimator, (DecisionTreeClassifier, DecisionTreeRegressor)):
+        tables.add_sklearn_tree(estimator, normalize=isinstance(estimator, DecisionTreeClassifier))
+    elif isinstance(estimator, BaggingRegressor):
+        for tree, features in zip(estimator.estimators_, estimator.estimators_features_):
+            if not isinstance(tree, DecisionTreeRegressor):
+                raise NotImplementedError("Only bagged decision trees are mapped")
+            tables.add_sklearn_tree(tree, feature_map=features)
+    else:
+        classifier = isinstance(estimator, (RandomForestClassifier, ExtraTreesClassifier))
+        for tree in estimator.estimators_:
+            tables.add_sklearn_tree(tree, normalize=classifier)
+    return tables
+
+
+def _xgb_tables(estimator):
+    booster = estimator.get_booster()
+    config = json.loads(booster.save_config())
+    learner = config["learner"]
+    if learner["gradient_booster"]["name"] != "gbtree":
+        raise NotImplementedError(f"Booster {learner['gradient_booster']['name']}")
+    objective = learner["objective"]["name"]
+    base_score = [float(v) for v in learner["learner_model_param"]["base_score"].strip("[]").split(",")]
+    num_class = max(int(learner["learner_model_param"].get("num_class", "0")), 1)
+    parallel = int(learner["gradient_booster"].get("gbtree_model_param", {}).get("num_parallel_tree", "1"))
+
+    dumps = booster.get_dump(dump_format="json")
+    best_iteration = getattr(booster, "best_iteration", None)
+    if best_iteration is not None:  # early stopping: sklearn wrapper predicts up to the best round
+        dumps = dumps[:(int(best_iteration) + 1) * num_class * parallel]
+
+    names = booster.feature_names
+    index = {name: i for i, name in enumerate(names)} if names else None
+
+    def feature_index(split):
+        return index[split] if index is not None else int(split.lstrip("f"))
+
+    tables = _Tables()
+    for i, dump in enumerate(dumps):
+        tables.add_xgb_tree(json.loads(dump), feature_index, (i // parallel) % num_class)
+
+    if objective == "reg:squarederror":
+        link, base_margin = "identity", base_score[0]
+    elif objective == "binary:logistic":
+        link, base_margin = "logistic", float(np.log(base_score[0] / (1.0 - base_score[0])))
+    elif objective in ("multi:softprob", "multi:softmax"):
+        link, base_margin = "softmax", base_score if len(base_score) > 1 else base_score[0]
+    else:
+        raise NotImplementedError(f"XGBoost objective {objective}")
+    return tables, link, base_margin
+
+
+def _mappable(estimator):
+    return hasattr(estimator, "get_booster") or isinstance(estimator, (
+        RandomForestClassifier, RandomForestRegressor, ExtraTreesClassifier, ExtraTreesRegressor,
+        DecisionTreeClassifier, DecisionTreeRegressor, BaggingRegressor))
+
+
+def _map_estimator(estimator, name, out_dir, source):
+    if hasattr(estimator, "get_booster"):
+        tables, link, base_margin = _xgb_tables(estimator)
+        strict_less = True
+    else:
+        tables = _sklearn_tables(estimator)
+        link = "mean_proba" if hasattr(estimator, "classes_") else "mean"
+        base_margin, strict_less = 0.0, False
+
+    arrays = tables.arrays()
+    for key in NODE_ARRAYS:
+        np.save(os.path.join(out_dir, f"{name}.{key}.npy"), arrays[key])
+    feature_names = getattr(estimator, "feature_names_in_", None)
+    return MappedEnsemble(
+        name, link, tables.max_depth, estimator.n_features_in_, strict_less=strict_less,
+        classes=getattr(estimator, "classes_", None), base_margin=base_margin,
+        feature_names=None if feature_names is None else list(feature_names), source=source,
+    )
+
+
+def _skeleton(obj, out_dir, source, counter):
+    """Copy of obj with every mappable estimator replaced by a MappedEnsemble stub."""
+    if isinstance(obj, dict):
+        return {k: _skeleton(v, out_dir, source, counter) for k, v in obj.items()}
+    if isinstance(obj, tuple):
+        return tuple(_skeleton(v, out_dir, source, counter) for v in obj)
+    if isinstance(obj, Pipeline):
+        mapped = copy.copy(obj)
+        mapped.steps = [(name, _skeleton(step, out_dir, source, counter)) for name, step in obj.steps]
+        return mapped
+    if _mappable(obj):
+        try:
+            mapped = _map_estimator(obj, f"ensemble{len(counter)}", out_dir, source)
+        except NotImplementedError as e:
+            print(f"⚠️ Keeping {type(obj).__name__} pickled: {e}")
+            return obj
+        counter.append(obj)
+        return mapped
+    return obj
+
+
+def _sha256(path):
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def export(path):
+    """Write <artifact>.mmap/ for one pickled artifact (built aside, then swapped in)."""
+    stat, checksum = os.stat(path), _sha256(path)  # before loading, so a concurrent rewrite reads as stale
+    obj = joblib.load(path)
+    out_dir = mapped_path(path)
+    tmp_dir = f"{out_dir}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    mapped = []
+    skeleton = _skeleton(obj, tmp_dir, os.path.basename(path), mapped)
+    joblib.dump(skeleton, os.path.join(tmp_dir, SKELETON), compress=0)
+
+    files = sorted(os.listdir(tmp_dir))
+    manifest = {
+        "format": FORMAT_VERSION,
+        # backend/inference.py serves the pickle instead once it no longer matches these
+        "source": os.path.basename(path),
+        "source_checksum": f"sha256:{checksum}",
+        "source_size": stat.st_size,
+        "source_mtime": stat.st_mtime,
+        "created_at": datetime.now(UTC).isoformat(),
+        "ensembles": len(mapped),
+        "files": {name: {"sha256": _sha256(os.path.join(tmp_dir, name)),
+                         "size_bytes": os.path.getsize(os.path.join(tmp_dir, name))} for name in files},
+    }
+    with open(os.path.join(tmp_dir, MANIFEST), "w") as f:
+        json.dump(manifest, f, indent=2)
+
+    # Directories cannot be os.replace()d over a non-empty target: move the old one aside first
+    old_dir = f"{out_dir}.old-{os.getpid()}"
+    if os.path.exists(out_dir):
+        os.rename(out_dir, old_dir)
+    os.rename(tmp_dir, out_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+    size = sum(v["size_bytes"] for v in manifest["files"].values())
+    print(f"📦 Mapped {os.path.relpath(path, BASE_DIR)} → {os.path.relpath(out_dir, BASE_DIR)} "
+          f"({len(mapped)} ensemble(s), {size} bytes)")
+    return out_dir
+
+
+def artifact_paths():
+    yield_paths = sorted(glob.glob(os.path.join(YIELD_DIR, "*_pipeline.pkl")))
+    return [p for p in [FERTILIZER_PATH, PEST_PATH, IRRIGATION_PATH, *yield_paths] if os.path.exists(p)]
+
+
+# ---------------- Parity ----------------
+def _classifier_parity(reference, mapped, X):
+    ref_proba = reference.predict_proba(X)
+    out_proba = mapped.predict_proba(X)
+    agreement = float(np.mean(reference.classes_[ref_proba.argmax(axis=1)].astype(str) ==
+                              mapped.classes_[out_proba.argmax(axis=1)].astype(str)))
+    max_diff = float(np.max(np.abs(ref_proba - out_proba)))
+    return {
+        "rows": len(X),
+        "label_agreement": agreement,
+        "max_proba_abs_diff": max_diff,
+        "passed": agreement == 1.0 and max_diff <= PROBA_ATOL,
+        "pickle_single_row_us": round(_single_row_latency_us(reference.predict_proba, X), 1),
+        "mmap_single_row_us": round(_single_row_latency_us(mapped.predict_proba, X), 1),
+    }
+
+
+def _regressor_parity(reference, mapped, X):
+    ref = np.asarray(reference.predict(X), dtype=np.float64)
+    out = np.asarray(mapped.predict(X), dtype=np.float64)
+    rel_diff = np.abs(ref - out) / np.maximum(np.abs(ref), 1.0)
+    return {
+        "rows": len(X),
+        "max_rel_diff": float(rel_diff.max()),
+        "passed": bool(rel_diff.max() <= REGRESSION_RTOL),
+        "pickle_single_row_us": round(_single_row_latency_us(reference.predict, X), 1),
+        "mmap_single_row_us": round(_single_row_latency_us(mapped.predict, X), 1),
+    }
+
+
+def check_parity():
+    report = {}
+
+    bundle, mapped = joblib.load(FERTILIZER_PATH), load_mapped(mapped_path(FERTILIZER_PATH))
+    report["fertilizer"] = _classifier_parity(bundle["pipeline"], mapped["pipeline"], fertilizer_test_split())
+
+    report["pest_control"] = _classifier_parity(
+        joblib.load(PEST_PATH), load_mapped(mapped_path(PEST_PATH)), pest_test_split())
+
+    model, label_encoders, _ = joblib.load(IRRIGATION_PATH)
+    mapped_model = load_mapped(mapped_path(IRRIGATION_PATH))[0]
+    report["irrigation"] = _classifier_parity(model, mapped_model, irrigation_test_split(label_encoders))
+
+    X_yield = yield_test_split()
+    for path in artifact_paths():
+        if os.path.dirname(path) == YIELD_DIR:
+            name = os.path.basename(path).replace("_pipeline.pkl", "")
+            report[f"yield_prediction:{name}"] = _regressor_parity(
+                joblib.load(path), load_mapped(mapped_path(path)), X_yield)
+
+    print(json.dumps(report, indent=2))
+    return report
+
+
+# ---------------- Worker memory ----------------
+def _serving_paths(fmt):
+    """What one backend worker loads: the four served artifacts."""
+    _, yield_path = _best_yield_path()
+    paths = [FERTILIZER_PATH, PEST_PATH, IRRIGATION_PATH, yield_path]
+    return [mapped_path(p) for p in paths] if fmt == "mmap" else paths
+
+
+def _worker(fmt):
+    """Load like a backend worker, touch every model page, report memory, wait for stdin to close."""
+    before = process_memory()
+    models = [load_mapped(p) if fmt == "mmap" else joblib.load(p) for p in _serving_paths(fmt)]
+    for obj in models:
+        for arrays in (getattr(m, "arrays", None) for m in _walk(obj)):
+            for array in (arrays or {}).values():
+                float(np.asarray(array).sum())  # fault every page in
+    after = process_memory()
+    print(json.dumps({"before": before, "after": after}), flush=True)
+    sys.stdin.read()
+
+
+def _walk(obj):
+    if isinstance(obj, dict):
+        return [m for v in obj.values() for m in _walk(v)]
+    if isinstance(obj, (list, tuple)):
+        return [m for v in obj for m in _walk(v)]
+    if isinstance(obj, Pipeline):
+        return [m for _, step in obj.steps for m in _walk(step)]
+    return [obj]
+
+
+def _pss_kb(pid):
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                if line.startswith("Pss:"):
+                    return int(line.split()[1])
+    except OSError:
+        return None
+
+
+def measure_workers(fmt, n_workers):
+    """Start n_workers loaders at once; per-worker RSS/private/shared and total PSS once all are up."""
+    procs = [subprocess.Popen([sys.executable, os.path.abspath(__file__), "--worker", fmt],
+                              stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+             for _ in range(n_workers)]
+    reports = []
+    for proc in procs:
+        memory = json.loads(proc.stdout.readline())
+        reports.append({**memory["after"], "before_VmRSS_kb": memory["before"].get("VmRSS_kb")})
+    # Measure PSS while every worker is still alive, so shared pages are split N ways
+    for proc, report in zip(procs, reports):
+        report["Pss_kb"] = _pss_kb(proc.pid)
+    for proc in procs:
+        proc.stdin.close()
+        proc.wait()
+    total_pss = sum(r["Pss_kb"] or 0 for r in reports)
+    return {"format": fmt, "workers": n_workers, "per_worker": reports, "total_pss_kb": total_pss}
+
+
+def report_memory(n_workers):
+    results = [measure_workers(fmt, n_workers) for fmt in ("pickle", "mmap")]
+    for r in results:
+        w = r["per_worker"][0]
+        print(f"{r['format']:>6}: {r['workers']} workers, per worker RSS {w.get('VmRSS_kb')} kB "
+              f"(anon {w.get('RssAnon_kb')} kB, file-backed {w.get('RssFile_kb')} kB, "
+              f"before loading {w.get('before_VmRSS_kb')} kB); total PSS {r['total_pss_kb']} kB")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write memory-mapped model artifacts")
+    parser.add_argument("--export", action="store_true", help="only export")
+    parser.add_argument("--parity", action="store_true", help="only run the parity check")
+    parser.add_argument("--rss", type=int, metavar="N", help="compare worker memory with N workers per format")
+    parser.add_argument("--worker", choices=["pickle", "mmap"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        _worker(args.worker)
+        sys.exit(0)
+    if args.rss:
+        print(json.dumps(report_memory(args.rss), indent=2))
+        sys.exit(0)
+
+    if not args.parity:
+        for artifact in artifact_paths():
+            export(artifact)
+
+    if not args.export:
+        results = check_parity()
+        failed = [name for name, r in results.items() if not r["passed"]]
+        if failed:
+            print(f"❌ Parity check failed for: {', '.join(failed)}")
+            sys.exit(1)
+        print("✅ Mapped models match the pickles on the held-out test splits")
@@ -0,0 +1,362 @@
+"""
+Compile the four trained pipelines to ONNX and check them against sklearn.
+
+    python models/onnx_export.py            # export + parity check
+    python models/onnx_export.py --export   # export only
+    python models/onnx_export.py --parity   # parity check only
+
+For each artifact this writes <artifact>.onnx next to the .pkl plus an
+<artifact>.onnx.json sidecar describing the graph inputs/outputs and the
+label-encoder vocabularies the blueprints need, and the size/mtime/sha256 of
+the source pickle (a retrained pickle makes the export stale, and
+backend/inference.py serves the pickle until this is re-run). Preprocessing that lives in
+the sklearn Pipeline (StandardScaler, ColumnTransformer + Ordinal/OneHot
+encoders) is compiled into the graph itself. Serve them with
+INFERENCE_BACKEND=onnx (see backend/inference.py).
+
+Needs: skl2onnx, onnxmltools (for XGBoost), onnxruntime.
+"""
+import os
+import sys
+import copy
+import json
+import time
+import argparse
+import hashlib
+import importlib.util
+from contextlib import contextmanager
+
+import joblib
+import pickle
+import numpy as np
+import pandas as pd
+from sklearn.model_selection import train_test_split
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import OrdinalEncoder, OneHotEncoder
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+FERTILIZER_PATH = os.path.join(BASE_DIR, "fertilizer_recommendation", "Fertilizer_pipeline.pkl")
+PEST_PATH = os.path.join(BASE_DIR, "pest_risk", "PestRisk_RFClassifier_pipeline.pkl")
+IRRIGATION_PATH = os.path.join(BASE_DIR, "irrigation_techniques", "irrigation_model.pkl")
+IRRIGATION_DATA_PATH = os.path.join(BASE_DIR, "irrigation_techniques", "Irrigation_Recommendation_Dataset.csv")
+YIELD_DIR = os.path.join(BASE_DIR, "yeild_prediction")
+
+FERTILIZER_FEATURES = ["N", "P", "K", "temperature", "humidity", "ph", "rainfall", "crop_encoded"]
+TARGET_OPSET = {"": 17, "ai.onnx.ml": 3}
+
+# Parity tolerances (float32 graph vs float64 sklearn)
+PROBA_ATOL = float(os.getenv("ONNX_PARITY_PROBA_ATOL", "1e-4"))
+REGRESSION_RTOL = float(os.getenv("ONNX_PARITY_RTOL", "1e-4"))
+
+
+def _import_from(path, name):
+    """Import a sibling training module by path (several folders have a data.py)."""
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    sys.path.insert(0, os.path.dirname(path))
+    try:
+        spec.loader.exec_module(module)
+    finally:
+        sys.path.pop(0)
+    return module
+
+
+@contextmanager
+def _cwd(path):
+    old = os.getcwd()
+    os.chdir(path)
+    try:
+        yield
+    finally:
+        os.chdir(old)
+
+
+def _register_xgboost_converters():
+    from skl2onnx import update_registered_converter
+    from skl2onnx.common.shape_calculator import (
+        calculate_linear_classifier_output_shapes, calculate_linear_regressor_output_shapes
+    )
+    from onnxmltools.convert.xgboost.operator_converters.XGBoost import convert_xgboost
+    from xgboost import XGBClassifier, XGBRegressor
+
+    update_registered_converter(
+        XGBClassifier, "XGBoostXGBClassifier", calculate_linear_classifier_output_shapes, convert_xgboost,
+        options={"nocl": [True, False], "zipmap": [True, False, "columns"]}
+    )
+    update_registered_converter(
+        XGBRegressor, "XGBoostXGBRegressor", calculate_linear_regressor_output_shapes, convert_xgboost
+    )
+
+
+def _strip_feature_names(estimator):
+    """XGBoost's ONNX converter expects f0..fN split names, not DataFrame column names."""
+    if hasattr(estimator, "get_booster"):
+        estimator = copy.deepcopy(estimator)
+        estimator.get_booster().feature_names = None
+        estimator.get_booster().feature_types = None
+    return estimator
+
+
+def _final_estimator(model):
+    return model.steps[-1][1] if isinstance(model, Pipeline) else model
+
+
+def _column_inputs(preprocessor):
+    """[(column, kind)] for every column a fitted ColumnTransformer consumes."""
+    inputs = []
+    for _, transformer, columns in preprocessor.transformers_:
+        if transformer == "drop" or columns is None or len(columns) == 0:
+            continue
+        kind = "string" if isinstance(transformer, (OrdinalEncoder, OneHotEncoder)) else "float"
+        inputs.extend((col, kind) for col in columns)
+    return inputs
+
+
+def _convert(model, initial_types):
+    from skl2onnx import convert_sklearn
+
+    options = {}
+    estimator = _final_estimator(model)
+    if hasattr(estimator, "predict_proba"):
+        options[id(estimator)] = {"zipmap": False}
+    return convert_sklearn(model, initial_types=initial_types, options=options, target_opset=TARGET_OPSET)
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _write(onx, meta, pkl_path):
+    import onnxruntime as ort
+
+    onnx_path = os.path.splitext(pkl_path)[0] + ".onnx"
+    with open(onnx_path + ".tmp", "wb") as f:
+        f.write(onx.SerializeToString())
+
+    # Resolve output names from the graph itself
+    session = ort.InferenceSession(onnx_path + ".tmp", providers=["CPUExecutionProvider"])
+    outputs = [o.name for o in session.get_outputs()]
+    if "classes" in meta:
+        meta["label_output"] = outputs[0]
+        meta["probability_output"] = next(o for o in outputs if "prob" in o.lower())
+    else:
+        meta["value_output"] = outputs[0]
+    # backend/inference.py serves the pickle instead once it no longer matches these
+    stat = os.stat(pkl_path)
+    meta.update({"source": os.path.basename(pkl_path), "source_checksum": f"sha256:{_sha256(pkl_path)}",
+                 "source_size": stat.st_size, "source_mtime": stat.st_mtime})
+
+    with open(onnx_path + ".json.tmp", "w") as f:
+        json.dump(meta, f, indent=2)
+    # Sidecar first: the registry watches the .onnx file, so it must appear last
+    os.replace(onnx_path + ".json.tmp", onnx_path + ".json")
+    os.replace(onnx_path + ".tmp", onnx_path)
+    print(f"📦 Compiled {os.path.relpath(pkl_path, BASE_DIR)} → {os.path.relpath(onnx_path, BASE_DIR)}")
+    return onnx_path
+
+
+def _matrix_meta(features, input_name="input"):
+    return {"layout": "matrix", "features": features, "inputs": [{"name": input_name, "kind": "float"}]}
+
+
+def _columns_meta(onx, columns):
+    graph_inputs = [i.name for i in onx.graph.input]
+    return {
+        "layout": "columns",
+        "features": [col for col, _ in columns],
+        "inputs": [{"name": name, "column": col, "kind": kind} for name, (col, kind) in zip(graph_inputs, columns)],
+    }
+
+
+def _column_types(columns):
+    from skl2onnx.common.data_types import FloatTensorType, StringTensorType
+    return [(col, StringTensorType([None, 1]) if kind == "string" else FloatTensorType([None, 1]))
+            for col, kind in columns]
+
+
+# ---------------- Export ----------------
+def export_fertilizer():
+    from skl2onnx.common.data_types import FloatTensorType
+
+    bundle = joblib.load(FERTILIZER_PATH)
+    pipeline = bundle["pipeline"]
+    onx = _convert(pipeline, [("input", FloatTensorType([None, len(FERTILIZER_FEATURES)]))])
+    meta = _matrix_meta(FERTILIZER_FEATURES)
+    meta["classes"] = pipeline.classes_.tolist()
+    meta["vocab"] = {
+        "crop_encoder": bundle["crop_encoder"].classes_.tolist(),
+        "fertilizer_encoder": bundle["fertilizer_encoder"].classes_.tolist(),
+    }
+    return _write(onx, meta, FERTILIZER_PATH)
+
+
+def export_pest():
+    pipeline = joblib.load(PEST_PATH)
+    columns = _column_inputs(pipeline.named_steps["preprocessor"])
+    onx = _convert(pipeline, _column_types(columns))
+    meta = _columns_meta(onx, columns)
+    meta["classes"] = [str(c) for c in pipeline.classes_]
+    return _write(onx, meta, PEST_PATH)
+
+
+def export_irrigation():
+    from skl2onnx.common.data_types import FloatTensorType
+
+    with open(IRRIGATION_PATH, "rb") as f:
+        model, label_encoders, target_encoder = pickle.load(f)
+    features = list(model.feature_names_in_)
+    onx = _convert(_strip_feature_names(model), [("input", FloatTensorType([None, len(features)]))])
+    meta = _matrix_meta(features)
+    meta["classes"] = model.classes_.tolist()
+    meta["vocab"] = {
+        "label_encoders": {col: le.classes_.tolist() for col, le in label_encoders.items()},
+        "target_encoder": target_encoder.classes_.tolist(),
+    }
+    return _write(onx, meta, IRRIGATION_PATH)
+
+
+def _best_yield_path():
+    results_df = pd.read_csv(os.path.join(YIELD_DIR, "results.csv"), index_col=0)
+    best_model_name = results_df["MSE"].idxmin()
+    return best_model_name, os.path.join(YIELD_DIR, f"{best_model_name.replace(' ', '_')}_pipeline.pkl")
+
+
+def export_yield():
+    best_model_name, path = _best_yield_path()
+    pipeline = joblib.load(path)
+    preprocessor = pipeline.named_steps["preprocessor"]
+    columns = _column_inputs(preprocessor)
+    model = Pipeline([("preprocessor", preprocessor), ("model", _strip_feature_names(pipeline.named_steps["model"]))])
+    onx = _convert(model, _column_types(columns))
+    meta = _columns_meta(onx, columns)
+    meta["model_name"] = best_model_name
+    return _write(onx, meta, path)
+
+
+# ---------------- Held-out splits (same seeds as the training scripts) ----------------
+def fertilizer_test_split():
+    data = _import_from(os.path.join(BASE_DIR, "fertilizer_recommendation", "data.py"), "fertilizer_data")
+    df, _, _ = data.load_and_preprocess()
+    X, y = df[FERTILIZER_FEATURES], df["fertilizer_encoded"]
+    _, X_test, _, _ = train_test_split(X, y, test_size=0.2, random_state=42, stratify=y)
+    return X_test
+
+
+def pest_test_split():
+    main = _import_from(os.path.join(BASE_DIR, "pest_risk", "main.py"), "pest_main")
+    _, X_test, _, _, _, _ = main.load_and_preprocess_data()
+    return X_test
+
+
+def irrigation_test_split(label_encoders):
+    df = pd.read_csv(IRRIGATION_DATA_PATH)
+    for col, le in label_encoders.items():
+        df[col] = le.transform(df[col])
+    X, y = df.drop(columns=["irrigation_method"]), df["irrigation_method"]
+    _, X_test, _, _ = train_test_split(X, y, test_size=0.2, random_state=42, stratify=y)
+    return X_test
+
+
+def yield_test_split():
+    data = _import_from(os.path.join(YIELD_DIR, "data.py"), "yield_data")
+    with _cwd(YIELD_DIR):
+        X, y = data.load_dataset()
+    _, X_test, _, _ = train_test_split(X, y, test_size=0.2, random_state=47)
+    return X_test
+
+
+# ---------------- Parity ----------------
+def _compiled(pkl_path):
+    """Load the export through the same wrapper the blueprints serve it with."""
+    inference = _import_from(os.path.join(BASE_DIR, "..", "backend", "inference.py"), "backend_inference")
+    return inference.OnnxModel(os.path.splitext(pkl_path)[0] + ".onnx")
+
+
+def _single_row_latency_us(fn, X, repeats=200):
+    row = X.iloc[:1]
+    fn(row)
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn(row)
+    return (time.perf_counter() - start) / repeats * 1e6
+
+
+def _classifier_parity(name, reference, X):
+    compiled = _compiled(name)
+    ref_proba = reference.predict_proba(X)
+    onnx_proba = compiled.predict_proba(X)
+    ref_label = reference.classes_[ref_proba.argmax(axis=1)]
+    onnx_label = compiled.classes_[onnx_proba.argmax(axis=1)]
+    agreement = float(np.mean(ref_label.astype(str) == onnx_label.astype(str)))
+    max_diff = float(np.max(np.abs(ref_proba - onnx_proba)))
+    return {
+        "rows": len(X),
+        "label_agreement": agreement,
+        "max_proba_abs_diff": max_diff,
+        "passed": agreement == 1.0 and max_diff <= PROBA_ATOL,
+        "sklearn_single_row_us": round(_single_row_latency_us(reference.predict_proba, X), 1),
+        "onnx_single_row_us": round(_single_row_latency_us(compiled.predict_proba, X), 1),
+    }
+
+
+def _regressor_parity(name, reference, X):
+    compiled = _compiled(name)
+    ref = np.asarray(reference.predict(X), dtype=np.float64)
+    out = compiled.predict(X).astype(np.float64)
+    rel_diff = np.abs(ref - out) / np.maximum(np.abs(ref), 1.0)
+    return {
+        "rows": len(X),
+        "max_rel_diff": float(rel_diff.max()),
+        "passed": bool(rel_diff.max() <= REGRESSION_RTOL),
+        "sklearn_single_row_us": round(_single_row_latency_us(reference.predict, X), 1),
+        "onnx_single_row_us": round(_single_row_latency_us(compiled.predict, X), 1),
+    }
+
+
+def check_parity():
+    report = {}
+
+    bundle = joblib.load(FERTILIZER_PATH)
+    report["fertilizer"] = _classifier_parity(FERTILIZER_PATH, bundle["pipeline"], fertilizer_test_split())
+
+    report["pest_control"] = _classifier_parity(PEST_PATH, joblib.load(PEST_PATH), pest_test_split())
+
+    with open(IRRIGATION_PATH, "rb") as f:
+        model, label_encoders, _ = pickle.load(f)
+    report["irrigation"] = _classifier_parity(IRRIGATION_PATH, model, irrigation_test_split(label_encoders))
+
+    _, yield_path = _best_yield_path()
+    report["yield_prediction"] = _regressor_parity(yield_path, joblib.load(yield_path), yield_test_split())
+
+    print(json.dumps(report, indent=2))
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compile trained pipelines to ONNX and check parity")
+    parser.add_argument("--export", action="store_true", help="only export")
+    parser.add_argument("--parity", action="store_true", help="only run the parity check")
+    args = parser.parse_args()
+
+    if not args.parity:
+        _register_xgboost_converters()
+        export_fertilizer()
+        export_pest()
+        export_irrigation()
+        export_yield()
+
+    if not args.export:
+        results = check_parity()
+        failed = [name for name, r in results.items() if not r["passed"]]
+        if failed:
+            print(f"❌ Parity check failed for: {', '.join(failed)}")
+            sys.exit(1)
+        print("✅ Compiled models match sklearn on the held-out test splits")
@@ -1,9 +1,12 @@
-import os
+import os, sys
 import pandas as pd
 from sklearn.model_selection import train_test_split
 from sklearn.compose import ColumnTransformer
 from sklearn.preprocessing import StandardScaler, OneHotEncoder, OrdinalEncoder
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from datastore import read_dataset  # columnar copy when converted, else the CSV
+
 def get_preprocessors(X):
     numeric_features = X.select_dtypes(include=['int64', 'float64']).columns.tolist()
     categorical_features = X.select_dtypes(include=['object', 'category']).columns.tolist()
@@ -29,7 +32,7 @@ def load_and_preprocess_data(
         file_path = os.path.join(BASE_DIR, "./pest_risk_dataset.csv")
 
     # Load dataset
-    df = pd.read_csv(file_path)
+    df = read_dataset(file_path)
 
     # Features (X) and target (y)
     X = df.drop(columns=["Pest_Risk"])
@@ -1,5 +1,6 @@
-import os
+import os, sys
 import joblib
+from sklearn.base import clone
 from sklearn.pipeline import Pipeline
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.metrics import accuracy_score, classification_report, confusion_matrix
@@ -9,6 +10,10 @@ from main import load_and_preprocess_data
 
 # ✅ Base directory (this script’s location)
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# ✅ Shared helpers in models/
+sys.path.append(os.path.dirname(BASE_DIR))
+from forest_search import find_smallest_forest, FOREST_SEARCH_TOLERANCE
 MODEL_DIR = os.path.join(BASE_DIR)
 RESULTS_DIR = os.path.join(MODEL_DIR)
 
@@ -18,21 +23,25 @@ RESULTS_DIR = os.path.join(MODEL_DIR)
 # Load data & preprocessors
 X_train, X_test, y_train, y_test, linear_preprocessor, tree_preprocessor = load_and_preprocess_data()
 
-# Define RandomForest model
-rf_model = RandomForestClassifier(
-    n_estimators=200,
-    random_state=47,
-    class_weight="balanced"
-)
-
-# Create pipeline with tree_preprocessor
-pipeline = Pipeline([
-    ("preprocessor", tree_preprocessor),
-    ("model", rf_model)
-])
+# Define RandomForest model + pipeline with tree_preprocessor
+def make_pipeline(n_estimators=200, max_depth=None):
+    rf_model = RandomForestClassifier(
+        n_estimators=n_estimators,
+        max_depth=max_depth,
+        random_state=47,
+        class_weight="balanced"
+    )
+    return Pipeline([
+        ("preprocessor", clone(tree_preprocessor)),
+        ("model", rf_model)
+    ])
 
-# Train model
-pipeline.fit(X_train, y_train)
+# Train model: smallest forest within tolerance of the full 200-tree model
+pipeline, best, full, search_df = find_smallest_forest(make_pipeline, X_train, y_train, X_test, y_test)
+print(f"🌲 Selected {best['n_estimators']} trees, max_depth={best['max_depth']} "
+      f"(tolerance {FOREST_SEARCH_TOLERANCE}); memory {best['model_memory_bytes']} vs "
+      f"{full['model_memory_bytes']} bytes for the full model")
+search_df.to_csv(os.path.join(RESULTS_DIR, "forest_search.csv"), index=False)
 
 # Predictions
 y_pred = pipeline.predict(X_test)
@@ -62,5 +71,12 @@ print(pipeline.predict(sample_input))
 RESULTS_PATH = os.path.join(RESULTS_DIR, "results.csv")
 results_df = pd.DataFrame(class_report).T
 results_df.loc["overall_accuracy"] = [accuracy, None, None, None]  # add accuracy row
+# Size / cost of the saved forest, plus the full-size reference
+results_df.loc["overall_macro_f1"] = [best["macro_f1"], None, None, None]
+for key in ["n_estimators", "max_depth", "model_size_bytes", "model_memory_bytes", "single_row_latency_ms"]:
+    results_df.loc[key] = [best[key], None, None, None]
+    results_df.loc[f"full_{key}"] = [full[key], None, None, None]
+results_df.loc["full_accuracy"] = [full["accuracy"], None, None, None]
+results_df.loc["full_macro_f1"] = [full["macro_f1"], None, None, None]
 results_df.to_csv(RESULTS_PATH, index=True)
 print(f"📂 Results saved at: {RESULTS_PATH}")
@@ -1,13 +1,19 @@
-import pandas as pd
-def load_dataset():
-    data = pd.read_csv("Custom_Crops_yield_Historical_Dataset.csv")
+import os, sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from datastore import read_dataset  # columnar copy when converted, else the CSV
+def load_dataset(path="Custom_Crops_yield_Historical_Dataset.csv"):
+    return split_features(read_dataset(path))
+def split_features(data):
+    """Raw dataset rows → (features, yield_kg_per_ha)."""
+    data = data.copy()
     data.columns = data.columns.str.strip().str.lower().str.replace(" ", "_")
     x = data.drop(["state_code","dist_code","total_n_kg","total_p_kg","total_k_kg","yield_kg_per_ha"],axis=1)
     x.columns = x.columns.str.strip().str.lower().str.replace(" ", "_")
     y = data["yield_kg_per_ha"]
     return x,y
-def preview_data():
-    data = pd.read_csv("Custom_Crops_yield_Historical_Dataset.csv")
+def preview_data(data=None):
+    if data is None:
+        data = read_dataset("Custom_Crops_yield_Historical_Dataset.csv")
     print("\nCustom_Crops_yield_Historical_Dataset preview (first 5 rows):\n")
     print(data.head())
     print("\nDataset info:\n")
@@ -15,5 +21,6 @@ def preview_data():
     print("\nMissing values:\n")
     print(data.isnull().sum())
 if __name__ == "__main__":
-    load_dataset()
-    preview_data()
\ No newline at end of file
+    data = read_dataset("Custom_Crops_yield_Historical_Dataset.csv")
+    split_features(data)
+    preview_data(data)
\ No newline at end of file
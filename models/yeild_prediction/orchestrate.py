@@ -0,0 +1,248 @@
+"""
+Parallel training orchestrator for the yield model zoo: the same models,
+split and outputs as train.py, in less wall-clock time.
+
+    python orchestrate.py                                   # every model, every core
+    python orchestrate.py --state Punjab --out regions/punjab
+    python orchestrate.py --cores 8 --models "Random Forest" XGBoost
+
+- The train/test split is made once.
+- Each distinct preprocessor is fitted once and shared by every candidate that
+  uses it. The fitted preprocessor and the transformed matrices are cached on
+  disk (joblib.Memory, keyed by the data and the preprocessor's params), so a
+  weekly rerun on unchanged data skips them entirely.
+- Candidates run in a process pool, heaviest first. Each job gets its own core
+  allocation (n_jobs on the estimator, BLAS/OpenMP threads capped to match),
+  so RF, XGBoost and Bagging no longer each grab every core. Cores are shared
+  in proportion to each model's core-seconds from the previous run's
+  results.csv (DEFAULT_WEIGHTS the first time).
+- Pipelines are staged while the jobs run and os.replace()d into place at the
+  end, results.csv last, so the API's hot reload never sees a half-written file.
+"""
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import joblib
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from sklearn.base import clone
+from sklearn.model_selection import train_test_split
+from sklearn.pipeline import Pipeline
+from sklearn.metrics import mean_squared_error, r2_score
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(BASE_DIR)
+from ml_models import get_models
+from preproc import get_preprocessors
+from data import load_dataset
+
+DATASET_PATH = os.path.join(BASE_DIR, "Custom_Crops_yield_Historical_Dataset.csv")
+CACHE_DIR = os.getenv("YIELD_TRAIN_CACHE", os.path.join(BASE_DIR, ".train_cache"))
+TEST_SIZE = 0.2
+RANDOM_STATE = 47
+
+# Relative cost (≈ core-seconds) used until a results.csv with timings exists
+DEFAULT_WEIGHTS = {
+    "Linear Regression": 1,
+    "Bagging (Linear Regression)": 4,
+    "Random Forest": 20,
+    "XGBoost": 20,
+    "Bagging (Decision Tree)": 12,
+}
+
+
+def pipeline_filename(name):
+    return f"{name.replace(' ', '_')}_pipeline.pkl"
+
+
+def atomic_dump(obj, path):
+    tmp = path + ".tmp"
+    joblib.dump(obj, tmp)
+    os.replace(tmp, path)
+
+
+# ---------------- Preprocessors ----------------
+
+def _fit_transform(preprocessor, X_train, X_test):
+    fitted = clone(preprocessor).fit(X_train)
+    return fitted, fitted.transform(X_train), fitted.transform(X_test)
+
+
+def fit_preprocessors(kinds, preprocessors, X_train, X_test, use_cache=True):
+    """{kind: (fitted, Xt_train, Xt_test)} for each preprocessor kind needed, each fitted once."""
+    fit = _fit_transform
+    if use_cache:
+        fit = joblib.Memory(CACHE_DIR, verbose=0).cache(_fit_transform)
+    fitted = {}
+    for kind in kinds:
+        start = time.perf_counter()
+        fitted[kind] = fit(preprocessors[kind], X_train, X_test)
+        print(f"📦 {kind} preprocessor ready in {time.perf_counter() - start:.2f}s")
+    return fitted
+
+
+# ---------------- Scheduling ----------------
+
+def previous_weights(results_path, names):
+    """Core-seconds per model from the last run's results.csv, falling back to DEFAULT_WEIGHTS."""
+    weights = {name: DEFAULT_WEIGHTS.get(name, 1) for name in names}
+    if os.path.exists(results_path):
+        previous = pd.read_csv(results_path, index_col=0)
+        if {"fit_seconds", "n_jobs"} <= set(previous.columns):
+            for name in names:
+                if name in previous.index and pd.notna(previous.at[name, "fit_seconds"]):
+                    weights[name] = max(float(previous.at[name, "fit_seconds"] * previous.at[name, "n_jobs"]), 1e-3)
+    return weights
+
+
+def allocate_cores(weights, cores):
+    """
+    {name: n_jobs}: at least one core each, the rest shared in proportion to
+    weight (largest remainder). With more jobs than cores everyone gets one.
+    """
+    alloc = {name: 1 for name in weights}
+    spare = cores - len(weights)
+    if spare <= 0:
+        return alloc
+    total = sum(weights.values())
+    shares = {name: spare * w / total for name, w in weights.items()}
+    for name, share in shares.items():
+        alloc[name] += int(share)
+    left = cores - sum(alloc.values())
+    for name in sorted(shares, key=lambda n: shares[n] - int(shares[n]), reverse=True)[:left]:
+        alloc[name] += 1
+    return alloc
+
+
+def _with_n_jobs(model, n_jobs):
+    """The estimator's own n_jobs gets the allocation; nested estimators run single-threaded."""
+    params = {}
+    for key in model.get_params():
+        if key == "n_jobs":
+            params[key] = n_jobs
+        elif key.endswith("__n_jobs"):
+            params[key] = 1
+    return model.set_params(**params)
+
+
+# ---------------- Jobs ----------------
+
+def _train_candidate(name, model, n_jobs, data_paths, preprocessor_path, staged_path):
+    """Runs in a pool worker: fit on the pre-transformed matrices, score, stage the pipeline."""
+    from threadpoolctl import threadpool_limits
+
+    Xt_train, Xt_test, y_train, y_test = (joblib.load(p, mmap_mode="r") for p in data_paths)
+    model = _with_n_jobs(model, n_jobs)
+
+    with threadpool_limits(limits=n_jobs):
+        start = time.perf_counter()
+        model.fit(Xt_train, y_train)
+        fit_seconds = time.perf_counter() - start
+        y_pred = model.predict(Xt_test)
+
+    pipeline = Pipeline([("preprocessor", joblib.load(preprocessor_path)), ("model", model)])
+    atomic_dump(pipeline, staged_path)
+    return {
+        "MSE": mean_squared_error(y_test, y_pred),
+        "R2": r2_score(y_test, y_pred),
+        "fit_seconds": fit_seconds,
+        "n_jobs": n_jobs,
+    }
+
+
+def orchestrate(data_path=DATASET_PATH, out_dir=BASE_DIR, state=None, model_names=None,
+                cores=None, use_cache=True):
+    X, y = load_dataset(data_path)
+    if state:
+        mask = X["state_name"].astype(str).str.strip().str.lower() == state.strip().lower()
+        X, y = X[mask].reset_index(drop=True), y[mask].reset_index(drop=True)
+        if X.empty:
+            raise ValueError(f"No rows for state '{state}'")
+        print(f"🔍 {len(X)} rows for {state}")
+
+    # ✅ One split for every candidate
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=TEST_SIZE, random_state=RANDOM_STATE)
+
+    models, linear_models = get_models()
+    if model_names:
+        unknown = set(model_names) - set(models)
+        if unknown:
+            raise ValueError(f"Unknown models: {sorted(unknown)}")
+        models = {name: models[name] for name in models if name in model_names}
+    kind_of = {name: "linear" if name in linear_models else "tree" for name in models}
+
+    linear_preprocessor, tree_preprocessor = get_preprocessors(X)
+    preprocessors = {"linear": linear_preprocessor, "tree": tree_preprocessor}
+    fitted = fit_preprocessors(sorted(set(kind_of.values())), preprocessors, X_train, X_test, use_cache)
+
+    os.makedirs(out_dir, exist_ok=True)
+    results_path = os.path.join(out_dir, "results.csv")
+    cores = cores or os.cpu_count() or 1
+    weights = previous_weights(results_path, list(models))
+    alloc = allocate_cores(weights, cores)
+    order = sorted(models, key=weights.get, reverse=True)
+    print(f"⚡ {cores} cores: " + ", ".join(f"{name}={alloc[name]}" for name in order))
+
+    work_dir = tempfile.mkdtemp(prefix=".orchestrate-", dir=out_dir)
+    try:
+        # Transformed matrices go to disk once; workers memory-map them instead of unpickling copies
+        data_paths, preprocessor_paths = {}, {}
+        for kind, (preprocessor, Xt_train, Xt_test) in fitted.items():
+            data_paths[kind] = []
+            for label, obj in (("Xt_train", Xt_train), ("Xt_test", Xt_test),
+                               ("y_train", y_train.to_numpy()), ("y_test", y_test.to_numpy())):
+                path = os.path.join(work_dir, f"{kind}_{label}.joblib")
+                joblib.dump(obj, path)
+                data_paths[kind].append(path)
+            preprocessor_paths[kind] = os.path.join(work_dir, f"{kind}_preprocessor.joblib")
+            joblib.dump(preprocessor, preprocessor_paths[kind])
+
+        start = time.perf_counter()
+        results = {}
+        with ProcessPoolExecutor(max_workers=min(len(models), cores)) as pool:
+            futures = {
+                name: pool.submit(
+                    _train_candidate, name, models[name], alloc[name], data_paths[kind_of[name]],
+                    preprocessor_paths[kind_of[name]], os.path.join(work_dir, pipeline_filename(name))
+                )
+                for name in order
+            }
+            for name in order:
+                results[name] = futures[name].result()
+                print(f"✅ {name}: MSE={results[name]['MSE']:.2f} R2={results[name]['R2']:.4f} "
+                      f"({results[name]['fit_seconds']:.1f}s on {alloc[name]} cores)")
+        print(f"⚡ All candidates trained in {time.perf_counter() - start:.1f}s")
+
+        # Swap the new pipelines in, then results.csv (which picks the served model) last
+        for name in models:
+            os.replace(os.path.join(work_dir, pipeline_filename(name)), os.path.join(out_dir, pipeline_filename(name)))
+        results_df = pd.DataFrame(results).T.loc[list(models)]
+        if model_names and os.path.exists(results_path):
+            # Partial retrain: keep the other models' rows (their pipelines are untouched)
+            previous = pd.read_csv(results_path, index_col=0)
+            results_df = pd.concat([previous.drop(index=list(models), errors="ignore"), results_df])
+        results_df.to_csv(results_path + ".tmp")
+        os.replace(results_path + ".tmp", results_path)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    best_model_name = results_df["MSE"].idxmin()
+    print(f"✅ Best model: {best_model_name}")
+    print(results_df)
+    return results_df
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train the yield model zoo in parallel")
+    parser.add_argument("--data", default=DATASET_PATH)
+    parser.add_argument("--out", default=BASE_DIR, help="Directory for the pipelines and results.csv")
+    parser.add_argument("--state", help="Train on one state's rows only (per-region retrains)")
+    parser.add_argument("--models", nargs="+", help="Subset of get_models() names")
+    parser.add_argument("--cores", type=int, help="Cores to share out (default: all)")
+    parser.add_argument("--no-cache", action="store_true", help="Refit the preprocessors even if cached")
+    args = parser.parse_args()
+
+    orchestrate(args.data, args.out, args.state, args.models, args.cores, use_cache=not args.no_cache)
@@ -0,0 +1,272 @@
+"""
+Out-of-core training for the yield models: memory bounded by the chunk size,
+not by the dataset.
+
+    python stream_train.py                                   # XGBoost + SGD linear model
+    python stream_train.py --chunksize 20000 --epochs 8
+    python stream_train.py --models XGBoost --data decades.csv --out regions/all
+
+The dataset is never loaded whole; every pass re-reads it in chunks (row slices
+of the columnar copy from models/datastore.py when there is one, else
+pd.read_csv(chunksize=...)).
+
+1. Statistics pass: StandardScaler.partial_fit over the training rows and the
+   category vocabulary of every text column. The preprocessors are then the
+   same ColumnTransformers as preproc.py, with those statistics swapped in.
+2. XGBoost trains from an xgboost.DataIter over the transformed chunks with an
+   external-memory cache on disk (tree_method="hist").
+3. "Linear Regression (SGD)" is an SGDRegressor fed chunk by chunk with
+   partial_fit for --epochs passes, on a standardized target that is folded
+   back into coef_/intercept_ afterwards.
+4. MSE / R2 are accumulated chunk by chunk over the held-out rows.
+
+The split is a seeded per-chunk draw (TEST_SIZE of the rows), so it is
+reproducible for a given chunk size but is NOT the train_test_split held-out
+set that train.py / orchestrate.py score on. Their MSEs are not comparable,
+so the output goes to its own directory (STREAM_OUT_DIR, default streamed/)
+and never touches the results.csv the API picks its model from. Pipelines
+and results.csv there are written the same way as orchestrate.py: staged,
+swapped in, results.csv last. Random Forest and the Bagging models have no
+incremental fit and stay on train.py / orchestrate.py.
+"""
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+from sklearn.base import clone
+from sklearn.pipeline import Pipeline
+from sklearn.linear_model import SGDRegressor
+from sklearn.preprocessing import StandardScaler
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(BASE_DIR)
+sys.path.append(os.path.dirname(BASE_DIR))
+from datastore import iter_dataset
+from data import split_features
+from ml_models import get_models
+from preproc import get_preprocessors
+from orchestrate import DATASET_PATH, TEST_SIZE, RANDOM_STATE, pipeline_filename, atomic_dump
+
+STREAM_CHUNK_ROWS = int(os.getenv("STREAM_CHUNK_ROWS", "50000"))
+STREAM_EPOCHS = int(os.getenv("STREAM_EPOCHS", "5"))
+# Separate from BASE_DIR: backend/yeild_prediction.py serves the best row of BASE_DIR/results.csv
+STREAM_OUT_DIR = os.getenv("STREAM_OUT_DIR", os.path.join(BASE_DIR, "streamed"))
+
+SGD_NAME = "Linear Regression (SGD)"
+STREAM_MODELS = ["XGBoost", SGD_NAME]
+
+
+# ---------------- Chunks ----------------
+
+def iter_split_chunks(path, chunksize, part):
+    """(X, y) per chunk for part "train" / "test" / "all"; chunks without such rows are skipped."""
+    for number, chunk in enumerate(iter_dataset(path, chunksize)):
+        X, y = split_features(chunk)
+        if part != "all":
+            is_test = np.random.default_rng([RANDOM_STATE, number]).random(len(X)) < TEST_SIZE
+            keep = is_test if part == "test" else ~is_test
+            X, y = X[keep], y[keep]
+        if len(X):
+            yield X, y
+
+
+# ---------------- Preprocessing statistics ----------------
+
+def stream_statistics(path, chunksize):
+    """One pass: scaler statistics + target mean/std over training rows, vocabularies over all rows."""
+    numeric = categorical = None
+    scaler = StandardScaler()
+    vocab = {}
+    sample = None
+    n, y_sum, y_sumsq, rows, test_rows = 0, 0.0, 0.0, 0, 0
+
+    for number, chunk in enumerate(iter_dataset(path, chunksize)):
+        X, y = split_features(chunk)
+        if numeric is None:
+            numeric = X.select_dtypes(include=['int64', 'float64']).columns.tolist()
+            categorical = X.select_dtypes(include=['object', 'category']).columns.tolist()
+            vocab = {col: set() for col in categorical}
+        for col in categorical:
+            vocab[col].update(X[col].dropna().unique().tolist())
+
+        is_test = np.random.default_rng([RANDOM_STATE, number]).random(len(X)) < TEST_SIZE
+        X_train, y_train = X[~is_test], y[~is_test].to_numpy(np.float64)
+        rows += len(X)
+        test_rows += int(is_test.sum())
+        if not len(X_train):
+            continue
+        scaler.partial_fit(X_train[numeric])
+        n += len(y_train)
+        y_sum += float(y_train.sum())
+        y_sumsq += float((y_train ** 2).sum())
+        if sample is None:
+            sample = X_train
+
+    if n == 0 or test_rows == 0:
+        raise ValueError(f"{path}: {n} training / {test_rows} held-out rows in {rows}; "
+                         f"need both (more data or a larger --chunksize)")
+    y_mean = y_sum / n
+    y_std = max(np.sqrt(max(y_sumsq / n - y_mean ** 2, 0.0)), 1e-12)
+    print(f"📦 Statistics pass: {rows} rows ({n} train, {test_rows} held out), {len(numeric)} numeric / {len(categorical)} text columns")
+    return {"numeric": numeric, "categorical": categorical, "scaler": scaler,
+            "categories": {col: sorted(values) for col, values in vocab.items()},
+            "sample": sample, "y_mean": y_mean, "y_std": y_std}
+
+
+def fitted_preprocessors(stats):
+    """preproc.py's (linear, tree) ColumnTransformers, fitted from streamed statistics instead of the full frame."""
+    linear, tree = get_preprocessors(stats["sample"])
+    categories = [stats["categories"][col] for col in stats["categorical"]]
+    # Explicit vocabularies: the one chunk used to fit below need not contain every category
+    linear.set_params(cat__categories=categories)
+    tree.set_params(cat__categories=categories)
+    sample = stats["sample"]
+    linear.fit(sample)
+    tree.fit(sample)
+    # The scaler was fitted on the sample only; swap in the statistics of every training row
+    scaler = linear.named_transformers_["num"]
+    for attr in ("mean_", "var_", "scale_", "n_samples_seen_"):
+        setattr(scaler, attr, getattr(stats["scaler"], attr))
+    return linear, tree
+
+
+# ---------------- XGBoost (external memory) ----------------
+
+class ChunkIter(xgb.DataIter):
+    """Feeds transformed training chunks to XGBoost; pages are cached under cache_prefix."""
+
+    def __init__(self, path, chunksize, preprocessor, cache_prefix):
+        self.path, self.chunksize, self.preprocessor = path, chunksize, preprocessor
+        self._chunks = None
+        super().__init__(cache_prefix=cache_prefix)
+
+    def next(self, input_data):
+        if self._chunks is None:
+            self._chunks = iter_split_chunks(self.path, self.chunksize, "train")
+        try:
+            X, y = next(self._chunks)
+        except StopIteration:
+            return 0
+        input_data(data=self.preprocessor.transform(X), label=y.to_numpy(np.float64))
+        return 1
+
+    def reset(self):
+        self._chunks = None
+
+
+def train_xgboost(path, chunksize, preprocessor, template, work_dir):
+    params = {k: v for k, v in template.get_xgb_params().items() if v is not None}
+    params["tree_method"] = "hist"  # required for external memory
+    dtrain = xgb.DMatrix(ChunkIter(path, chunksize, preprocessor, os.path.join(work_dir, "xgb-cache")))
+    booster = xgb.train(params, dtrain, num_boost_round=template.n_estimators)
+
+    # Same estimator type train.py saves, so the backend serves it unchanged
+    model = clone(template)
+    model.load_model(bytearray(booster.save_raw()))
+    return model
+
+
+# ---------------- Linear model (partial_fit) ----------------
+
+def train_sgd(path, chunksize, preprocessor, stats, epochs):
+    model = SGDRegressor(loss="squared_error", penalty="l2", alpha=1e-4, learning_rate="invscaling",
+                         eta0=0.01, random_state=RANDOM_STATE)
+    rng = np.random.default_rng(RANDOM_STATE)
+    for epoch in range(epochs):
+        for X, y in iter_split_chunks(path, chunksize, "train"):
+            order = rng.permutation(len(X))  # partial_fit does not shuffle
+            Xt = preprocessor.transform(X.iloc[order])
+            target = (y.to_numpy(np.float64)[order] - stats["y_mean"]) / stats["y_std"]
+            model.partial_fit(Xt, target)
+        print(f"   epoch {epoch + 1}/{epochs} done")
+    # Fit on the standardized target; the model is linear, so undo it in the weights
+    model.coef_ = model.coef_ * stats["y_std"]
+    model.intercept_ = model.intercept_ * stats["y_std"] + stats["y_mean"]
+    return model
+
+
+# ---------------- Evaluation ----------------
+
+def stream_evaluate(pipeline, path, chunksize):
+    """MSE and R2 over the held-out rows, accumulated chunk by chunk."""
+    n, sse, y_sum, y_sumsq = 0, 0.0, 0.0, 0.0
+    for X, y in iter_split_chunks(path, chunksize, "test"):
+        actual = y.to_numpy(np.float64)
+        predicted = np.asarray(pipeline.predict(X), dtype=np.float64)
+        n += len(actual)
+        sse += float(((actual - predicted) ** 2).sum())
+        y_sum += float(actual.sum())
+        y_sumsq += float((actual ** 2).sum())
+    if n == 0:
+        raise ValueError(f"No held-out rows in {path}")
+    sst = y_sumsq - y_sum ** 2 / n
+    return {"MSE": sse / n, "R2": 1 - sse / sst if sst > 0 else float("nan")}
+
+
+# ---------------- Driver ----------------
+
+def stream_train(data_path=DATASET_PATH, out_dir=STREAM_OUT_DIR, model_names=None,
+                 chunksize=STREAM_CHUNK_ROWS, epochs=STREAM_EPOCHS):
+    names = model_names or STREAM_MODELS
+    unknown = set(names) - set(STREAM_MODELS)
+    if unknown:
+        raise ValueError(f"No streaming trainer for {sorted(unknown)} (choose from {STREAM_MODELS})")
+
+    stats = stream_statistics(data_path, chunksize)
+    linear, tree = fitted_preprocessors(stats)
+
+    os.makedirs(out_dir, exist_ok=True)
+    results_path = os.path.join(out_dir, "results.csv")
+    work_dir = tempfile.mkdtemp(prefix=".stream-", dir=out_dir)
+    try:
+        results = {}
+        for name in names:
+            start = time.perf_counter()
+            if name == "XGBoost":
+                template = get_models()[0]["XGBoost"]
+                model, preprocessor = train_xgboost(data_path, chunksize, tree, template, work_dir), tree
+                n_jobs = template.n_jobs if template.n_jobs and template.n_jobs > 0 else os.cpu_count()
+            else:
+                model, preprocessor = train_sgd(data_path, chunksize, linear, stats, epochs), linear
+                n_jobs = 1
+            pipeline = Pipeline([('preprocessor', preprocessor), ('model', model)])
+            fit_seconds = time.perf_counter() - start
+
+            results[name] = {**stream_evaluate(pipeline, data_path, chunksize),
+                             "fit_seconds": fit_seconds, "n_jobs": n_jobs}
+            atomic_dump(pipeline, os.path.join(work_dir, pipeline_filename(name)))
+            print(f"✅ {name}: MSE={results[name]['MSE']:.2f} R2={results[name]['R2']:.4f} ({fit_seconds:.1f}s)")
+
+        # Swap the new pipelines in, then results.csv last
+        for name in names:
+            os.replace(os.path.join(work_dir, pipeline_filename(name)), os.path.join(out_dir, pipeline_filename(name)))
+        results_df = pd.DataFrame(results).T.loc[names]
+        if os.path.exists(results_path):
+            previous = pd.read_csv(results_path, index_col=0)
+            results_df = pd.concat([previous.drop(index=names, errors="ignore"), results_df])
+        results_df.to_csv(results_path + ".tmp")
+        os.replace(results_path + ".tmp", results_path)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print(f"✅ Best model: {results_df['MSE'].idxmin()}")
+    print(results_df)
+    return results_df
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train the yield models out of core, chunk by chunk")
+    parser.add_argument("--data", default=DATASET_PATH)
+    parser.add_argument("--out", default=STREAM_OUT_DIR,
+                        help="Directory for the pipelines and results.csv (keep it apart from the served one)")
+    parser.add_argument("--models", nargs="+", choices=STREAM_MODELS)
+    parser.add_argument("--chunksize", type=int, default=STREAM_CHUNK_ROWS, help="Rows per chunk (bounds memory)")
+    parser.add_argument("--epochs", type=int, default=STREAM_EPOCHS, help="partial_fit passes for the SGD model")
+    args = parser.parse_args()
+
+    stream_train(args.data, args.out, args.models, args.chunksize, args.epochs)